@@ -1,39 +1,77 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# Por defecto se genera en modo carpeta (onedir): el ejecutable arranca directamente sin
+# descomprimir todo el programa en una carpeta temporal en cada inicio, que es lo que más
+# penaliza el arranque en frío del modo onefile. Para generar un único .exe:
+#     set DIAGRAMAS_ONEFILE=1   (Windows)  /  DIAGRAMAS_ONEFILE=1 pyinstaller ...   (Linux/macOS)
+import os
 
+ONEFILE = os.environ.get("DIAGRAMAS_ONEFILE") == "1"
+ROOT = os.path.abspath(os.path.join(SPECPATH, '..'))
 
 a = Analysis(
-    ['generador_diagramas3000.py'],
-    pathex=[],
+    [os.path.join(ROOT, 'main.py')],
+    pathex=[ROOT],
     binaries=[],
-    datas=[('imagen.ico', '.')],
+    datas=[(os.path.join(SPECPATH, 'imagen.ico'), '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['test'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='generador_diagramas3000',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=['imagen.ico'],
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='generador_diagramas3000',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=[os.path.join(SPECPATH, 'imagen.ico')],
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='generador_diagramas3000',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # Sin UPX: descomprimir las DLL en cada arranque cuesta más de lo que ahorra en disco
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=[os.path.join(SPECPATH, 'imagen.ico')],
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='generador_diagramas3000',
+    )
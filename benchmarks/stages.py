@@ -0,0 +1,282 @@
+"""Micro-benchmarks por etapa del generador sobre código sintético (ver synthetic.py).
+
+Cada escenario genera un bundle determinista (archivos, funciones por archivo, profundidad, longitud de
+etiquetas) y mide por separado cada etapa: análisis Python, análisis de lenguajes de llaves, grafo del
+bundle (análisis + enlaces entre archivos), escapado de etiquetas, emisión DOT, spool, partición y
+codificación para Kroki. Se guarda la mediana del tiempo y el pico de memoria (tracemalloc) de cada una.
+
+    python benchmarks/stages.py
+    python benchmarks/stages.py --save-baseline benchmarks/baseline.json
+    python benchmarks/stages.py --baseline benchmarks/baseline.json --threshold 0.25
+    python benchmarks/stages.py --scenario grande --stage emit_dot --repeat 10
+
+Con --baseline la salida es 1 si alguna etapa es más lenta que la referencia en más de `threshold` o su
+pico de memoria crece más de `mem-threshold`. Se compara el mínimo de las repeticiones, que es mucho más
+estable que la mediana en máquinas con ruido, y escalado por una carga de calibración fija medida en la
+misma ejecución (así una máquina más lenta o con la CPU limitada no parece una regresión). Las etapas de
+menos de --min-ms en la referencia no se comparan (su ruido es mayor que la diferencia).
+"""
+import os
+import sys
+import gc
+import json
+import time
+import base64
+import zlib
+import shutil
+import tempfile
+import argparse
+import platform
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import generate_corpus
+
+# Escenarios: (archivos, funciones por archivo, profundidad, longitud de etiquetas, fracción Java/JS)
+SCENARIOS = {
+    "pequeño":    dict(files=3, functions=4, depth=2, label_len=20, brace_ratio=0.34),
+    "mediano":    dict(files=15, functions=8, depth=3, label_len=30, brace_ratio=0.2),
+    "grande":     dict(files=40, functions=12, depth=3, label_len=30, brace_ratio=0.1),
+    "profundo":   dict(files=8, functions=6, depth=6, label_len=30, brace_ratio=0.0),
+    "etiquetas":  dict(files=8, functions=8, depth=2, label_len=200, brace_ratio=0.25),
+}
+
+# Límites bajos para que la etapa de partición divida de verdad el diagrama
+PARTITION_LIMITS = {"max_nodes": 300, "max_edges": 450, "max_kb": 0, "output": "pages"}
+
+# Picos de memoria más pequeños que esto no se comparan
+MIN_PEAK_KB = 64
+
+def isolate_caches(workdir):
+    """Configuración aislada: sin caché de fragmentos (se mide el análisis real) y con las carpetas de
+    caché/spool dentro de `workdir`. Tiene que llamarse antes de importar core"""
+    path = os.path.join(workdir, "config.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"fragment_cache": False, "render_cache": False, "cache_dir": workdir,
+                   "stream_threshold_kb": 256}, f)
+    os.environ["DIAGRAMAS_CONFIG"] = path
+
+def build_stages(corpus):
+    """{nombre: función sin argumentos} con las etapas sobre `corpus`. Las entradas de cada etapa
+    (grafo, DOT, bytes) se preparan aquí, fuera de la medida"""
+    from core.analyzer import analyze_file, build_diagram_graph
+    from core.renderer import graph_to_dot, iter_dot, iter_text_chunks, spool_diagram, diagram_payload
+    from core.partition import partition_graph
+    from core.utils import escape_dot_label
+
+    python_jobs = [(i, name, code, False, True, True) for i, (name, code) in enumerate(corpus) if name.endswith(".py")]
+    brace_jobs = [(i, name, code, False, True, True) for i, (name, code) in enumerate(corpus) if not name.endswith(".py")]
+    graph = build_diagram_graph(corpus, simplify=False, inner=True, conds_align=True, workers=1)
+    dot = graph_to_dot(graph)
+    payload = diagram_payload(dot)
+    labels = [(label, limit) for label, limit in zip(graph.node_labels, graph.node_limits)]
+
+    def analyze(jobs):
+        for job in jobs:
+            analyze_file(job)
+
+    def escape_labels():
+        escape_dot_label.cache_clear()
+        for label, limit in labels:
+            escape_dot_label(label, limit) if limit else escape_dot_label(label)
+
+    def spool():
+        spool_diagram(iter_text_chunks(iter_dot(graph))).discard()
+
+    def partition():
+        diagram = partition_graph(graph, "", "graphviz", PARTITION_LIMITS)
+        if diagram is not None:
+            diagram.discard()
+
+    def encode_payload():
+        # Lo que hace KrokiClient.prepare con transporte GET: deflate + base64url
+        base64.urlsafe_b64encode(zlib.compress(diagram_payload(dot), 9))
+
+    stages = {
+        "analyze_python": lambda: analyze(python_jobs),
+        "analyze_brace": lambda: analyze(brace_jobs),
+        "build_graph": lambda: build_diagram_graph(corpus, simplify=False, inner=True, conds_align=True, workers=1),
+        "escape_labels": escape_labels,
+        "emit_dot": lambda: graph_to_dot(graph),
+        "spool": spool,
+        "partition": partition,
+        "encode_payload": encode_payload,
+    }
+    if not brace_jobs:
+        del stages["analyze_brace"]
+    size = {"nodes": len(graph), "edges": len(graph.edge_src), "dot_kb": round(len(dot) / 1024, 1),
+            "payload_kb": round(len(payload) / 1024, 1)}
+    return stages, size
+
+# Cada muestra dura al menos esto: las etapas rápidas se repiten varias veces dentro de la muestra
+MIN_SAMPLE_MS = 50
+
+def measure(func, repeat):
+    """(mediana en ms, mínimo en ms, pico de memoria en KB). Como timeit: el recolector de basura se
+    desactiva durante las muestras. El pico se mide en una ejecución aparte: tracemalloc ralentiza el
+    código y falsearía los tiempos"""
+    start = time.perf_counter()
+    func()  # calentamiento (imports diferidos, tablas, cachés de funciones)
+    warmup_ms = (time.perf_counter() - start) * 1000
+    number = max(1, int(MIN_SAMPLE_MS // max(warmup_ms, 0.001)))
+    runs = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            runs.append((time.perf_counter() - start) * 1000 / number)
+            if gc_enabled:
+                gc.enable()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(runs), 3), round(min(runs), 3), round(peak / 1024, 1)
+
+def calibrate(repeat=7):
+    """Tiempo (ms, mínimo) de una carga fija de Python puro: la velocidad de referencia de esta máquina"""
+    def work():
+        table = {}
+        for i in range(60000):
+            key = f"n{i % 997}_{i}"
+            table[key] = len(key) + (table.get(key[:4], 0) if i % 3 else 0)
+        return sorted(table.items())[-1]
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        work()
+        runs.append((time.perf_counter() - start) * 1000)
+    return round(min(runs), 3)
+
+def run(scenarios, stage_names, repeat, seed):
+    results = {}
+    for name in scenarios:
+        corpus = generate_corpus(seed=seed, **SCENARIOS[name])
+        stages, size = build_stages(corpus)
+        entry = {"params": SCENARIOS[name], "size": size, "stages": {}}
+        for stage, func in stages.items():
+            if stage_names and stage not in stage_names:
+                continue
+            median_ms, min_ms, peak_kb = measure(func, repeat)
+            entry["stages"][stage] = {"median_ms": median_ms, "min_ms": min_ms, "peak_kb": peak_kb}
+        results[name] = entry
+    return results
+
+def compare(results, baseline, threshold, mem_threshold, min_ms, scale=1.0):
+    """Lista de regresiones (escenario, etapa, medida, referencia, actual). Los tiempos de la referencia
+    se multiplican por `scale` (calibración actual / calibración de la referencia)"""
+    regressions = []
+    for name, entry in results.items():
+        base_entry = baseline.get("results", {}).get(name)
+        if not base_entry or base_entry.get("params") != entry["params"]:
+            continue  # escenario nuevo o con otros parámetros: no es comparable
+        for stage, r in entry["stages"].items():
+            base = base_entry["stages"].get(stage)
+            if not base:
+                continue
+            base_ms = base["min_ms"] * scale
+            if base_ms >= min_ms and r["min_ms"] > base_ms * (1 + threshold):
+                regressions.append((name, stage, "min_ms", base_ms, r["min_ms"]))
+            if base["peak_kb"] >= MIN_PEAK_KB and r["peak_kb"] > base["peak_kb"] * (1 + mem_threshold):
+                regressions.append((name, stage, "peak_kb", base["peak_kb"], r["peak_kb"]))
+    return regressions
+
+def print_results(results, baseline=None, scale=1.0):
+    for name, entry in results.items():
+        size = entry["size"]
+        print(f"\n{name}: {entry['params']['files']} archivos -> {size['nodes']} nodos, {size['edges']} aristas, "
+              f"DOT {size['dot_kb']} KB")
+        base_stages = (baseline or {}).get("results", {}).get(name, {}).get("stages", {})
+        for stage, r in entry["stages"].items():
+            line = f"    {stage:<16} {r['median_ms']:>10.2f} ms (min {r['min_ms']:.2f})  pico {r['peak_kb']:>9.1f} KB"
+            base = base_stages.get(stage)
+            if base and base["min_ms"]:
+                line += f"  (min {(r['min_ms'] / (base['min_ms'] * scale) - 1) * 100:+.0f}% vs referencia)"
+            print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Escenario(s) a medir (por defecto todos)")
+    parser.add_argument("--stage", action="append", default=[], help="Etapa(s) a medir (por defecto todas)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por etapa (se usa la mediana)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador de código")
+    parser.add_argument("--json", action="store_true", help="Resultado en JSON por stdout")
+    parser.add_argument("--save-baseline", metavar="RUTA", help="Guardar los resultados como referencia")
+    parser.add_argument("--baseline", metavar="RUTA", help="Comparar con una referencia guardada")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Margen de lentitud tolerado frente a la referencia (0.25 = +25%%)")
+    parser.add_argument("--mem-threshold", type=float, default=0.25,
+                        help="Margen de crecimiento del pico de memoria tolerado frente a la referencia")
+    parser.add_argument("--no-calibrate", action="store_true",
+                        help="Comparar tiempos absolutos, sin escalar por la velocidad de la máquina")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="No comparar etapas más rápidas que esto en la referencia")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] No se pudo leer la referencia '{args.baseline}': {e}", file=sys.stderr)
+            return 2
+        if baseline.get("seed") != args.seed:
+            print("[!] La referencia se generó con otra semilla: los corpus no son comparables", file=sys.stderr)
+            return 2
+
+    workdir = tempfile.mkdtemp(prefix="bench_stages_")
+    try:
+        isolate_caches(workdir)
+        calibration_ms = calibrate()
+        results = run(args.scenario or list(SCENARIOS), args.stage, max(1, args.repeat), args.seed)
+        # Segunda medida al final: se queda la más rápida de las dos
+        calibration_ms = min(calibration_ms, calibrate())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    scale = 1.0
+    if baseline is not None and not args.no_calibrate and baseline.get("calibration_ms"):
+        scale = calibration_ms / baseline["calibration_ms"]
+
+    report = {"seed": args.seed, "repeat": args.repeat, "python": platform.python_version(),
+              "machine": platform.machine(), "calibration_ms": calibration_ms, "results": results}
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        if baseline is not None:
+            print(f"Calibración: {calibration_ms:.2f} ms (referencia {baseline.get('calibration_ms')} ms, "
+                  f"tiempos de referencia x{scale:.2f})")
+        print_results(results, baseline, scale)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReferencia guardada en {args.save_baseline}", file=sys.stderr)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.mem_threshold, args.min_ms, scale)
+        for name, stage, metric, base_value, value in regressions:
+            unit, allowed = ("ms", args.threshold) if metric == "min_ms" else ("KB", args.mem_threshold)
+            print(f"[!] Regresión en {name}/{stage}: {base_value:.2f} {unit} -> {value:.2f} {unit} "
+                  f"(+{(value / base_value - 1) * 100:.0f}%, tolerado +{allowed * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"\nSin regresiones frente a {args.baseline} (margen +{args.threshold * 100:.0f}%)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Mide el coste de importación de los módulos del programa (python -X importtime).
+
+Cada módulo se importa en un intérprete nuevo varias veces y se muestra la mediana del tiempo
+acumulado, qué dependencias pesadas arrastra y las importaciones más caras.
+
+    python benchmarks/startup_imports.py
+    python benchmarks/startup_imports.py --repeat 10 --json
+    python benchmarks/startup_imports.py --budget-ms 150 core.pipeline cli
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que se miden por defecto (entradas del programa y capas del núcleo)
+DEFAULT_MODULES = ["cli", "core.pipeline", "core.analyzer", "core.renderer", "core.kroki", "gui.app"]
+
+# Dependencias que deberían cargarse solo al usarse
+HEAVY_DEPENDENCIES = ["pyflowchart", "requests", "urllib3", "customtkinter", "tkinter"]
+
+def measure_once(module):
+    """Importa `module` en un proceso nuevo. Devuelve {módulo: (propio_us, acumulado_us)} o None si falla"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit():
+            continue  # cabecera
+        timings[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return timings
+
+def measure(module, repeat):
+    runs = [measure_once(module) for _ in range(repeat)]
+    runs = [r for r in runs if r]
+    if not runs:
+        return None
+    totals = [r.get(module, (0, 0))[1] for r in runs]
+    last = runs[-1]
+    heaviest = sorted(last.items(), key=lambda kv: kv[1][0], reverse=True)
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(totals) / 1000, 2),
+        "min_ms": round(min(totals) / 1000, 2),
+        "heavy_loaded": [d for d in HEAVY_DEPENDENCIES if d in last],
+        "top_self_ms": [[name, round(self_us / 1000, 2)] for name, (self_us, _) in heaviest[:5]],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Módulos a medir")
+    parser.add_argument("--repeat", type=int, default=5, help="Importaciones por módulo (se usa la mediana)")
+    parser.add_argument("--json", action="store_true", help="Resultado en JSON")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Falla (código 1) si algún módulo supera este tiempo de importación")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.modules:
+        result = measure(module, max(1, args.repeat))
+        if result is None:
+            print(f"[!] No se pudo importar '{module}' (¿dependencia no instalada?)", file=sys.stderr)
+            continue
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for r in results:
+            heavy = ", ".join(r["heavy_loaded"]) or "-"
+            print(f"{r['module']:<16} {r['median_ms']:>8.2f} ms (min {r['min_ms']:.2f})  pesadas: {heavy}")
+            for name, ms in r["top_self_ms"]:
+                print(f"    {ms:>8.2f} ms  {name}")
+
+    if args.budget_ms is not None:
+        over = [r for r in results if r["median_ms"] > args.budget_ms]
+        for r in over:
+            print(f"[!] {r['module']} supera el presupuesto: {r['median_ms']} ms > {args.budget_ms} ms", file=sys.stderr)
+        return 1 if over else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Generador determinista de código sintético para los benchmarks.
+
+Produce archivos Python y de lenguajes de llaves (Java/JS) variando el número de archivos, de funciones
+por archivo, la profundidad de anidamiento y la longitud de las etiquetas. Con la misma semilla se
+obtiene siempre exactamente el mismo código.
+
+    python benchmarks/synthetic.py /tmp/arbol --seeds 20 --helpers 3
+"""
+import os
+import sys
+import random
+import argparse
+
+WORDS = ["total", "valor", "indice", "suma", "lista", "dato", "cuenta", "resultado", "nombre", "limite",
+         "entrada", "salida", "tabla", "clave", "paso", "nodo", "linea", "texto", "fila", "columna"]
+
+def _rng(seed, name):
+    return random.Random(f"{seed}:{name}")
+
+def _identifier(rng):
+    return f"{rng.choice(WORDS)}_{rng.choice(WORDS)}"
+
+def _text(rng, length):
+    """Texto de unas `length` letras (para cadenas y comentarios: alarga las etiquetas del diagrama)"""
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:max(1, length)]
+
+def _python_block(rng, depth, label_len, calls, indent):
+    pad = "    " * indent
+    lines = []
+    for _ in range(rng.randint(2, 4)):
+        var = _identifier(rng)
+        lines.append(f'{pad}{var} = len("{_text(rng, label_len)}") + {rng.randint(0, 99)}')
+        if calls and rng.random() < 0.5:
+            lines.append(f"{pad}{rng.choice(calls)}({var})")
+    if depth > 0:
+        kind = rng.choice(("if", "for", "while", "try"))
+        var = _identifier(rng)
+        if kind == "if":
+            lines.append(f"{pad}if {var} > {rng.randint(0, 50)}:")
+            lines.extend(_python_block(rng, depth - 1, label_len, calls, indent + 1))
+            lines.append(f"{pad}else:")
+            lines.extend(_python_block(rng, depth - 1, label_len, calls, indent + 1))
+        elif kind == "for":
+            lines.append(f"{pad}for {var} in range({rng.randint(2, 9)}):")
+            lines.extend(_python_block(rng, depth - 1, label_len, calls, indent + 1))
+        elif kind == "while":
+            lines.append(f"{pad}while {var} < {rng.randint(2, 9)}:")
+            lines.extend(_python_block(rng, depth - 1, label_len, calls, indent + 1))
+            lines.append(f"{pad}    {var} += 1")
+        else:
+            lines.append(f"{pad}try:")
+            lines.extend(_python_block(rng, depth - 1, label_len, calls, indent + 1))
+            lines.append(f"{pad}except ValueError:")
+            lines.append(f'{pad}    print("{_text(rng, label_len)}")')
+    return lines
+
+def generate_python(name, functions=5, depth=2, label_len=20, imports=(), seed=0):
+    """Código Python: `functions` funciones (una de cada tres como método de una clase) con bloques
+    anidados hasta `depth`, llamadas a funciones propias y a la función f_0_entrada de los módulos
+    de `imports` ("paquete.modulo" se importa como from paquete import modulo), y código ROOT"""
+    rng = _rng(seed, name)
+    func_names = ["f_0_entrada"] + [f"f_{i}_{_identifier(rng)}" for i in range(1, functions)]
+    lines = []
+    external = []
+    for module in imports:
+        package, _, short = module.rpartition(".")
+        lines.append(f"from {package} import {short}" if package else f"import {module}")
+        external.append(f"{short}.f_0_entrada")
+    lines.append(f'CONSTANTE = "{_text(rng, label_len)}"')
+    lines.append("")
+    methods = []
+    for i, func in enumerate(func_names):
+        calls = func_names[:i] + external
+        if i % 3 == 2:
+            methods.append((func, calls))
+            continue
+        lines.append(f"def {func}(x):")
+        lines.append(f'    """{_text(rng, label_len)}"""')
+        lines.extend(_python_block(rng, depth, label_len, calls, 1))
+        lines.append("    return x")
+        lines.append("")
+    if methods:
+        lines.append("class Proceso:")
+        for func, calls in methods:
+            lines.append(f"    def {func}(self, x):")
+            lines.extend(_python_block(rng, depth, label_len, calls, 2))
+            lines.append("        return x")
+            lines.append("")
+    lines.append("")
+    lines.extend(_python_block(rng, min(depth, 1), label_len, func_names[:3] + external, 0))
+    return "\n".join(lines) + "\n"
+
+def _brace_block(rng, depth, label_len, indent, lang):
+    pad = "    " * indent
+    decl = "int " if lang == "java" else "let "
+    lines = []
+    for _ in range(rng.randint(2, 4)):
+        lines.append(f'{pad}{decl}{_identifier(rng)} = texto("{_text(rng, label_len)}");')
+    if depth > 0:
+        var = _identifier(rng)
+        kind = rng.choice(("if", "for", "while"))
+        if kind == "if":
+            lines.append(f"{pad}if ({var} > {rng.randint(0, 50)}) {{")
+            lines.extend(_brace_block(rng, depth - 1, label_len, indent + 1, lang))
+            lines.append(f"{pad}}} else {{")
+            lines.extend(_brace_block(rng, depth - 1, label_len, indent + 1, lang))
+            lines.append(f"{pad}}}")
+        elif kind == "for":
+            lines.append(f"{pad}for ({decl}i = 0; i < {rng.randint(2, 9)}; i++) {{")
+            lines.extend(_brace_block(rng, depth - 1, label_len, indent + 1, lang))
+            lines.append(f"{pad}}}")
+        else:
+            lines.append(f"{pad}while ({var} < {rng.randint(2, 9)}) {{")
+            lines.extend(_brace_block(rng, depth - 1, label_len, indent + 1, lang))
+            lines.append(f"{pad}    {var}++;")
+            lines.append(f"{pad}}}")
+    return lines
+
+def generate_brace(name, functions=5, depth=2, label_len=20, lang="java", seed=0):
+    """Código de un lenguaje de llaves (java o js) con la misma forma que generate_python"""
+    rng = _rng(seed, name)
+    lines = ["// " + _text(rng, label_len)]
+    if lang == "java":
+        lines.append("public class Programa {")
+    for i in range(functions):
+        header = f"void f_{i}(int x) {{" if lang == "java" else f"function f_{i}(x) {{"
+        lines.append(header)
+        lines.extend(_brace_block(rng, depth, label_len, 1, lang))
+        lines.append("}")
+    if lang == "java":
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def generate_corpus(files=10, functions=5, depth=2, label_len=20, brace_ratio=0.0, seed=0):
+    """Bundle en memoria [(nombre, código)]: cada módulo Python importa uno o dos de los anteriores
+    (llamadas entre archivos) y una fracción `brace_ratio` de los archivos es Java/JS"""
+    rng = _rng(seed, "corpus")
+    corpus = []
+    python_modules = []
+    n_brace = int(round(files * brace_ratio))
+    for i in range(files):
+        if i >= files - n_brace:
+            lang = "java" if i % 2 else "js"
+            name = f"mod_{i}.{lang}"
+            corpus.append((name, generate_brace(name, functions, depth, label_len, lang, seed)))
+            continue
+        name = f"mod_{i}.py"
+        imports = rng.sample(python_modules, min(len(python_modules), rng.randint(1, 2)))
+        corpus.append((name, generate_python(name, functions, depth, label_len, imports, seed)))
+        python_modules.append(f"mod_{i}")
+    return corpus
+
+def write_tree(root, seeds=10, helpers=3, functions=5, depth=2, label_len=20, seed=0):
+    """Árbol de ejercicios en disco: `seeds` archivos "Ejercicio N.py" en `root` y un paquete lib/ con
+    `helpers` módulos por ejercicio (cada ejercicio importa los suyos y alguno compartido).
+    Devuelve la lista de rutas escritas"""
+    rng = _rng(seed, "tree")
+    lib = os.path.join(root, "lib")
+    os.makedirs(lib, exist_ok=True)
+    written = []
+
+    def write(path, code):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        written.append(path)
+
+    write(os.path.join(lib, "__init__.py"), "")
+    shared = ["lib.comun_0", "lib.comun_1"]
+    for module in shared:
+        name = module.split(".")[-1]
+        write(os.path.join(lib, f"{name}.py"), generate_python(f"{name}.py", functions, depth, label_len, (), seed))
+    for n in range(1, seeds + 1):
+        own = []
+        for k in range(helpers):
+            name = f"ej{n}_h{k}"
+            imports = [rng.choice(shared)] + [f"lib.{m}" for m in own[-1:]]
+            write(os.path.join(lib, f"{name}.py"), generate_python(f"{name}.py", functions, depth, label_len, imports, seed))
+            own.append(name)
+        imports = [f"lib.{m}" for m in own] or shared[:1]
+        write(os.path.join(root, f"Ejercicio {n}.py"),
+              generate_python(f"Ejercicio {n}.py", functions, depth, label_len, imports, seed))
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("carpeta", help="Carpeta donde escribir el árbol de ejercicios")
+    parser.add_argument("--seeds", type=int, default=10, help="Archivos 'Ejercicio N.py'")
+    parser.add_argument("--helpers", type=int, default=3, help="Módulos de lib/ propios de cada ejercicio")
+    parser.add_argument("--functions", type=int, default=5, help="Funciones por archivo")
+    parser.add_argument("--depth", type=int, default=2, help="Profundidad de anidamiento")
+    parser.add_argument("--label-len", type=int, default=20, help="Longitud de las cadenas (etiquetas)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador")
+    args = parser.parse_args(argv)
+    written = write_tree(args.carpeta, args.seeds, args.helpers, args.functions, args.depth, args.label_len, args.seed)
+    print(f"{len(written)} archivos escritos en {args.carpeta}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
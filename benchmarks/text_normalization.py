@@ -0,0 +1,101 @@
+"""Mide la normalización de texto de core.utils (escape_dot_label, sanitize_id).
+
+Compara el tiempo de las funciones actuales, con y sin caché, con el de las implementaciones
+originales (carácter a carácter), repitiendo las llamadas que se hacen al generar el diagrama de los
+archivos de core/. La equivalencia de la salida la comprueba tests/test_utils.py.
+
+    python benchmarks/text_normalization.py
+    python benchmarks/text_normalization.py --repeat 20 --json
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+import statistics
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.utils import escape_dot_label, sanitize_id
+from tests.test_utils import reference_escape_dot_label, reference_sanitize_id
+
+def recorded_calls():
+    """Llamadas (función, argumentos) que hace el programa al construir y emitir el diagrama de core/"""
+    import core.graph, core.analyzer, core.renderer, core.partition
+    from core.analyzer import build_diagram_graph
+    from core.renderer import iter_dot
+
+    calls = {"escape_dot_label": [], "sanitize_id": []}
+    def recorder(name, func):
+        def record(*args, **kwargs):
+            calls[name].append((args, kwargs))
+            return func(*args, **kwargs)
+        return record
+
+    modules = (core.graph, core.analyzer, core.renderer, core.partition)
+    saved = [(m, n, getattr(m, n)) for m in modules for n in calls if hasattr(m, n)]
+    try:
+        for module, name, func in saved:
+            setattr(module, name, recorder(name, func))
+        data = []
+        for path in sorted(glob.glob(os.path.join(ROOT, "core", "*.py"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                data.append((os.path.basename(path), f.read()))
+        for _ in iter_dot(build_diagram_graph(data, simplify=False, inner=True, conds_align=True, workers=1)):
+            pass
+    finally:
+        for module, name, func in saved:
+            setattr(module, name, func)
+    return calls
+
+def timed(func, calls, repeat, clear=None):
+    runs = []
+    for _ in range(repeat):
+        if clear:
+            clear()
+        start = time.perf_counter()
+        for args, kwargs in calls:
+            func(*args, **kwargs)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+def bench(repeat):
+    recorded = recorded_calls()
+    results = {}
+    for name, ref, new in (("escape_dot_label", reference_escape_dot_label, escape_dot_label),
+                           ("sanitize_id", reference_sanitize_id, sanitize_id)):
+        calls = recorded[name]
+        base = timed(ref, calls, repeat)
+        cold = timed(new.__wrapped__, calls, repeat)
+        # La caché se vacía en cada repetición: solo cuentan los textos repetidos dentro del diagrama
+        cached = timed(new, calls, repeat, new.cache_clear)
+        results[name] = {
+            "calls": len(calls),
+            "distinct": len({(args, tuple(sorted(kwargs.items()))) for args, kwargs in calls}),
+            "reference_ms": round(base * 1000, 2),
+            "tables_ms": round(cold * 1000, 2),
+            "tables_cached_ms": round(cached * 1000, 2),
+            "speedup": round(base / cached, 2) if cached else None,
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7, help="Repeticiones por medida (se usa la mediana)")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args(argv)
+
+    results = bench(args.repeat)
+    if args.json:
+        print(json.dumps({"results": results}, indent=2))
+        return 0
+    print(f"{'función':<18} {'llamadas':>9} {'distintas':>10} {'original':>10} {'tablas':>10} {'+caché':>10} {'mejora':>8}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['calls']:>9} {r['distinct']:>10} {r['reference_ms']:>8.1f}ms {r['tables_ms']:>8.1f}ms "
+              f"{r['tables_cached_ms']:>8.1f}ms {r['speedup']:>7.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
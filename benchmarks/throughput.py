@@ -0,0 +1,325 @@
+"""Rendimiento de extremo a extremo del generador con un Kroki falso local.
+
+Levanta un sustituto local del endpoint /{engine}/pdf de Kroki (latencia, tasa de errores y límite de tamaño
+configurables) y ejecuta el proceso completo (escaneo -> bundles -> análisis -> render -> escritura) con
+run_pipeline, el mismo camino que usan la GUI y el CLI, sobre un árbol de ejercicios generado (ver
+synthetic.py). Informa de diagramas/s, latencias p50/p95/p99 y fallos; sale con código 1 si algún
+diagrama falla. Con --tree los PDF se escriben junto a las semillas de esa carpeta.
+
+    python benchmarks/throughput.py
+    python benchmarks/throughput.py --seeds 50 --latency-ms 200 --jitter-ms 100 --in-flight 8 --runs 3
+    python benchmarks/throughput.py --error-rate 0.1 --retries 2 --backoff 0.05
+    python benchmarks/throughput.py --max-payload-kb 64 --json
+    python benchmarks/throughput.py --url http://kroki.interno:8000    (un Kroki real en lugar del falso)
+"""
+import os
+import io
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import write_tree
+
+def make_pdf(size_kb=4):
+    """PDF válido de una página en blanco, rellenado hasta unos `size_kb` KB"""
+    padding = b"0" * max(0, size_kb * 1024 - 600)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 100] >>",
+        b"<< /Length %d >>\nstream\n" % len(padding) + padding + b"\nendstream",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+class _KrokiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+    def _reply(self, status, body, content_type="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, encoded_diagram=None):
+        fake = self.server.fake
+        started = time.perf_counter()
+        parts = self.path.strip("/").split("/")
+        if parts == ["health"]:
+            return self._reply(200, b"{}", "application/json")
+        if len(parts) < 2:
+            return self._reply(404, b"not found")
+        try:
+            if encoded_diagram is not None:
+                data = parts[2] if len(parts) > 2 else ""
+                payload = zlib.decompress(base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)))
+            else:
+                payload = self._read_body()
+                if self.headers.get("Content-Encoding", "").lower() == "deflate":
+                    payload = zlib.decompress(payload)
+        except (ValueError, zlib.error):
+            fake.count("bad_request")
+            return self._reply(400, b"Error 400: diagrama ilegible")
+        status, body = fake.respond(len(payload))
+        self._reply(status, body, "application/pdf" if status == 200 else "text/plain")
+        fake.record(time.perf_counter() - started, len(payload))
+
+    def do_GET(self):
+        self._handle(encoded_diagram=True)
+
+    def do_POST(self):
+        self._handle()
+
+class FakeKroki:
+    """Servidor HTTP local que imita /{engine}/pdf de Kroki (GET comprimido, POST normal, deflate o chunked)"""
+    def __init__(self, latency_ms=50, jitter_ms=0, error_rate=0.0, error_status=503, max_payload_kb=0, pdf_kb=4,
+                 seed=0, port=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_payload = max_payload_kb * 1024
+        self.pdf = make_pdf(pdf_kb)
+        self.port = port
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = None
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), _KrokiHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="fake-kroki").start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "ok": 0, "injected_errors": 0, "too_large": 0, "bad_request": 0,
+                          "bytes_in": 0, "handle_s": []}
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def respond(self, payload_size):
+        """(estado, cuerpo) de una petición, tras la latencia simulada"""
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+        if self.max_payload and payload_size > self.max_payload:
+            self.count("too_large")
+            return 413, b"Error 413: diagrama demasiado grande"
+        time.sleep(delay)
+        if fail:
+            self.count("injected_errors")
+            return self.error_status, b"Error simulado"
+        self.count("ok")
+        return 200, self.pdf
+
+    def record(self, seconds, payload_size):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += payload_size
+            self.stats["handle_s"].append(seconds)
+
+def percentile(values, p):
+    """Percentil por rango más cercano (igual que LatencyStats)"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def latency_summary(seconds):
+    return {f"p{p}_ms": round(percentile(seconds, p) * 1000, 1) for p in (50, 95, 99)}
+
+def write_config(workdir, kroki_url, args):
+    """Configuración aislada (cachés en `workdir`, sin caché de renders ni build incremental) para que
+    cada ejecución haga todo el trabajo. Tiene que escribirse antes de importar core"""
+    config = {
+        "renderer": "kroki", "kroki_url": kroki_url, "kroki_endpoints": [],
+        "kroki_transport": args.transport, "cache_dir": workdir,
+        "render_cache": False, "fragment_cache": args.warm, "incremental": False,
+        "analysis_workers": args.workers,
+    }
+    for key, value in (("kroki_max_in_flight", args.in_flight), ("kroki_retries", args.retries),
+                       ("kroki_backoff", args.backoff)):
+        if value is not None:
+            config[key] = value
+    path = os.path.join(workdir, "config.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    os.environ["DIAGRAMAS_CONFIG"] = path
+
+def run_once(tree, args, fake):
+    """Una ejecución completa de run_pipeline. Devuelve el informe de la ejecución"""
+    from core.pipeline import PipelineOptions, run_pipeline
+    from core.renderer import get_renderer
+
+    queued = {}
+    latencies = []
+    def progress(event):
+        now = time.perf_counter()
+        if event["event"] == "seed_queued":
+            queued[os.path.basename(event["output"])] = now
+        elif event["event"] == "seed_done" and event["output"] in queued:
+            latencies.append(now - queued.pop(event["output"]))
+
+    if fake is not None:
+        fake.reset_stats()
+    options = PipelineOptions(tree, nombre_base="Ejercicio", output_name="Diagrama", engine="graphviz",
+                              renderer="kroki", extensions="py", workers=args.workers, force=True)
+    sink = None if args.verbose else open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+            result = run_pipeline(options, progress)
+    finally:
+        if sink:
+            sink.close()
+
+    client = get_renderer("kroki")
+    client_stats = client.stats() or {}
+    report = {
+        "seeds": result.seeds,
+        "processed": result.processed,
+        "succeeded": result.success_count,
+        "failed": len(result.failed),
+        "elapsed_s": round(result.elapsed, 3),
+        "diagrams_per_s": round(result.success_count / result.elapsed, 2) if result.elapsed else 0.0,
+        "diagram_latency": latency_summary(latencies),
+        "request_latency": latency_summary(list(client.client.stats.latencies)),
+        "requests": client_stats.get("requests", 0),
+        "retries": client_stats.get("retries", 0),
+        "request_failures": client_stats.get("failures", 0),
+    }
+    if fake is not None:
+        server = dict(fake.stats)
+        server["handle"] = latency_summary(server.pop("handle_s"))
+        report["server"] = server
+    return report
+
+def print_report(number, r):
+    d, q = r["diagram_latency"], r["request_latency"]
+    print(f"Ejecución {number}: {r['succeeded']}/{r['processed']} diagramas en {r['elapsed_s']:.2f}s "
+          f"-> {r['diagrams_per_s']:.2f} diagramas/s, {r['failed']} fallidos")
+    print(f"    latencia por diagrama (análisis + render): p50={d['p50_ms']:.0f}ms p95={d['p95_ms']:.0f}ms p99={d['p99_ms']:.0f}ms")
+    print(f"    latencia por petición a Kroki:             p50={q['p50_ms']:.0f}ms p95={q['p95_ms']:.0f}ms p99={q['p99_ms']:.0f}ms")
+    print(f"    peticiones: {r['requests']}, reintentos: {r['retries']}, fallidas: {r['request_failures']}")
+    server = r.get("server")
+    if server:
+        print(f"    servidor: {server['ok']} OK, {server['injected_errors']} errores simulados, "
+              f"{server['too_large']} demasiado grandes (413), {server['bytes_in'] // 1024} KB recibidos")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    tree = parser.add_argument_group("árbol generado")
+    tree.add_argument("--tree", help="Usar esta carpeta en lugar de generar una (semillas 'Ejercicio N.py')")
+    tree.add_argument("--seeds", type=int, default=20, help="Archivos 'Ejercicio N.py'")
+    tree.add_argument("--helpers", type=int, default=3, help="Módulos importados por cada ejercicio")
+    tree.add_argument("--functions", type=int, default=5, help="Funciones por archivo")
+    tree.add_argument("--depth", type=int, default=2, help="Profundidad de anidamiento")
+    tree.add_argument("--label-len", type=int, default=20, help="Longitud de las etiquetas")
+    tree.add_argument("--seed", type=int, default=0, help="Semilla del generador y de la latencia/errores simulados")
+    server = parser.add_argument_group("Kroki falso")
+    server.add_argument("--url", help="URL de un Kroki real: no se levanta el servidor falso")
+    server.add_argument("--latency-ms", type=float, default=50, help="Latencia base de cada render")
+    server.add_argument("--jitter-ms", type=float, default=0, help="Latencia extra aleatoria (0..jitter)")
+    server.add_argument("--error-rate", type=float, default=0.0, help="Fracción de peticiones que fallan")
+    server.add_argument("--error-status", type=int, default=503, help="Código HTTP de los fallos simulados")
+    server.add_argument("--max-payload-kb", type=int, default=0, help="Diagramas mayores -> 413 (0 = sin límite)")
+    server.add_argument("--pdf-kb", type=int, default=4, help="Tamaño de los PDF devueltos")
+    client = parser.add_argument_group("generador")
+    client.add_argument("--workers", type=int, default=None, help="Procesos de análisis")
+    client.add_argument("--in-flight", type=int, default=None, help="Peticiones simultáneas a Kroki")
+    client.add_argument("--retries", type=int, default=None, help="Reintentos ante 429/5xx")
+    client.add_argument("--backoff", type=float, default=None, help="Espera base del backoff (s)")
+    client.add_argument("--transport", choices=("plain", "get", "compressed"), default="get", help="Transporte Kroki")
+    client.add_argument("--warm", action="store_true", help="Usar la caché de fragmentos entre ejecuciones")
+    parser.add_argument("--runs", type=int, default=1, help="Ejecuciones (la primera incluye arrancar el pool)")
+    parser.add_argument("--json", action="store_true", help="Resultado en JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el log del generador")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_throughput_")
+    fake = None
+    try:
+        if args.tree:
+            tree_dir = os.path.abspath(args.tree)
+        else:
+            tree_dir = os.path.join(workdir, "arbol")
+            write_tree(tree_dir, args.seeds, args.helpers, args.functions, args.depth, args.label_len, args.seed)
+        if not args.url:
+            fake = FakeKroki(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+                             args.max_payload_kb, args.pdf_kb, args.seed).start()
+        write_config(workdir, args.url or fake.url, args)
+
+        reports = []
+        for number in range(1, max(1, args.runs) + 1):
+            report = run_once(tree_dir, args, fake)
+            reports.append(report)
+            if not args.json:
+                print_report(number, report)
+        if args.json:
+            print(json.dumps({"tree": tree_dir, "runs": reports}, indent=2, ensure_ascii=False))
+        return 1 if any(r["failed"] for r in reports) else 0
+    finally:
+        from core.parallel import shutdown_pool
+        from core.renderer import _renderers
+        for backend in _renderers.values():
+            backend.close()
+        shutdown_pool()
+        if fake is not None:
+            fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
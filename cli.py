@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import argparse
+
+# Códigos de salida
+EXIT_OK = 0
+EXIT_FAILED = 1        # al menos un diagrama no se pudo generar
+EXIT_USAGE = 2         # argumentos inválidos o carpeta inexistente
+EXIT_NO_FILES = 3      # ningún archivo coincide con los filtros
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Generador de Diagramas en modo consola (sin interfaz gráfica).")
+    parser.add_argument("carpeta", help="Carpeta de trabajo con los archivos a procesar")
+    parser.add_argument("-b", "--base", default="", help="Filtro por nombre base (p.ej. 'Ejercicio' o 'main.py')")
+    parser.add_argument("-o", "--output", default="Diagrama", help="Nombre base de los PDF generados")
+    parser.add_argument("-e", "--ext", default=None,
+                        help="Extensiones separadas por comas (por defecto: las detectadas en la carpeta)")
+    parser.add_argument("--start", type=int, default=None, help="Número inicial del rango")
+    parser.add_argument("--end", type=int, default=None, help="Número final del rango")
+    parser.add_argument("--num-pos", action="store_true",
+                        help="El archivo comienza con número (p.ej. '1 Ejercicio.py' en vez de 'Ejercicio 1.py')")
+    parser.add_argument("--no-recursive", action="store_true", help="No buscar en subcarpetas")
+    parser.add_argument("--engine", choices=("graphviz", "mermaid"), default="graphviz", help="Motor de diagramas")
+    parser.add_argument("--renderer", choices=("kroki", "local"), default=None,
+                        help="Backend de renderizado (por defecto: el de la configuración)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Procesos de análisis (1 = en serie)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Regenerar todos los PDF aunque el manifiesto diga que están al día")
+    parser.add_argument("--watch", action="store_true",
+                        help="Seguir vigilando la carpeta y regenerar los diagramas afectados por cada cambio (Ctrl+C para salir)")
+    parser.add_argument("-s", "--simulate", action="store_true", help="Simulación: analiza sin generar PDFs")
+    parser.add_argument("--config", default=None, help="Ruta del archivo de configuración JSON")
+    parser.add_argument("--trace", nargs="?", const=True, default=None, metavar="RUTA",
+                        help="Guardar trazas por etapa en JSON (chrome://tracing, Perfetto) y mostrar un resumen; "
+                             "sin RUTA se guardan en la carpeta de trabajo")
+    parser.add_argument("--profile", choices=("cpu", "memory"), default=None,
+                        help="Perfil del proceso principal al terminar (cProfile o tracemalloc); analiza en serie")
+    parser.add_argument("--json", action="store_true",
+                        help="Progreso en JSON (una línea por evento) por stdout; los mensajes van a stderr")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.config:
+        os.environ["DIAGRAMAS_CONFIG"] = args.config
+
+    # Importación diferida: la configuración se lee ya con --config aplicado
+    from core.pipeline import PipelineOptions, run_pipeline, detect_folder_content
+
+    json_out = sys.stdout
+    if args.json:
+        # stdout queda reservado para los eventos JSON
+        sys.stdout = sys.stderr
+
+    def progress(event):
+        json_out.write(json.dumps(event, ensure_ascii=False) + "\n")
+        json_out.flush()
+
+    target_dir = os.path.abspath(args.carpeta)
+    if not os.path.isdir(target_dir):
+        print(f"Error: La carpeta '{target_dir}' no existe.", file=sys.stderr)
+        return EXIT_USAGE
+
+    ext_str = args.ext
+    if ext_str is None:
+        # Igual que al elegir carpeta en la GUI: se usan las extensiones presentes
+        detected_exts, _ = detect_folder_content(target_dir, not args.no_recursive)
+        ext_str = ", ".join(detected_exts) or "py"
+
+    options = PipelineOptions(target_dir, nombre_base=args.base, output_name=args.output, num_pos=args.num_pos,
+                              simulacion=args.simulate, recursive=not args.no_recursive, engine=args.engine,
+                              renderer=args.renderer, extensions=ext_str, rango_inicio=args.start,
+                              rango_fin=args.end, workers=args.workers, force=args.force,
+                              trace=args.trace, profile=args.profile)
+    if args.watch:
+        from core.watcher import FolderWatcher
+        watcher = FolderWatcher(options, progress if args.json else None).start()
+        try:
+            while watcher.is_running():
+                watcher.join(0.5)
+        except KeyboardInterrupt:
+            print("\nVigilancia detenida.", file=sys.stderr)
+        watcher.stop()
+        return EXIT_OK
+
+    result = run_pipeline(options, progress if args.json else None)
+
+    if result.error:
+        return EXIT_USAGE
+    if result.seeds == 0:
+        return EXIT_NO_FILES
+    if result.failed:
+        return EXIT_FAILED
+    return EXIT_OK
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
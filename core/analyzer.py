@@ -1,95 +1,205 @@
 import os
 import ast
 import re
-import random
-from pyflowchart import Flowchart
-from core.utils import sanitize_id, escape_dot_label
+from core.utils import sanitize_id
+from core.cache import get_fragment_cache, fragment_key
+from core.parallel import parallel_map, submit_task
+from core.graph import DiagramGraph, EDGE_CALL
+from core.partition import partition_graph
+from core.tracing import span
 from core.renderer import (
-    flowchart_js_to_graphviz_dot, 
-    flowchart_js_to_mermaid, 
-    generate_pdf_from_diagram
+    flowchart_to_fragment,
+    graph_to_dot,
+    iter_dot,
+    iter_text_chunks,
+    flowchart_to_mermaid, 
+    spool_diagram
 )
 
-def get_dot_content(code, file_prefix="main", simplify=True, inner=True, conds_align=True):
-    """Analiza código Python y devuelve nodos, enlaces y DEFINICIONES (para linkeo)"""
-    all_nodes = []
-    all_links = []
+def flowchart_from_ast(body, simplify=True, conds_align=True):
+    """Construye un Flowchart desde una lista de nodos AST ya parseados (sin volver a parsear el código)"""
+    if not body:
+        raise ValueError("No hay sentencias para generar el flowchart")
+    # pyflowchart se carga en el primer análisis, no al arrancar
+    from pyflowchart import Flowchart
+    from pyflowchart.ast_node import parse as parse_ast_body
+    process = parse_ast_body(body, simplify=simplify, conds_align=conds_align)
+    return Flowchart(process.head)
+
+def _statements_source(lines, statements):
+    """Líneas de código que ocupan las sentencias dadas (identifican el bloque para la caché)"""
+    return "\n".join("".join(lines[st.lineno - 1:st.end_lineno]) for st in statements)
+
+def get_flowchart_fragment(lines, statements, body, simplify=True, inner=True, conds_align=True):
+    """Devuelve el fragmento (nodos/enlaces) de un bloque, reutilizando la caché en disco si ya se generó"""
+    cache = get_fragment_cache()
+    key = None
+    if cache is not None:
+        key = fragment_key(_statements_source(lines, statements), simplify, inner, conds_align)
+        fragment = cache.get(key)
+        if fragment is not None:
+            return fragment
+
+    fragment = flowchart_to_fragment(flowchart_from_ast(body, simplify=simplify, conds_align=conds_align))
+    if cache is not None:
+        cache.put(key, fragment)
+    return fragment
+
+# Nombre (con puntos) seguido de "(" en la etiqueta de un nodo: dónde aparece cada llamada
+_CALL_IN_LABEL = re.compile(r'([A-Za-z_][\w.]*)\s*\(')
+
+def _imported_modules(tree):
+    """Alias -> nombre corto del módulo importado (import a.b as x / from p import mod), para resolver mod.f()"""
+    modules = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    modules[alias.asname] = alias.name.rsplit('.', 1)[-1]
+                else:
+                    modules[alias.name.split('.')[0]] = alias.name.split('.')[0]
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name != "*":
+                    modules[alias.asname or alias.name] = alias.name
+    return modules
+
+# Nodos AST que no pueden contener llamadas: no hace falta bajar por ellos
+_CALL_FREE_NODES = (ast.Name, ast.Constant, ast.expr_context, ast.operator, ast.cmpop, ast.unaryop, ast.boolop, ast.alias)
+
+def _iter_calls(node):
+    """Las ast.Call bajo `node` (como ast.walk, pero sin descender por hojas: la mitad de tiempo)"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if type(current) is ast.Call:
+            yield current
+        for field in current._fields:
+            value = getattr(current, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST) and not isinstance(item, _CALL_FREE_NODES):
+                        stack.append(item)
+            elif isinstance(value, ast.AST) and not isinstance(value, _CALL_FREE_NODES):
+                stack.append(value)
+
+def _call_names(node, class_name, modules):
+    """Llamadas dentro de `node`: tuplas (texto de la llamada, candidatos para resolverla, el más preciso primero).
+    f() -> ("f",); self.m() -> ("Clase.m", "m"); Clase.m() -> ("Clase.m",); modulo.f() -> ("modulo.f", "modulo:f"),
+    donde "modulo:f" solo existe si el módulo es un archivo del bundle"""
+    calls = []
+    for sub in _iter_calls(node):
+        func = sub.func
+        if isinstance(func, ast.Name):
+            calls.append((func.id, (func.id,)))
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            owner = func.value.id
+            text = f"{owner}.{func.attr}"
+            if owner in ("self", "cls") and class_name:
+                calls.append((text, (f"{class_name}.{func.attr}", func.attr)))
+            elif owner in modules:
+                calls.append((text, (text, f"{modules[owner]}:{func.attr}")))
+            else:
+                calls.append((text, (text,)))
+    return calls
+
+def _locate_calls(graph, start, calls, fallback):
+    """Asigna cada llamada al primer nodo (desde el índice `start`) cuya etiqueta la contiene;
+    si pyflowchart la ha simplificado, al nodo `fallback`. Devuelve [(id de nodo, candidatos)]"""
+    if not calls:
+        return []
+    first_node = {}
+    for node_id, label in zip(graph.node_ids[start:], graph.node_labels[start:]):
+        if label[:1] in ("'", '"'):
+            continue  # docstrings y literales: el texto puede nombrar funciones sin llamarlas
+        for name in _CALL_IN_LABEL.findall(label):
+            first_node.setdefault(name, node_id)
+    located = []
+    for name, candidates in calls:
+        src = first_node.get(name, fallback)
+        if src is not None:
+            located.append((src, candidates))
+    return located
+
+def get_file_graph(code, file_prefix="main", simplify=True, inner=True, conds_align=True):
+    """Analiza código Python y devuelve su grafo, las DEFINICIONES y las LLAMADAS (para linkeo entre archivos)"""
+    graph = DiagramGraph()
     definitions = {} # { "func_name": "HEAD_NODE_ID" }
+    calls = []       # [(nodo que llama, (nombres candidatos))]
+    tree = None
+    lines = code.splitlines(keepends=True)
+    used_prefixes = set()
     
     try:
-        tree = ast.parse(code)
+        # Un único parseo por archivo: cada función se genera desde su propio subárbol
+        with span("parse"):
+            tree = ast.parse(code)
+            modules = _imported_modules(tree)
         
         # 1. Extraer funciones/métodos
-        functions_to_process = []
-        for node in tree.body:
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                functions_to_process.append(("", node.name))
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef):
-                for subnode in node.body:
-                    if isinstance(subnode, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        functions_to_process.append((node.name, subnode.name))
+        with span("flowchart") as flow:
+            functions_to_process = []
+            for node in tree.body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    functions_to_process.append(("", node))
+            for node in tree.body:
+                if isinstance(node, ast.ClassDef):
+                    for subnode in node.body:
+                        if isinstance(subnode, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                            functions_to_process.append((node.name, subnode))
 
-        # 2. Código Root
-        root_nodes = [n for n in tree.body if not isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
-        if root_nodes:
-            main_code = ast.unparse(root_nodes) if hasattr(ast, 'unparse') else code
-            if main_code.strip():
-                fc = Flowchart.from_code(main_code, field='', inner=inner, simplify=simplify, conds_align=conds_align)
-                nodes, links = flowchart_js_to_graphviz_dot(fc.flowchart(), f"{file_prefix}_ROOT")
-                all_nodes.extend(nodes)
-                all_links.extend(links)
+            # 2. Código Root
+            root_nodes = [n for n in tree.body if not isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+            if root_nodes:
+                root_body = root_nodes if inner else [ast.Module(body=root_nodes, type_ignores=[])]
+                fragment = get_flowchart_fragment(lines, root_nodes, root_body, simplify, inner, conds_align)
+                start = len(graph)
+                entry = graph.add_fragment(fragment, f"{file_prefix}_ROOT")
+                root_calls = [c for n in root_nodes for c in _call_names(n, "", modules)]
+                calls.extend(_locate_calls(graph, start, root_calls, entry))
 
-        # 3. Funciones
-        for class_name, func_name in functions_to_process:
-            field_path = f"{class_name}.{func_name}" if class_name else func_name
-            try:
-                uniq = random.randint(0,9999)
-                prefix = sanitize_id(f"{file_prefix}_FN_{field_path}_{uniq}")
-                
-                fc = Flowchart.from_code(code, field=field_path, inner=True, simplify=False, conds_align=conds_align)
-                nodes, links = flowchart_js_to_graphviz_dot(fc.flowchart(), prefix)
+            # 3. Funciones
+            for class_name, func_node in functions_to_process:
+                func_name = func_node.name
+                field_path = f"{class_name}.{func_name}" if class_name else func_name
+                try:
+                    # ID estable: archivo + nombre cualificado (sufijo solo si se repite el nombre)
+                    base_prefix = sanitize_id(f"{file_prefix}_FN_{field_path}")
+                    prefix = base_prefix
+                    dup = 1
+                    while prefix in used_prefixes:
+                        dup += 1
+                        prefix = f"{base_prefix}_{dup}"
+                    used_prefixes.add(prefix)
                 
-                header_id = f"HEAD_{prefix}"
-                header_label = escape_dot_label(f"FUNC: {field_path}", limit=60)
-                all_nodes.append(f'    {header_id} [label="{header_label}", shape=component, style=filled, fillcolor="#B2EBF2"];')
+                    fragment = get_flowchart_fragment(lines, [func_node], func_node.body, False, True, conds_align)
                 
-                definitions[func_name] = header_id
-                if class_name:
-                    definitions[field_path] = header_id
+                    header_id = graph.add_node(f"HEAD_{prefix}", "header", f"FUNC: {field_path}", limit=60)
+                    definitions[func_name] = header_id
+                    if class_name:
+                        definitions[field_path] = header_id
 
-                if nodes:
-                    all_nodes.extend(nodes)
-                    first_node_id = None
-                    for n in nodes:
-                        if 'shape=oval' in n:
-                             first_node_id = n.split('[')[0].strip()
-                             break
-                    if not first_node_id and nodes:
-                         first_node_id = nodes[0].split('[')[0].strip()
-                    
-                    if first_node_id:
-                        all_links.append(f'    {header_id} -> {first_node_id} [style=dotted];')
-                        
-                all_links.extend(links)
-            except:
-                continue
+                    start = len(graph)
+                    graph.add_fragment(fragment, prefix, head=header_id)
+                    func_calls = [c for n in func_node.body for c in _call_names(n, class_name, modules)]
+                    calls.extend(_locate_calls(graph, start, func_calls, header_id))
+                except:
+                    continue
+            flow.set(functions=len(functions_to_process), nodes=len(graph), edges=len(graph.edge_src))
                 
     except Exception:
         try:
-             flowchart = Flowchart.from_code(code, field='', inner=inner, simplify=simplify, conds_align=conds_align)
-             nodes, links = flowchart_js_to_graphviz_dot(flowchart.flowchart(), f"{file_prefix}_FALLBACK")
-             all_nodes.extend(nodes)
-             all_links.extend(links)
+             if tree is not None:
+                 fragment = get_flowchart_fragment(lines, tree.body, tree.body, simplify, True, conds_align)
+                 graph.add_fragment(fragment, f"{file_prefix}_FALLBACK")
         except:
              pass
 
-    return all_nodes, all_links, definitions
+    return graph, definitions, calls
 
-def get_dot_content_generic(code, file_prefix="main", lang="java"):
+def get_file_graph_generic(code, file_prefix="main", lang="java"):
     """Analizador estructurado para lenguajes basados en llaves (Java, JS, C++, etc)"""
-    all_nodes = []
-    all_links = []
+    graph = DiagramGraph()
     
     code = re.sub(r'//.*', '', code)
     code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
@@ -99,9 +209,7 @@ def get_dot_content_generic(code, file_prefix="main", lang="java"):
     last_node = None
     p = sanitize_id(file_prefix)
     
-    start_id = f"{p}_start"
-    all_nodes.append(f'    {start_id} [label="INICIO: {file_prefix}", shape=oval, style=filled, fillcolor="#E3F2FD"];')
-    last_node = start_id
+    last_node = graph.add_node(f"{p}_start", "start", f"INICIO: {file_prefix}")
 
     node_count = 0
     for i, line in enumerate(lines):
@@ -119,12 +227,10 @@ def get_dot_content_generic(code, file_prefix="main", lang="java"):
         is_cond = is_if or is_while or is_for or (is_else and "if" in line)
         is_end_block = "}" in line
         
-        clean_label = escape_dot_label(line, limit=50)
-        
         if is_cond:
-            all_nodes.append(f'    {current_id} [label="{clean_label}", shape=diamond, style=filled, fillcolor="#FFF3E0"];')
+            graph.add_node(current_id, "condition", line, limit=50)
             if last_node:
-                all_links.append(f'    {last_node} -> {current_id};')
+                graph.add_edge(last_node, current_id)
             out_id = f"{p}_out_{node_count}"
             stack.append((current_id, out_id))
             last_node = current_id
@@ -132,159 +238,153 @@ def get_dot_content_generic(code, file_prefix="main", lang="java"):
         elif is_else and not "if" in line:
             if stack:
                 cond_id, _ = stack[-1]
-                all_nodes.append(f'    {current_id} [label="else", shape=rectangle, style=filled, fillcolor="#F5F5F5"];')
-                all_links.append(f'    {cond_id} -> {current_id} [label="no"];')
+                graph.add_node(current_id, "else", "else")
+                graph.add_edge(cond_id, current_id, "no")
                 last_node = current_id
                 
         elif is_end_block:
             if stack:
                 cond_id, out_id = stack.pop()
-                all_nodes.append(f'    {out_id} [label="", shape=point];')
+                graph.add_node(out_id, "point", "")
                 if last_node:
-                    all_links.append(f'    {last_node} -> {out_id};')
-                all_links.append(f'    {cond_id} -> {out_id} [label="no"];')
+                    graph.add_edge(last_node, out_id)
+                graph.add_edge(cond_id, out_id, "no")
                 last_node = out_id
         else:
-            all_nodes.append(f'    {current_id} [label="{clean_label}", shape=rectangle];')
+            graph.add_node(current_id, "statement", line, limit=50)
             if last_node:
-                all_links.append(f'    {last_node} -> {current_id};')
+                graph.add_edge(last_node, current_id)
             last_node = current_id
 
-    end_id = f"{p}_end"
-    all_nodes.append(f'    {end_id} [label="FIN", shape=oval, style=filled, fillcolor="#FFEBEE"];')
+    end_id = graph.add_node(f"{p}_end", "end", "FIN")
     if last_node:
-        all_links.append(f'    {last_node} -> {end_id};')
+        graph.add_edge(last_node, end_id)
 
-    return all_nodes, all_links, {}
+    return graph, {}, []
 
-def get_local_dependencies(file_path, processed_files=None, project_root=None):
-    if processed_files is None:
-        processed_files = set()
-    file_path = os.path.abspath(file_path)
-    if file_path in processed_files:
-        return []
-    processed_files.add(file_path)
-    dependencies = [file_path]
-    if project_root is None:
-        project_root = os.path.dirname(file_path)
-    current_dir = os.path.dirname(file_path)
+def analyze_file(job):
+    """Analiza un archivo del bundle (función de nivel superior para poder ejecutarse en otro proceso)"""
+    i, fname, fcode, simplify, inner, conds_align = job
+    safe_name = sanitize_id(fname)
+    prefix = f"FILE_{i}_{safe_name}"
+    ext = fname.split('.')[-1].lower() if '.' in fname else 'py'
+    with span("file", file=fname, bytes=len(fcode)) as file_span:
+        try:
+            if ext == 'py':
+                result = get_file_graph(fcode, prefix, simplify, inner, conds_align)
+            else:
+                with span("flowchart", lang=ext):
+                    result = get_file_graph_generic(fcode, prefix, ext)
+        except Exception:
+            result = DiagramGraph(), {}, []
+        file_span.set(nodes=len(result[0]), edges=len(result[0].edge_src))
+    return result
+
+def build_diagram_graph(input_data, simplify=True, inner=True, conds_align=True, workers=None):
+    """Analiza el código (str o lista de (nombre, código)) y devuelve el DiagramGraph (un cluster por archivo).
+    `workers` limita los procesos usados para analizar los archivos (1 = en serie)"""
+    graph = DiagramGraph()
+    global_definitions = {} 
+
+    if isinstance(input_data, str):
+        file_graph, defs, _ = get_file_graph(input_data, "main", simplify, inner, conds_align)
+        graph.extend(file_graph)
     
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            code = f.read()
-            tree = ast.parse(code)
-        import_info = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    import_info.append(('absolute', alias.name, None))
-            elif isinstance(node, ast.ImportFrom):
-                module = node.module if node.module else ''
-                level = node.level
-                import_info.append(('from', module, level))
-        for import_type, module_name, level in import_info:
-            potential_files = []
-            if import_type == 'absolute' or (import_type == 'from' and level == 0):
-                base_mod = module_name.split('.')[0]
-                potential_files.append(os.path.join(project_root, f"{base_mod}.py"))
-                pkg_dir = os.path.join(project_root, base_mod)
-                if os.path.isdir(pkg_dir):
-                    init_file = os.path.join(pkg_dir, "__init__.py")
-                    if os.path.exists(init_file):
-                        potential_files.append(init_file)
-                    if '.' in module_name:
-                        parts = module_name.split('.')
-                        submod_path = os.path.join(project_root, *parts[:-1], f"{parts[-1]}.py")
-                        potential_files.append(submod_path)
-            elif import_type == 'from' and level > 0:
-                base_dir = current_dir
-                for _ in range(level - 1):
-                    base_dir = os.path.dirname(base_dir)
-                if module_name:
-                    base_mod = module_name.split('.')[0]
-                    potential_files.append(os.path.join(base_dir, f"{base_mod}.py"))
-                else:
-                    potential_files.append(os.path.join(base_dir, "__init__.py"))
-            for pot_file in potential_files:
-                if os.path.exists(pot_file) and pot_file not in processed_files:
-                    sub_deps = get_local_dependencies(pot_file, processed_files, project_root)
-                    dependencies.extend(sub_deps)
-    except Exception:
-        pass
-    return list(dict.fromkeys(dependencies))
+    elif isinstance(input_data, list):
+        # Cada archivo se analiza en un proceso; map conserva el orden, así la numeración de clusters es estable
+        jobs = [(i, fname, fcode, simplify, inner, conds_align) for i, (fname, fcode) in enumerate(input_data)]
+        results = parallel_map(analyze_file, jobs, workers)
+        calls = []
+        for (i, fname, _, _, _, _), (file_graph, defs, file_calls) in zip(jobs, results):
+            module = os.path.splitext(os.path.basename(fname))[0]
+            for func_name, node_id in defs.items():
+                # También "modulo:funcion", para las llamadas modulo.funcion() a este archivo
+                for key in (func_name, f"{module}:{func_name}"):
+                    if key not in global_definitions:
+                        global_definitions[key] = []
+                    global_definitions[key].append((i, node_id))
+            calls.extend((i, src, candidates) for src, candidates in file_calls)
+            
+            if len(file_graph):
+                graph.add_cluster(i, fname)
+                graph.extend(file_graph, cluster=i)
 
-def generate_flowchart_from_code(input_data, output_path, simulacion=False, save_mmd=False, theme_name="default", 
-                                 simplify=True, inner=True, conds_align=True, engine="graphviz"):
-    if engine == "mermaid":
-        code = input_data if isinstance(input_data, str) else "\n".join([c for _, c in input_data])
-        try:
-            flowchart = Flowchart.from_code(code, field='', inner=inner, simplify=simplify, conds_align=conds_align)
-            diagram_code = flowchart_js_to_mermaid(flowchart.flowchart(), theme_name)
-            return generate_pdf_from_diagram(diagram_code, output_path, simulacion, engine)
-        except:
-            return False
+        with span("link", calls=len(calls)) as link_span:
+            edges = len(graph.edge_src)
+            link_calls(graph, global_definitions, calls)
+            link_span.set(linked=len(graph.edge_src) - edges)
 
-    dot_lines = [
-            "digraph G {",
-            "    rankdir=TB;",
-            "    compound=true;",
-            "    nodesep=0.5;",
-            "    ranksep=0.7;",
-            "    node [fontname=\"Arial\", fontsize=11, style=filled, fillcolor=white];",
-            "    edge [fontname=\"Arial\", fontsize=10];",
-            ""
-    ]
+    return graph
 
-    all_content_nodes = []
-    all_content_links = []
-    global_definitions = {} 
+# Un nombre sin cualificar definido en más archivos que esto se considera ambiguo y no se enlaza
+MAX_CALL_TARGETS = 3
 
-    try:
-        if isinstance(input_data, str):
-            nodes, links, defs = get_dot_content(input_data, "main", simplify, inner, conds_align)
-            all_content_nodes.extend(nodes)
-            all_content_links.extend(links)
-        
-        elif isinstance(input_data, list):
-            for i, (fname, fcode) in enumerate(input_data):
-                safe_name = sanitize_id(fname)
-                prefix = f"FILE_{i}_{safe_name}"
-                ext = fname.split('.')[-1].lower() if '.' in fname else 'py'
-                try:
-                    if ext == 'py':
-                        nodes, links, defs = get_dot_content(fcode, prefix, simplify, inner, conds_align)
-                    else:
-                        nodes, links, defs = get_dot_content_generic(fcode, prefix, ext)
-                except Exception as e:
-                    nodes, links, defs = [], [], {}
-                
-                for func_name, node_id in defs.items():
-                    if func_name not in global_definitions:
-                        global_definitions[func_name] = []
-                    global_definitions[func_name].append(node_id)
-                
-                if nodes:
-                    dot_lines.append(f"    subgraph cluster_{i} {{")
-                    clean_fname = escape_dot_label(fname, limit=60)
-                    dot_lines.append(f'        label = "{clean_fname}";')
-                    dot_lines.append('        style=filled;')
-                    dot_lines.append('        color="#F5F5F5";')
-                    dot_lines.append('        fontsize=14;')
-                    for n in nodes:
-                        dot_lines.append(f"    {n}")
-                        all_content_nodes.append(n)
-                    for l in links:
-                        dot_lines.append(f"    {l}")
-                    dot_lines.append("    }")
-                    dot_lines.append('')
-        
-        if isinstance(input_data, str):
-            dot_lines.extend(all_content_nodes)
-            dot_lines.extend(all_content_links)
+def link_calls(graph, definitions, calls):
+    """Añade las aristas llamada -> cabecera FUNC: de la función llamada cuando está definida en OTRO archivo.
+    `definitions`: nombre (y Clase.método) -> [(archivo, id de cabecera)]; `calls`: [(archivo, nodo, candidatos)].
+    Un diccionario y una búsqueda por candidato: tiempo lineal en el número de llamadas"""
+    linked = set()
+    for file_index, src, candidates in calls:
+        targets = None
+        for name in candidates:
+            targets = definitions.get(name)
+            if targets:
+                break
+        if not targets or len(targets) > MAX_CALL_TARGETS:
+            continue
+        if any(target_file == file_index for target_file, _ in targets):
+            # Una definición en el propio archivo tapa a las de los demás
+            continue
+        for _, header_id in targets:
+            if (src, header_id) not in linked:
+                linked.add((src, header_id))
+                graph.add_edge(src, header_id, "", EDGE_CALL)
+
+def _mermaid_code(input_data, theme_name, simplify, inner, conds_align):
+    from pyflowchart import Flowchart
+    code = input_data if isinstance(input_data, str) else "\n".join([c for _, c in input_data])
+    flowchart = Flowchart.from_code(code, field='', inner=inner, simplify=simplify, conds_align=conds_align)
+    return flowchart_to_mermaid(flowchart, theme_name)
+
+def build_diagram_code(input_data, theme_name="default", simplify=True, inner=True, conds_align=True, engine="graphviz",
+                       workers=None):
+    """Analiza el código (str o lista de (nombre, código)) y devuelve el texto del diagrama (DOT o Mermaid).
+    `workers` limita los procesos usados para analizar los archivos (1 = en serie)"""
+    if engine == "mermaid":
+        return _mermaid_code(input_data, theme_name, simplify, inner, conds_align)
+    return graph_to_dot(build_diagram_graph(input_data, simplify, inner, conds_align, workers))
+
+def build_diagram_spool(input_data, theme_name="default", simplify=True, inner=True, conds_align=True, engine="graphviz",
+                        workers=None, output_path=""):
+    """Como build_diagram_code, pero el DOT se emite por trozos directamente a un DiagramSpool
+    (en memoria si es pequeño, en disco si no): el texto completo nunca se construye.
+    Si el diagrama supera los límites de tamaño se devuelve dividido en páginas (PartitionedDiagram)"""
+    if engine == "mermaid":
+        return spool_diagram([_mermaid_code(input_data, theme_name, simplify, inner, conds_align)], engine)
+    graph = build_diagram_graph(input_data, simplify, inner, conds_align, workers)
+    with span("partition", nodes=len(graph)) as partition_span:
+        partitioned = partition_graph(graph, output_path, engine)
+        partition_span.set(pages=len(partitioned.pages) if partitioned is not None else 0)
+    if partitioned is not None:
+        return partitioned
+    with span("emit_dot", nodes=len(graph), edges=len(graph.edge_src)) as emit_span:
+        spool = spool_diagram(iter_text_chunks(iter_dot(graph)), engine)
+        emit_span.set(bytes=spool.size, on_disk=spool.path is not None)
+    return spool
+
+def analyze_bundle(job):
+    """Analiza un bundle completo dentro de un proceso del pool (sus archivos, en serie). Devuelve el DiagramSpool.
+    Los errores se propagan por el Future: lo que se imprime en un proceso del pool no llega a la GUI"""
+    input_data, theme_name, simplify, inner, conds_align, engine, output_path = job
+    with span("seed", output=os.path.basename(output_path), files=len(input_data)) as seed_span:
+        diagram = build_diagram_spool(input_data, theme_name, simplify, inner, conds_align, engine, workers=1,
+                                      output_path=output_path)
+        seed_span.set(bytes=len(diagram))
+    return diagram
 
-        dot_lines.append("}")
-        diagram_code = "\n".join(dot_lines)
-        return generate_pdf_from_diagram(diagram_code, output_path, simulacion, engine)
-    except Exception as e:
-        print(f"\n    Error procesando lógica del flowchart: {e}")
-        return False
+def submit_bundle_analysis(input_data, theme_name="default", simplify=True, inner=True, conds_align=True,
+                           engine="graphviz", workers=None, output_path=""):
+    """Encola el análisis de un bundle (semilla) en el pool de procesos: Future con el diagrama (DiagramSpool
+    o PartitionedDiagram)"""
+    return submit_task(analyze_bundle, (input_data, theme_name, simplify, inner, conds_align, engine, output_path),
+                       workers=workers)
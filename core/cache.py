@@ -0,0 +1,231 @@
+import os
+import json
+import hashlib
+import shutil
+import threading
+from core.config import get_config
+from core.utils import atomic_output, log
+
+# Tamaño de bloque al copiar archivos hacia/desde la caché
+COPY_CHUNK = 64 * 1024
+
+# Versión del formato de los fragmentos: cambiarla invalida la caché existente
+FRAGMENT_FORMAT = 2
+
+def content_digest(*parts):
+    """SHA-256 de varias partes (str o bytes) separadas para evitar colisiones por concatenación"""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8", "surrogatepass")
+        h.update(part)
+        h.update(b"\x00")
+    return h.hexdigest()
+
+class DiskCache:
+    """Caché en disco direccionada por contenido, con escrituras atómicas y desalojo LRU por tamaño.
+    El acceso (lectura) actualiza el mtime del archivo, que es lo que se usa como orden LRU."""
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get_bytes(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put_bytes(self, key, data):
+        return self._store(key, lambda f: f.write(data), len(data))
+
+    def get_file(self, key, dest_path):
+        """Copia la entrada a `dest_path` por bloques (sin cargarla en memoria). Devuelve el tamaño o None"""
+        path = self._path(key)
+        try:
+            src = open(path, "rb")
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            with src, atomic_output(dest_path) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+                size = dst.tell()
+        except OSError as e:
+            log(f"    [!] No se pudo copiar desde la caché a '{dest_path}': {e}")
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return size
+
+    def put_file(self, key, src_path):
+        """Guarda una copia de `src_path` (por bloques) como entrada de la caché"""
+        try:
+            size = os.path.getsize(src_path)
+            with open(src_path, "rb") as src:
+                return self._store(key, lambda f: shutil.copyfileobj(src, f, COPY_CHUNK), size)
+        except OSError as e:
+            log(f"    [!] No se pudo leer '{src_path}' para la caché: {e}")
+            return False
+
+    def _store(self, key, write, size):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escritura atómica: otro proceso/máquina nunca ve un archivo a medias
+            with atomic_output(path) as f:
+                write(f)
+        except OSError as e:
+            log(f"    [!] No se pudo escribir en la caché '{self.directory}': {e}")
+            return False
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._entries())
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def _entries(self):
+        """Lista (ruta, mtime, tamaño) de todas las entradas de la caché"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(".tmp_"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, st.st_mtime, st.st_size))
+        return entries
+
+    def _evict(self):
+        """Borra las entradas menos usadas hasta quedar por debajo del 90% del límite"""
+        entries = self._entries()
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(entries, key=lambda e: e[1]):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": ratio}
+
+class FragmentCache(DiskCache):
+    """Caché de fragmentos de flowchart (nodos/enlaces ya procesados) serializados como JSON"""
+    def get(self, key):
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def put(self, key, fragment):
+        return self.put_bytes(key, json.dumps(fragment, separators=(",", ":")).encode("utf-8"))
+
+class RenderCache(DiskCache):
+    """Caché de diagramas ya renderizados (PDF), indexada por el digest del diagrama final"""
+    def get(self, key):
+        return self.get_bytes(key)
+
+    def put(self, key, content):
+        return self.put_bytes(key, content)
+
+class StreamingRenderKey:
+    """Clave de un render (motor + formato de salida + texto exacto del diagrama), calculada por trozos
+    a medida que se escribe el diagrama"""
+    def __init__(self, engine, output_format):
+        self._hash = hashlib.sha256()
+        for part in ("render-v1", engine, output_format):
+            self._hash.update(part.encode("utf-8"))
+            self._hash.update(b"\x00")
+
+    def update(self, chunk):
+        self._hash.update(chunk)
+
+    def hexdigest(self):
+        h = self._hash.copy()
+        h.update(b"\x00")
+        return h.hexdigest()
+
+_pyflowchart_version = None
+
+def pyflowchart_version():
+    """Versión instalada de pyflowchart (sus etiquetas forman parte del fragmento cacheado)"""
+    global _pyflowchart_version
+    if _pyflowchart_version is None:
+        try:
+            from importlib.metadata import version
+            _pyflowchart_version = version("pyflowchart")
+        except Exception:
+            _pyflowchart_version = ""
+    return _pyflowchart_version
+
+def fragment_key(source, simplify, inner, conds_align):
+    """Clave de un fragmento: código fuente del bloque + opciones que afectan al resultado"""
+    return content_digest(f"fragment-v{FRAGMENT_FORMAT}", pyflowchart_version(),
+                          f"simplify={simplify}", f"inner={inner}", f"conds_align={conds_align}", source)
+
+_fragment_cache = None
+
+def get_fragment_cache():
+    """Caché de fragmentos configurada (None si está desactivada)"""
+    global _fragment_cache
+    config = get_config()
+    if not config.get("fragment_cache"):
+        return None
+    if _fragment_cache is None or _fragment_cache.directory != config["fragment_cache_dir"]:
+        _fragment_cache = FragmentCache(config["fragment_cache_dir"], int(config["fragment_cache_max_mb"]) * 1024 * 1024)
+    return _fragment_cache
+
+_render_cache = None
+
+def get_render_cache():
+    """Caché de renders configurada (None si está desactivada)"""
+    global _render_cache
+    config = get_config()
+    if not config.get("render_cache"):
+        return None
+    if _render_cache is None or _render_cache.directory != config["render_cache_dir"]:
+        _render_cache = RenderCache(config["render_cache_dir"], int(config["render_cache_max_mb"]) * 1024 * 1024)
+    return _render_cache
@@ -0,0 +1,106 @@
+import os
+import json
+
+# Archivo de configuración opcional (JSON). Se puede cambiar con la variable DIAGRAMAS_CONFIG
+CONFIG_FILENAME = "generador_diagramas.json"
+
+def default_cache_dir():
+    """Carpeta de caché por defecto según el sistema operativo"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "generador_diagramas")
+
+DEFAULTS = {
+    # Backend de renderizado: "kroki" (servidor HTTP) o "local" (binario dot de Graphviz)
+    "renderer": "kroki",
+    "kroki_url": "https://kroki.io",
+    "render_timeout": 120,
+    "kroki_endpoints": [],           # varios servidores Kroki self-hosted (vacío -> solo kroki_url)
+    "kroki_failure_threshold": 3,    # fallos seguidos para expulsar un endpoint (circuit breaker)
+    "kroki_cooldown": 30,            # segundos antes de volver a probar un endpoint expulsado
+    "kroki_health_interval": 15,     # segundos entre sondas /health (solo con varios endpoints)
+    "kroki_transport": "get",        # "plain", "get" (GET comprimido si cabe) o "compressed" (además POST deflate)
+    "kroki_max_url_length": 4096,    # longitud máxima de URL para usar GET comprimido
+    "kroki_max_in_flight": 4,        # peticiones simultáneas a Kroki (el análisis sigue mientras tanto)
+    "kroki_retries": 3,              # reintentos ante 429/5xx o errores de conexión
+    "kroki_backoff": 0.5,            # espera base (s) del backoff exponencial
+    "dot_path": None,                # None -> buscar `dot` en el PATH
+    "local_workers": None,           # None -> número de núcleos
+    # Procesos para analizar archivos/semillas en paralelo (None -> núcleos; 1 -> en serie)
+    "analysis_workers": None,
+    # Caché de fragmentos (nodos/enlaces por función y por bloque ROOT)
+    "fragment_cache": True,
+    "fragment_cache_dir": None,      # None -> <cache_dir>/fragments
+    "fragment_cache_max_mb": 256,
+    # Caché de PDFs renderizados (compartible entre máquinas/CI apuntando a la misma carpeta)
+    "render_cache": True,
+    "render_cache_dir": None,        # None -> <cache_dir>/renders
+    "render_cache_max_mb": 1024,
+    # Diagramas más grandes que esto se guardan en disco y se envían/descargan en streaming
+    "stream_threshold_kb": 256,
+    "spool_dir": None,               # None -> <cache_dir>/spool
+    # Diagramas demasiado grandes (0 = sin límite en esa medida) se dividen en páginas por archivo/función
+    "partition": True,
+    "partition_max_nodes": 1000,
+    "partition_max_edges": 1500,
+    "partition_max_kb": 512,         # tamaño DOT estimado
+    "partition_output": "merged",    # "merged" (un PDF, requiere pypdf) o "pages" (resumen + _p1, _p2, ...)
+    # Qué se agrupa con cada semilla: "imports" (la semilla y los archivos locales que importa, solo Python)
+    # o "subfolders" (todos los archivos de las subcarpetas de su carpeta)
+    "bundle_mode": "imports",
+    # Build incremental: omitir semillas cuyo bundle y opciones no han cambiado (manifiesto junto a los PDF)
+    "incremental": True,
+    # Veces que se reintentan, al final de la ejecución, las semillas cuyo análisis o render falló
+    "seed_retries": 1,
+    # Modo watch: segundos entre sondeos de la carpeta y de calma antes de regenerar
+    "watch_interval": 1.0,
+    "watch_debounce": 0.5,
+    # Índice SQLite de archivos por carpeta (un solo recorrido del árbol, actualización incremental)
+    "file_index": True,
+    "file_index_dir": None,          # None -> <cache_dir>/index
+    # Terminal de la GUI: líneas que se conservan, refrescos por segundo y archivo con el registro completo
+    "log_max_lines": 5000,
+    "log_fps": 20,
+    "log_file": None,                # None -> solo en la ventana
+    # Trazas por etapa (JSON de Chrome trace + resumen al terminar) y perfil opcional ("cpu" o "memory")
+    "trace": False,
+    "trace_dir": None,               # None -> la carpeta de trabajo
+    "profile": None,
+    "cache_dir": None,               # None -> default_cache_dir()
+}
+
+_config = None
+
+def config_path():
+    env_path = os.environ.get("DIAGRAMAS_CONFIG")
+    if env_path:
+        return env_path
+    return os.path.join(os.path.expanduser("~"), CONFIG_FILENAME)
+
+def load_config(path=None):
+    """Carga la configuración: valores por defecto + archivo JSON (si existe)"""
+    config = dict(DEFAULTS)
+    path = path or config_path()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config.update(json.load(f))
+        except Exception as e:
+            print(f"    [!] No se pudo leer la configuración '{path}': {e}")
+    if not config.get("cache_dir"):
+        config["cache_dir"] = default_cache_dir()
+    if not config.get("fragment_cache_dir"):
+        config["fragment_cache_dir"] = os.path.join(config["cache_dir"], "fragments")
+    if not config.get("render_cache_dir"):
+        config["render_cache_dir"] = os.path.join(config["cache_dir"], "renders")
+    if not config.get("spool_dir"):
+        config["spool_dir"] = os.path.join(config["cache_dir"], "spool")
+    if not config.get("file_index_dir"):
+        config["file_index_dir"] = os.path.join(config["cache_dir"], "index")
+    return config
+
+def get_config():
+    """Configuración activa del proceso (se carga una sola vez)"""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
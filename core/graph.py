@@ -0,0 +1,99 @@
+from core.utils import sanitize_id
+
+# Tipos de nodo: los de pyflowchart (start, end, operation, inputoutput, condition, subroutine)
+# más los propios del programa: header (cabecera de función), else, point (unión) y statement (sentencia genérica)
+
+# Estilos de arista
+EDGE_BRANCH = "branch"   # rama yes/no de una condición (coloreada)
+EDGE_DOTTED = "dotted"   # cabecera de función -> primer nodo
+EDGE_CALL = "call"       # llamada -> cabecera de la función llamada (en otro archivo)
+
+# Versión de lo que se dibuja a partir del código: cambiarla regenera los PDF del build incremental
+DIAGRAM_FORMAT = 2
+
+class DiagramGraph:
+    """Representación intermedia del diagrama, en columnas (una lista por campo) para no crear un
+    objeto ni una cadena DOT por nodo. Los emisores (DOT, Mermaid) la recorren una sola vez al final."""
+    __slots__ = ("node_ids", "node_kinds", "node_labels", "node_clusters", "node_limits",
+                 "edge_src", "edge_dst", "edge_labels", "edge_styles", "clusters")
+
+    def __init__(self):
+        self.node_ids = []
+        self.node_kinds = []
+        self.node_labels = []
+        self.node_clusters = []
+        self.node_limits = []     # límite de texto de la etiqueta (None -> el por defecto)
+        self.edge_src = []
+        self.edge_dst = []
+        self.edge_labels = []
+        self.edge_styles = []
+        self.clusters = {}        # id de cluster -> título (en orden de creación)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def add_node(self, node_id, kind, label, cluster=None, limit=None):
+        self.node_ids.append(node_id)
+        self.node_kinds.append(kind)
+        self.node_labels.append(label)
+        self.node_clusters.append(cluster)
+        self.node_limits.append(limit)
+        return node_id
+
+    def add_edge(self, src, dst, label="", style=None):
+        self.edge_src.append(src)
+        self.edge_dst.append(dst)
+        self.edge_labels.append(label)
+        self.edge_styles.append(style)
+
+    def add_cluster(self, cluster, title):
+        self.clusters[cluster] = title
+
+    def add_fragment(self, fragment, prefix="", cluster=None, head=None):
+        """Añade un fragmento (nodos/enlaces con IDs locales) con el prefijo dado. Devuelve el ID de entrada.
+        Con `head` se enlaza ese nodo (cabecera de función) con la entrada del fragmento"""
+        # sanitize_id trabaja carácter a carácter: el prefijo se limpia una vez por fragmento y los IDs
+        # locales (n0, n1, ...), que se repiten en todos los fragmentos, salen de la caché
+        safe_prefix = sanitize_id(prefix) if prefix else ""
+        def full_id(nid):
+            if not safe_prefix:
+                return sanitize_id(nid)
+            return f"{safe_prefix}_{sanitize_id(str(nid))}" if nid != "" else safe_prefix + "_"
+
+        ids = {}
+        for nid, ntype, ntext in fragment["nodes"]:
+            ids[nid] = self.add_node(full_id(nid), ntype, ntext, cluster)
+        entry = ids[fragment["entry"]] if fragment["entry"] else None
+        if head is not None and entry is not None:
+            self.add_edge(head, entry, "", EDGE_DOTTED)
+        for src, dst, label in fragment["links"]:
+            self.add_edge(ids[src], ids[dst], label, EDGE_BRANCH if label else None)
+        return entry
+
+    def extend(self, other, cluster=None):
+        """Copia los nodos y aristas de otro grafo (p.ej. el de un archivo) dentro de `cluster`"""
+        self.node_ids.extend(other.node_ids)
+        self.node_kinds.extend(other.node_kinds)
+        self.node_labels.extend(other.node_labels)
+        self.node_limits.extend(other.node_limits)
+        if cluster is None:
+            self.node_clusters.extend(other.node_clusters)
+        else:
+            self.node_clusters.extend([cluster] * len(other.node_ids))
+        self.edge_src.extend(other.edge_src)
+        self.edge_dst.extend(other.edge_dst)
+        self.edge_labels.extend(other.edge_labels)
+        self.edge_styles.extend(other.edge_styles)
+
+    def nodes(self):
+        """Tuplas (id, tipo, etiqueta, cluster, límite)"""
+        return zip(self.node_ids, self.node_kinds, self.node_labels, self.node_clusters, self.node_limits)
+
+    def edges(self):
+        """Tuplas (origen, destino, etiqueta, estilo)"""
+        return zip(self.edge_src, self.edge_dst, self.edge_labels, self.edge_styles)
+
+def graph_from_fragment(fragment, prefix=""):
+    graph = DiagramGraph()
+    graph.add_fragment(fragment, prefix)
+    return graph
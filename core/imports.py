@@ -0,0 +1,139 @@
+import os
+import ast
+
+def parse_imports(path):
+    """[(módulo, nivel, [nombres importados])] de los import / from ... import de un archivo
+    ([] si no se puede leer o parsear)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.name, 0, []))
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.module or "", node.level, [a.name for a in node.names if a.name != "*"]))
+    return imports
+
+class ImportGraph:
+    """Grafo de imports locales de un proyecto, para formar cada bundle con la semilla y lo que importa.
+    Cada archivo se parsea una sola vez: sus imports se guardan en el índice (FileIndex) con su tamaño y
+    mtime y solo se vuelven a extraer si el archivo cambia. Las dependencias directas y los cierres
+    transitivos se memorizan durante la ejecución."""
+    def __init__(self, index=None):
+        self.index = index
+        self.root = index.root if index is not None else None
+        self.parsed = 0
+        self.reused = 0
+        self._imports = {}   # ruta -> imports
+        self._deps = {}      # (ruta, raíz del proyecto) -> dependencias directas
+        self._closures = {}  # (ruta, raíz del proyecto) -> dependencias transitivas
+        self._isfile = {}
+        self._isdir = {}
+
+    def imports_of(self, path):
+        imports = self._imports.get(path)
+        if imports is not None:
+            return imports
+        if self.index is not None:
+            imports = self.index.get_imports(path)
+            if imports is not None:
+                self.reused += 1
+        if imports is None:
+            imports = parse_imports(path)
+            self.parsed += 1
+            if self.index is not None:
+                self.index.put_imports(path, imports)
+        self._imports[path] = imports
+        return imports
+
+    def _exists(self, path):
+        found = self._isfile.get(path)
+        if found is None:
+            found = self._isfile[path] = os.path.isfile(path)
+        return found
+
+    def _is_namespace(self, base, parts):
+        """¿Es `parts` una carpeta sin __init__.py (paquete de espacio de nombres, PEP 420)?"""
+        folder = os.path.join(base, *parts)
+        found = self._isdir.get(folder)
+        if found is None:
+            found = self._isdir[folder] = os.path.isdir(folder)
+        return found
+
+    def _module_files(self, base, parts):
+        """Archivos que ejecuta importar `parts` desde `base`: los __init__.py de los paquetes intermedios
+        y el propio módulo (.py o paquete). [] si el módulo no existe ahí"""
+        if not parts:
+            init = os.path.join(base, "__init__.py")
+            return [init] if self._exists(init) else []
+        module = os.path.join(base, *parts)
+        if self._exists(module + ".py"):
+            found = [module + ".py"]
+        elif self._exists(os.path.join(module, "__init__.py")):
+            found = [os.path.join(module, "__init__.py")]
+        else:
+            return []
+        for i in range(1, len(parts)):
+            init = os.path.join(base, *parts[:i], "__init__.py")
+            if self._exists(init):
+                found.insert(i - 1, init)
+        return found
+
+    def dependencies(self, path, project_root=None):
+        """Dependencias locales directas de un archivo. Los imports absolutos se buscan junto al archivo, en la
+        raíz del proyecto (la carpeta de la semilla) y en la carpeta indexada; los relativos, desde su paquete"""
+        here = os.path.dirname(path)
+        project_root = project_root or here
+        key = (path, project_root)
+        deps = self._deps.get(key)
+        if deps is not None:
+            return deps
+
+        deps = []
+        for module, level, names in self.imports_of(path):
+            if level:
+                base = here
+                for _ in range(level - 1):
+                    base = os.path.dirname(base)
+                bases = [base]
+            else:
+                bases = list(dict.fromkeys(b for b in (here, project_root, self.root) if b))
+            parts = module.split(".") if module else []
+            for base in bases:
+                found = self._module_files(base, parts)
+                if not found and parts and not self._is_namespace(base, parts):
+                    continue
+                # from paquete import submodulo: el submódulo también es un archivo
+                for name in names:
+                    found.extend(self._module_files(base, parts + [name])[-1:])
+                if found:
+                    deps.extend(found)
+                    break
+        deps = [dep for dep in dict.fromkeys(deps) if dep != path]
+        self._deps[key] = deps
+        return deps
+
+    def transitive(self, path, project_root=None):
+        """El archivo y todas sus dependencias locales transitivas (en orden de descubrimiento, sin repetidos)"""
+        project_root = project_root or os.path.dirname(path)
+        key = (path, project_root)
+        closure = self._closures.get(key)
+        if closure is not None:
+            return closure
+
+        closure = []
+        seen = {path}
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            closure.append(current)
+            for dep in reversed(self.dependencies(current, project_root)):
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.append(dep)
+        self._closures[key] = closure
+        return closure
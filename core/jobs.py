@@ -0,0 +1,133 @@
+import time
+import threading
+from core.pipeline import run_pipeline
+from core.utils import log
+
+class RunControl:
+    """Cancelación, pausa y reanudación cooperativas de una ejecución. El pipeline lo consulta entre
+    semillas: lo que ya está analizándose o renderizándose termina"""
+    def __init__(self):
+        self._cancel = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def cancel(self):
+        self._cancel.set()
+        self._resumed.set()  # una ejecución en pausa también tiene que enterarse
+
+    def pause(self):
+        if not self._cancel.is_set():
+            self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def wait_resumed(self, timeout=None):
+        """True si no está en pausa (o cuando se reanuda antes de `timeout`)"""
+        return self._resumed.wait(timeout)
+
+class JobProgress:
+    """Progreso de una ejecución a partir de los eventos del pipeline: hechas, total, ritmo y ETA"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.done = 0          # semillas terminadas (generadas, fallidas u omitidas)
+        self.failed = 0
+        self.skipped = 0
+        self.rendered = 0      # las que pasaron por análisis + render (para el ritmo)
+        self.started = None
+
+    def update(self, event):
+        with self._lock:
+            kind = event["event"]
+            if kind == "start":
+                self.total = event.get("jobs", event.get("seeds", 0))
+                self.started = time.monotonic()
+            elif kind == "seed_skipped":
+                self.done += 1
+                self.skipped += 1
+            elif kind == "seed_done":
+                self.done += 1
+                self.rendered += 1
+                if not event.get("ok"):
+                    self.failed += 1
+            elif kind == "seed_retry":
+                # La semilla vuelve a la cola: su intento fallido deja de contar (también para el ritmo)
+                self.done -= 1
+                self.failed -= 1
+                self.rendered -= 1
+
+    def snapshot(self):
+        """Dict con done, total, failed, skipped, fraction, rate (diagramas/s), elapsed y eta (s o None)"""
+        with self._lock:
+            elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+            rate = self.rendered / elapsed if elapsed > 0 else 0.0
+            remaining = max(0, self.total - self.done)
+            eta = remaining / rate if rate > 0 else None
+            return {"done": self.done, "total": self.total, "failed": self.failed, "skipped": self.skipped,
+                    "fraction": self.done / self.total if self.total else 0.0, "rate": rate,
+                    "elapsed": elapsed, "eta": eta}
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}" if seconds < 3600 else f"{seconds // 3600}h{seconds // 60 % 60:02d}"
+
+class PipelineJob:
+    """Una ejecución del pipeline en segundo plano que se puede pausar, reanudar y cancelar.
+    La concurrencia la acota el propio pipeline (procesos de análisis, ventana de semillas y
+    renders simultáneos); aquí se lleva el control y el progreso"""
+    def __init__(self, options, progress=None):
+        self.options = options
+        self.progress = progress
+        self.control = RunControl()
+        self.status = JobProgress()
+        self.result = None
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pipeline-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def _on_event(self, event):
+        self.status.update(event)
+        if self.progress:
+            self.progress(event)
+
+    def _run(self):
+        try:
+            self.result = run_pipeline(self.options, self._on_event, self.control)
+        except Exception as e:
+            self.error = e
+            log(f"\nERROR CRÍTICO: {e}")
+
+    def cancel(self):
+        self.control.cancel()
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    @property
+    def paused(self):
+        return self.control.paused
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
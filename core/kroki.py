@@ -0,0 +1,377 @@
+import time
+import zlib
+import base64
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from core.utils import atomic_output, log
+from core.tracing import span
+
+# Modos de transporte: "plain" (POST texto), "get" (GET comprimido si cabe en la URL, si no POST texto)
+# y "compressed" (GET comprimido si cabe, si no POST con cuerpo deflate)
+TRANSPORTS = ("plain", "get", "compressed")
+
+# Tamaño de bloque de subida/descarga en streaming
+STREAM_CHUNK = 64 * 1024
+
+# Códigos que merecen reintento: saturación (429) y errores del servidor (5xx)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+def _deflate_chunks(spool):
+    """Comprime el spool por bloques (mismo formato que zlib.compress) sin cargarlo entero"""
+    compressor = zlib.compressobj(9)
+    for chunk in spool.iter_chunks(STREAM_CHUNK):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+class KrokiHTTPError(Exception):
+    """Respuesta definitiva (tras reintentos) distinta de 200"""
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"Kroki returned status {status_code}")
+        self.status_code = status_code
+
+class LatencyStats:
+    """Métricas de latencia por petición (thread-safe)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+            self.requests = 0
+            self.retries = 0
+            self.failures = 0
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+            if not ok:
+                self.failures += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def percentile(self, p):
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.percentile(100),
+        }
+
+class NoEndpointAvailable(Exception):
+    """Todos los endpoints configurados están fuera de servicio"""
+    pass
+
+class Endpoint:
+    """Un servidor Kroki con su estado de circuito (closed -> open -> half-open)"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.state = Endpoint.CLOSED
+        self.opened_at = 0.0
+
+    def __repr__(self):
+        return f"<Endpoint {self.url} {self.state} outstanding={self.outstanding}>"
+
+class EndpointPool:
+    """Reparte peticiones entre varios servidores Kroki: menor nº de peticiones en curso,
+    circuit breaker que expulsa nodos que fallan y sondas /health periódicas para readmitirlos."""
+    def __init__(self, urls, failure_threshold=3, cooldown=30, health_interval=15, session=None, timeout=5):
+        if isinstance(urls, str):
+            urls = [urls]
+        self.endpoints = [Endpoint(u) for u in dict.fromkeys(urls) if u]
+        if not self.endpoints:
+            raise ValueError("Se necesita al menos un endpoint de Kroki")
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = cooldown
+        self.health_interval = health_interval
+        self.session = session
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._next = 0
+        self._probe_thread = None
+        self._stop = threading.Event()
+
+    def _available(self, endpoint, now):
+        if endpoint.state == Endpoint.OPEN and now - endpoint.opened_at >= self.cooldown:
+            # Pasado el enfriamiento se deja pasar una petición de prueba
+            endpoint.state = Endpoint.HALF_OPEN
+        return endpoint.state != Endpoint.OPEN
+
+    def acquire(self, exclude=()):
+        """Elige el endpoint sano con menos peticiones en curso (evitando `exclude` si hay alternativa)"""
+        with self._lock:
+            now = time.monotonic()
+            healthy = [e for e in self.endpoints if self._available(e, now)]
+            candidates = [e for e in healthy if e not in exclude] or healthy
+            if not candidates:
+                raise NoEndpointAvailable("Todos los servidores Kroki están fuera de servicio")
+            # Desempate rotatorio para no cargar siempre el primero de la lista
+            self._next = (self._next + 1) % len(self.endpoints)
+            order = {e: (i - self._next) % len(self.endpoints) for i, e in enumerate(self.endpoints)}
+            endpoint = min(candidates, key=lambda e: (e.outstanding, order[e]))
+            endpoint.outstanding += 1
+            return endpoint
+
+    def has_alternative(self, exclude):
+        """¿Queda algún endpoint sano que no se haya probado todavía?"""
+        with self._lock:
+            now = time.monotonic()
+            return any(e not in exclude and self._available(e, now) for e in self.endpoints)
+
+    def release(self, endpoint, ok):
+        with self._lock:
+            endpoint.outstanding -= 1
+            self._mark(endpoint, ok)
+
+    def _mark(self, endpoint, ok):
+        if ok:
+            endpoint.consecutive_failures = 0
+            if endpoint.state != Endpoint.CLOSED:
+                log(f"    [KROKI] {endpoint.url} vuelve a estar disponible")
+            endpoint.state = Endpoint.CLOSED
+            return
+        endpoint.consecutive_failures += 1
+        if endpoint.state == Endpoint.HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+            if not any(e is not endpoint and e.state != Endpoint.OPEN for e in self.endpoints):
+                # Último servidor disponible (p.ej. el único configurado): expulsarlo haría fallar todo
+                # durante el enfriamiento; se sigue usando y los reintentos con backoff se encargan
+                endpoint.state = Endpoint.CLOSED
+                return
+            if endpoint.state != Endpoint.OPEN:
+                log(f"    [KROKI] {endpoint.url} expulsado tras {endpoint.consecutive_failures} fallos")
+            endpoint.state = Endpoint.OPEN
+            endpoint.opened_at = time.monotonic()
+
+    def start_health_checks(self):
+        """Arranca (una vez) el hilo de sondas; solo tiene sentido con varios endpoints"""
+        if self._probe_thread or self.health_interval <= 0 or len(self.endpoints) < 2 or self.session is None:
+            return
+        self._probe_thread = threading.Thread(target=self._probe_loop, name="kroki-health", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for endpoint in self.endpoints:
+                ok = self.probe(endpoint)
+                with self._lock:
+                    self._mark(endpoint, ok)
+
+    def probe(self, endpoint):
+        try:
+            response = self.session.get(f"{endpoint.url}/health", timeout=self.timeout)
+            return response.status_code == 200
+        except requests.RequestException:
+            return False
+
+    def stop(self):
+        self._stop.set()
+
+    def describe(self):
+        return ", ".join(e.url for e in self.endpoints)
+
+class KrokiClient:
+    """Cliente HTTP de Kroki con conexiones reutilizadas, peticiones concurrentes acotadas
+    y reintentos con backoff exponencial."""
+    def __init__(self, endpoints="https://kroki.io", timeout=120, max_in_flight=4, retries=3, backoff=0.5,
+                 failure_threshold=3, cooldown=30, health_interval=15, transport="plain", max_url_length=4096):
+        self.timeout = timeout
+        self.transport = transport if transport in TRANSPORTS else "plain"
+        self.max_url_length = max_url_length
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.stats = LatencyStats()
+
+        # Una sola sesión: keep-alive + TLS reutilizado entre diagramas
+        self.session = requests.Session()
+        n_hosts = 1 if isinstance(endpoints, str) else max(1, len(endpoints))
+        adapter = HTTPAdapter(pool_connections=n_hosts, pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.pool = EndpointPool(endpoints, failure_threshold, cooldown, health_interval, self.session)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="kroki")
+
+    @property
+    def base_url(self):
+        return self.pool.describe()
+
+    @staticmethod
+    def url_for(base_url, engine, output_format):
+        return f"{base_url}/{engine}/{output_format}"
+
+    def prepare(self, payload):
+        """Decide cómo viaja el diagrama. Devuelve (método, datos, cabeceras extra).
+        En GET los datos son el diagrama comprimido en base64url (formato de URL de Kroki).
+        `payload` son bytes o un DiagramSpool; si el spool está en disco los datos son el propio spool
+        y el cuerpo se envía en streaming (ver _body)"""
+        if getattr(payload, "path", None) is not None:
+            if self.transport == "compressed":
+                log(f"    [KROKI] POST en streaming (deflate, chunked): {payload.size} bytes desde disco")
+                return "POST", payload, {'Content-Encoding': 'deflate'}
+            log(f"    [KROKI] POST en streaming: {payload.size} bytes desde disco")
+            return "POST", payload, {}
+        if not isinstance(payload, bytes):
+            payload = payload.read()
+
+        if self.transport == "plain":
+            return "POST", payload, {}
+
+        compressed = zlib.compress(payload, 9)
+        encoded = base64.urlsafe_b64encode(compressed)
+        longest_base = max(len(e.url) for e in self.pool.endpoints)
+        if len(encoded) >= len(payload):
+            # Diagramas diminutos: comprimir no compensa
+            return "POST", payload, {}
+        if longest_base + len(encoded) + 32 <= self.max_url_length:
+            method, data, extra = "GET", encoded.decode("ascii"), {}
+        elif self.transport == "compressed":
+            method, data, extra = "POST", compressed, {'Content-Encoding': 'deflate'}
+        else:
+            return "POST", payload, {}
+
+        saved = len(payload) - len(data)
+        log(f"    [KROKI] {method} comprimido: {len(payload)} -> {len(data)} bytes "
+            f"({saved * 100 // max(1, len(payload))}% ahorrado)")
+        return method, data, extra
+
+    @staticmethod
+    def _body(data, extra_headers):
+        """Cuerpo de un intento. Un spool se vuelve a abrir en cada intento: como archivo (requests lo
+        envía por bloques con Content-Length) o, comprimido, como generador (Transfer-Encoding: chunked)"""
+        if isinstance(data, (bytes, str)):
+            return data
+        if extra_headers.get('Content-Encoding') == 'deflate':
+            return _deflate_chunks(data)
+        return data.open()
+
+    @staticmethod
+    def _download(response, output_path):
+        """Bytes de la respuesta, o con `output_path` se escriben por trozos (reemplazo atómico) y se
+        devuelve el tamaño: el PDF nunca está entero en memoria"""
+        if output_path is None:
+            return response.content
+        size = 0
+        with atomic_output(output_path) as f:
+            for chunk in response.iter_content(STREAM_CHUNK):
+                f.write(chunk)
+                size += len(chunk)
+        return size
+
+    def post(self, engine, output_format, payload, headers=None, output_path=None):
+        """Envía el diagrama (bytes ASCII o DiagramSpool) con reintentos y failover entre endpoints.
+        Devuelve los bytes (o el tamaño escrito en `output_path`) o lanza excepción"""
+        headers = dict(headers or {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'X-Kroki-Optimize': 'true'
+        })
+        method, data, extra_headers = self.prepare(payload)
+        headers.update(extra_headers)
+        attempt = 0
+        tried = set()
+        while True:
+            endpoint = self.pool.acquire(exclude=tried)
+            tried.add(endpoint)
+            url = self.url_for(endpoint.url, engine, output_format)
+            started = time.perf_counter()
+            wait_min = 0.0
+            with span("http", cat="render", method=method, attempt=attempt, endpoint=endpoint.url) as http:
+                try:
+                    body = self._body(data, extra_headers)
+                    try:
+                        if method == "GET":
+                            response = self.session.get(f"{url}/{data}", timeout=self.timeout, stream=True)
+                        else:
+                            response = self.session.post(url, data=body, headers=headers, timeout=self.timeout, stream=True)
+                    finally:
+                        if hasattr(body, "close"):
+                            body.close()
+                    with response:
+                        status = response.status_code
+                        http.set(status=status)
+                        if status == 200:
+                            with span("write", cat="render"):
+                                result = self._download(response, output_path)
+                            http.set(bytes=result if output_path is not None else len(result))
+                        else:
+                            result = None
+                except requests.RequestException as e:
+                    http.set(error=type(e).__name__)
+                    self.stats.record(time.perf_counter() - started, ok=False)
+                    self.pool.release(endpoint, ok=False)
+                    if attempt >= self.retries:
+                        raise
+                except Exception:
+                    # Fallo local (p.ej. al escribir el PDF): el servidor no tiene la culpa
+                    self.stats.record(time.perf_counter() - started, ok=False)
+                    self.pool.release(endpoint, ok=True)
+                    raise
+                else:
+                    ok = status == 200
+                    self.stats.record(time.perf_counter() - started, ok=ok)
+                    # Un 4xx es culpa del diagrama, no del servidor: no cuenta para el circuit breaker
+                    self.pool.release(endpoint, ok=status not in RETRY_STATUS)
+                    if ok:
+                        return result
+                    if status not in RETRY_STATUS or attempt >= self.retries:
+                        raise KrokiHTTPError(status)
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        wait_min = float(retry_after)
+
+            # Con otro endpoint sano disponible el reintento es inmediato (failover); si no, backoff
+            if self.pool.has_alternative(tried):
+                attempt += 1
+                self.stats.record_retry()
+                continue
+            tried.clear()
+            self._sleep(attempt, wait_min)
+            attempt += 1
+            self.stats.record_retry()
+
+    def _sleep(self, attempt, minimum=0.0):
+        time.sleep(max(minimum, self.backoff * (2 ** attempt)))
+
+    def submit(self, engine, output_format, payload, headers=None, output_path=None):
+        """Encola un POST. Bloquea si ya hay `max_in_flight` peticiones en curso (contrapresión)"""
+        self.pool.start_health_checks()
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self.post, engine, output_format, payload, headers, output_path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self):
+        self.pool.stop()
+        self._pool.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,120 @@
+import os
+import json
+from core.cache import content_digest, pyflowchart_version, FRAGMENT_FORMAT
+from core.graph import DIAGRAM_FORMAT
+from core.partition import partition_settings
+from core.utils import atomic_output, log
+
+# Manifiesto de compilación que se guarda junto a los PDF de cada carpeta
+MANIFEST_FILENAME = ".diagramas_manifest.json"
+MANIFEST_FORMAT = 1
+
+def file_digest(path):
+    """SHA-256 del contenido de un archivo (None si no se puede leer)"""
+    try:
+        with open(path, "rb") as f:
+            return content_digest(f.read())
+    except OSError:
+        return None
+
+def build_settings(engine, renderer, theme, simplify, inner, conds_align):
+    """Opciones que influyen en el PDF: si cambia alguna, hay que regenerarlo"""
+    return {
+        "engine": engine,
+        "renderer": renderer,
+        "theme": theme,
+        "simplify": bool(simplify),
+        "inner": bool(inner),
+        "conds_align": bool(conds_align),
+        "fragment_format": FRAGMENT_FORMAT,
+        "diagram_format": DIAGRAM_FORMAT,
+        "pyflowchart": pyflowchart_version(),
+        "partition": partition_settings() if engine == "graphviz" else None,
+    }
+
+class BuildManifest:
+    """Salida PDF -> hashes de los archivos de su bundle + opciones usadas (una carpeta de salida)"""
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_FILENAME)
+        self.outputs = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("format") == MANIFEST_FORMAT:
+            self.outputs = data.get("outputs", {})
+
+    def _key(self, path):
+        return os.path.relpath(path, self.folder).replace(os.sep, "/")
+
+    def check(self, out_name, bundle, stats, settings):
+        """¿Hay que regenerar `out_name`? Devuelve (motivo, hashes actuales) o (None, hashes) si está al día.
+        `stats` es {ruta: (tamaño, mtime)}: un archivo con el mismo tamaño y mtime no se vuelve a leer."""
+        entry = self.outputs.get(out_name)
+        previous = entry.get("inputs", {}) if entry else {}
+        inputs = {}
+        changed = []
+        for path in bundle:
+            key = self._key(path)
+            stat = stats.get(path)
+            old = previous.get(key)
+            if old and stat and [old[1], old[2]] == list(stat):
+                inputs[key] = old
+                continue
+            digest = file_digest(path)
+            inputs[key] = [digest, stat[0] if stat else None, stat[1] if stat else None]
+            if not old or old[0] != digest:
+                changed.append(key)
+
+        if entry is None:
+            return "nueva salida", inputs
+        if not os.path.exists(os.path.join(self.folder, out_name)):
+            return "el PDF no existe", inputs
+        if entry.get("settings") != settings:
+            changed_opts = sorted(k for k in settings if entry.get("settings", {}).get(k) != settings[k])
+            return f"opciones cambiadas ({', '.join(changed_opts)})", inputs
+        removed = sorted(set(previous) - set(inputs))
+        if changed or removed:
+            parts = []
+            if changed:
+                parts.append("modificados: " + ", ".join(sorted(changed)))
+            if removed:
+                parts.append("eliminados: " + ", ".join(removed))
+            return "archivos " + "; ".join(parts), inputs
+        if inputs != previous:
+            # Solo cambió el mtime: se guarda para no volver a leerlos la próxima vez
+            entry["inputs"] = inputs
+            self.dirty = True
+        return None, inputs
+
+    def inputs_of(self, out_name):
+        """Rutas de los archivos del bundle con el que se generó `out_name` la última vez (None si no consta)"""
+        entry = self.outputs.get(out_name)
+        if entry is None:
+            return None
+        return {os.path.normpath(os.path.join(self.folder, key)) for key in entry.get("inputs", {})}
+
+    def record(self, out_name, inputs, settings):
+        self.outputs[out_name] = {"inputs": inputs, "settings": settings}
+        self.dirty = True
+
+    def forget(self, out_name):
+        if self.outputs.pop(out_name, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        """Escritura atómica del manifiesto (solo si ha cambiado)"""
+        if not self.dirty:
+            return
+        try:
+            with atomic_output(self.path, "w", encoding="utf-8") as f:
+                json.dump({"format": MANIFEST_FORMAT, "outputs": self.outputs}, f, indent=1, sort_keys=True)
+            self.dirty = False
+        except OSError as e:
+            log(f"    [!] No se pudo guardar el manifiesto '{self.path}': {e}")
@@ -0,0 +1,92 @@
+import os
+import threading
+from functools import partial
+from concurrent.futures import Future
+from core.config import get_config
+from core.utils import log
+from core.tracing import child_context, traced_call
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_pool_broken = False
+
+def resolve_workers(workers=None):
+    """Nº de procesos de análisis: parámetro > configuración > núcleos disponibles"""
+    if workers is None:
+        workers = get_config().get("analysis_workers")
+    if not workers:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+def get_process_pool(workers=None):
+    """Pool de procesos compartido (None si solo hay 1 worker o el pool no se pudo crear)"""
+    global _pool, _pool_workers, _pool_broken
+    workers = resolve_workers(workers)
+    if workers <= 1 or _pool_broken:
+        return None
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            # multiprocessing solo se carga cuando de verdad hace falta el pool
+            from concurrent.futures import ProcessPoolExecutor
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+                _pool_workers = workers
+            except (OSError, NotImplementedError, ValueError) as e:
+                log(f"    [!] No se pudo crear el pool de procesos ({e}); se analiza en serie")
+                _pool_broken = True
+                return None
+        return _pool
+
+def submit_task(func, *args, workers=None):
+    """Ejecuta func(*args) en el pool; sin pool lo ejecuta ya, en este proceso"""
+    pool = get_process_pool(workers)
+    if pool is not None:
+        try:
+            # Con trazas activas el proceso del pool registra sus spans para la misma sesión
+            events_dir = child_context()
+            if events_dir is not None:
+                return pool.submit(traced_call, events_dir, func, *args)
+            return pool.submit(func, *args)
+        except Exception as e:
+            log(f"    [!] Pool de procesos no disponible ({e}); se analiza en serie")
+            _mark_broken()
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def parallel_map(func, items, workers=None):
+    """map() en paralelo conservando el orden de entrada (fusión determinista).
+    Con un solo elemento o un solo núcleo se ejecuta en serie."""
+    items = list(items)
+    pool = get_process_pool(workers) if len(items) > 1 else None
+    if pool is not None:
+        events_dir = child_context()
+        task = partial(traced_call, events_dir, func) if events_dir is not None else func
+        try:
+            return list(pool.map(task, items))
+        except Exception as e:
+            log(f"    [!] Fallo en el pool de procesos ({e}); se repite en serie")
+            _mark_broken()
+    return [func(item) for item in items]
+
+def _mark_broken():
+    global _pool, _pool_broken
+    with _pool_lock:
+        _pool_broken = True
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
@@ -0,0 +1,326 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from core.graph import DiagramGraph
+from core.config import get_config
+from core.utils import escape_dot_label, atomic_output, log
+from core.tracing import span
+from core.renderer import (
+    DOT_HEADER,
+    iter_dot,
+    iter_text_chunks,
+    spool_diagram,
+    spool_directory,
+    submit_pdf_from_diagram
+)
+
+# Estimación del tamaño DOT de cada nodo/arista además del id y la etiqueta (atributos de estilo)
+NODE_DOT_OVERHEAD = 70
+EDGE_DOT_OVERHEAD = 12
+
+PARTITION_OUTPUTS = ("merged", "pages")
+
+def partition_settings():
+    """Límites de tamaño de un diagrama antes de dividirlo en páginas (None si está desactivado)"""
+    config = get_config()
+    if not config.get("partition", True):
+        return None
+    output = config.get("partition_output", "merged")
+    return {
+        "max_nodes": int(config.get("partition_max_nodes") or 0),
+        "max_edges": int(config.get("partition_max_edges") or 0),
+        "max_kb": int(config.get("partition_max_kb") or 0),
+        "output": output if output in PARTITION_OUTPUTS else "merged",
+    }
+
+def page_path(output_path, number):
+    """Ruta del PDF de la página `number` (1..N) cuando se generan por separado"""
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_p{number}{ext or '.pdf'}"
+
+class PartitionedDiagram:
+    """Diagrama demasiado grande dividido en páginas: un DiagramSpool por página más la página resumen.
+    Lo devuelve el análisis en lugar de un único DiagramSpool"""
+    def __init__(self, overview, pages):
+        self.overview = overview
+        self.pages = pages
+        self.size = overview.size + sum(page.size for page in pages)
+
+    def __len__(self):
+        return self.size
+
+    def discard(self):
+        self.overview.discard()
+        for page in self.pages:
+            page.discard()
+
+class _Size:
+    """Nodos, aristas y bytes DOT estimados de un trozo del grafo"""
+    __slots__ = ("nodes", "edges", "bytes")
+
+    def __init__(self, nodes=0, edges=0, size=0):
+        self.nodes = nodes
+        self.edges = edges
+        self.bytes = size
+
+    def __add__(self, other):
+        return _Size(self.nodes + other.nodes, self.edges + other.edges, self.bytes + other.bytes)
+
+    def fits(self, limits):
+        return ((not limits["max_nodes"] or self.nodes <= limits["max_nodes"]) and
+                (not limits["max_edges"] or self.edges <= limits["max_edges"]) and
+                (not limits["max_kb"] or self.bytes <= limits["max_kb"] * 1024))
+
+def _units(graph):
+    """Unidades indivisibles: componentes conexas (por aristas dentro del mismo cluster) de cada cluster.
+    Cada función (cabecera + su flowchart) y el código ROOT de un archivo son una unidad.
+    Devuelve [(cluster, índices de nodo, _Size)] en el orden original"""
+    count = len(graph.node_ids)
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = {node_id: i for i, node_id in enumerate(graph.node_ids)}
+    internal = []
+    for e, (src, dst) in enumerate(zip(graph.edge_src, graph.edge_dst)):
+        a, b = index.get(src), index.get(dst)
+        if a is None or b is None or graph.node_clusters[a] != graph.node_clusters[b]:
+            continue
+        internal.append((e, a))
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}  # raíz -> índices de nodo (en orden de aparición)
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    sizes = {root: _Size(len(nodes), 0, sum(len(graph.node_ids[i]) + len(graph.node_labels[i]) + NODE_DOT_OVERHEAD
+                                            for i in nodes))
+             for root, nodes in groups.items()}
+    for e, a in internal:
+        size = sizes[find(a)]
+        size.edges += 1
+        size.bytes += len(graph.edge_src[e]) + len(graph.edge_dst[e]) + len(graph.edge_labels[e]) + EDGE_DOT_OVERHEAD
+    return [(graph.node_clusters[nodes[0]], nodes, sizes[root]) for root, nodes in groups.items()]
+
+def plan_pages(graph, limits):
+    """Reparte las unidades en páginas respetando los límites. Un archivo entero va a una sola página si
+    cabe; si no, se corta entre funciones. Devuelve listas de índices de nodo por página, o None si el
+    diagrama ya cabe en una"""
+    units = _units(graph)
+    total = _Size()
+    for _, _, size in units:
+        total = total + size
+    if total.fits(limits):
+        return None
+
+    # Unidades agrupadas por cluster, conservando el orden
+    clusters = {}
+    for cluster, nodes, size in units:
+        clusters.setdefault(cluster, []).append((nodes, size))
+
+    pages = []
+    current = []
+    used = _Size()
+    for cluster_units in clusters.values():
+        cluster_size = _Size()
+        for _, size in cluster_units:
+            cluster_size = cluster_size + size
+        if current and not (used + cluster_size).fits(limits) and cluster_size.fits(limits):
+            # El archivo cabe entero en una página nueva: mejor no partirlo
+            pages.append(current)
+            current, used = [], _Size()
+        for nodes, size in cluster_units:
+            if current and not (used + size).fits(limits):
+                pages.append(current)
+                current, used = [], _Size()
+            current.extend(nodes)
+            used = used + size
+    if current:
+        pages.append(current)
+    return pages if len(pages) > 1 else None
+
+def _page_graph(graph, nodes, number, cluster_parts):
+    """Subgrafo de una página: sus nodos y las aristas con ambos extremos en ella"""
+    page = DiagramGraph()
+    members = set()
+    for i in sorted(nodes):
+        cluster = graph.node_clusters[i]
+        if cluster is not None and cluster not in page.clusters:
+            title = graph.clusters.get(cluster, str(cluster))
+            numbers = cluster_parts.get(cluster, ())
+            if len(numbers) > 1:
+                title = f"{title} (parte {numbers.index(number) + 1}/{len(numbers)})"
+            page.add_cluster(cluster, title)
+        page.add_node(graph.node_ids[i], graph.node_kinds[i], graph.node_labels[i], cluster, graph.node_limits[i])
+        members.add(graph.node_ids[i])
+    for src, dst, label, style in graph.edges():
+        if src in members and dst in members:
+            page.add_edge(src, dst, label, style)
+    return page
+
+def _overview_lines(graph, pages, output_path, linked):
+    """DOT de la página resumen: un nodo por archivo agrupado por página, con las aristas entre archivos
+    (y, si las páginas son PDFs separados, un enlace a cada una)"""
+    cluster_pages = {}
+    cluster_nodes = {}
+    for number, nodes in enumerate(pages, 1):
+        for i in nodes:
+            cluster = graph.node_clusters[i]
+            cluster_pages.setdefault(cluster, [])
+            if number not in cluster_pages[cluster]:
+                cluster_pages[cluster].append(number)
+            cluster_nodes[cluster] = cluster_nodes.get(cluster, 0) + 1
+
+    node_cluster = dict(zip(graph.node_ids, graph.node_clusters))
+    links = {}
+    for src, dst in zip(graph.edge_src, graph.edge_dst):
+        a, b = node_cluster.get(src), node_cluster.get(dst)
+        if a != b:
+            links[(a, b)] = links.get((a, b), 0) + 1
+
+    def file_id(cluster):
+        return f"file_{cluster}" if cluster is not None else "file_main"
+
+    yield from DOT_HEADER
+    for number in range(1, len(pages) + 1):
+        yield f"    subgraph cluster_page_{number} {{"
+        yield f'        label = "Pagina {number}";'
+        yield '        style=filled;'
+        yield '        color="#F5F5F5";'
+        yield '        fontsize=14;'
+        for cluster, numbers in cluster_pages.items():
+            if numbers[0] != number:
+                continue
+            title = graph.clusters.get(cluster, "main") if cluster is not None else "main"
+            where = f"pagina {numbers[0]}" if len(numbers) == 1 else f"paginas {numbers[0]}-{numbers[-1]}"
+            label = escape_dot_label(f"{title}\n{cluster_nodes[cluster]} nodos, {where}", limit=80)
+            url = f', URL="{escape_dot_label(os.path.basename(page_path(output_path, number)))}"' if linked else ""
+            yield f'        {file_id(cluster)} [label="{label}", shape=folder, style=filled, fillcolor="#E1F5FE"{url}];'
+        yield "    }"
+        yield ''
+    for (a, b), count in links.items():
+        yield f'    {file_id(a)} -> {file_id(b)} [label="{count}"];'
+    yield "}"
+
+def partition_graph(graph, output_path="", engine="graphviz", limits=None):
+    """Si el grafo supera los límites lo divide en páginas y devuelve un PartitionedDiagram; si no, None"""
+    limits = limits or partition_settings()
+    if limits is None or engine != "graphviz" or not len(graph):
+        return None
+    pages = plan_pages(graph, limits)
+    if pages is None:
+        return None
+
+    cluster_parts = {}  # cluster -> páginas que lo contienen (para "parte k/n")
+    for number, nodes in enumerate(pages, 1):
+        for cluster in dict.fromkeys(graph.node_clusters[i] for i in nodes):
+            if cluster is not None:
+                cluster_parts.setdefault(cluster, []).append(number)
+
+    spools = [spool_diagram(iter_text_chunks(iter_dot(_page_graph(graph, nodes, number, cluster_parts))), engine)
+              for number, nodes in enumerate(pages, 1)]
+    # Enlaces a cada página solo si acabarán siendo PDFs separados
+    linked = limits["output"] == "pages" or _pdf_writer() is None
+    overview = spool_diagram(iter_text_chunks(_overview_lines(graph, pages, output_path, linked)), engine)
+    return PartitionedDiagram(overview, spools)
+
+def _pdf_writer():
+    """pypdf (opcional) para unir las páginas en un solo PDF"""
+    try:
+        from pypdf import PdfWriter
+        return PdfWriter
+    except ImportError:
+        return None
+
+def _gather(futures, finish):
+    """Future que resuelve con finish(lista de resultados) cuando terminan todos"""
+    outer = Future()
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def _done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            outer.set_result(finish([f.exception() is None and f.result() for f in futures]))
+        except BaseException as e:
+            outer.set_exception(e)
+
+    for future in futures:
+        future.add_done_callback(_done)
+    return outer
+
+def _remove_stale_pages(output_path, first):
+    """Borra las páginas sueltas de una generación anterior a partir de `first`"""
+    number = first
+    while os.path.exists(page_path(output_path, number)):
+        try:
+            os.remove(page_path(output_path, number))
+        except OSError:
+            break
+        number += 1
+
+def submit_partitioned_pdf(diagram, output_path, simulacion=False, engine="graphviz", renderer=None):
+    """Renderiza en paralelo el resumen y las páginas de un PartitionedDiagram. Con partition_output="merged"
+    (y pypdf instalado) se unen en `output_path`; si no, el resumen va a `output_path` y cada página a
+    <nombre>_p1.pdf, <nombre>_p2.pdf, ... Devuelve un Future con True/False"""
+    settings = partition_settings() or {"output": "merged"}
+    count = len(diagram.pages)
+    writer_class = _pdf_writer() if settings["output"] == "merged" else None
+    if settings["output"] == "merged" and writer_class is None:
+        log("    [!] pypdf no está instalado: las páginas se guardan como PDFs separados")
+    log(f"    [PARTICIÓN] Diagrama demasiado grande ({diagram.size} chars): resumen + {count} páginas")
+
+    work_dir = None
+    if writer_class is not None and not simulacion:
+        work_dir = tempfile.mkdtemp(dir=spool_directory(), prefix="pages_")
+        paths = [os.path.join(work_dir, f"{n}.pdf") for n in range(count + 1)]
+    else:
+        paths = [output_path] + [page_path(output_path, n) for n in range(1, count + 1)]
+
+    futures = [submit_pdf_from_diagram(spool, path, simulacion, engine, renderer)
+               for spool, path in zip([diagram.overview] + diagram.pages, paths)]
+
+    def _finish(results):
+        try:
+            failed = [n for n, ok in enumerate(results) if not ok]
+            if failed:
+                names = ", ".join("resumen" if n == 0 else f"página {n}" for n in failed)
+                log(f"    [!] Fallaron {len(failed)} de {count + 1} partes del diagrama: {names}")
+                if work_dir is not None:
+                    # Conservar el DOT de las partes fallidas junto al PDF de salida
+                    for n in failed:
+                        debug = paths[n] + ".debug.dot"
+                        if os.path.exists(debug):
+                            shutil.move(debug, (output_path if n == 0 else page_path(output_path, n)) + ".debug.dot")
+                return False
+            if simulacion:
+                return True
+            if work_dir is not None:
+                with span("merge", cat="render", pages=count + 1):
+                    writer = writer_class()
+                    for n, path in enumerate(paths):
+                        writer.append(path, outline_item="Resumen" if n == 0 else f"Página {n}")
+                    with atomic_output(output_path) as f:
+                        writer.write(f)
+                _remove_stale_pages(output_path, 1)
+            else:
+                _remove_stale_pages(output_path, count + 1)
+            return True
+        except Exception as e:
+            log(f"    [!] Error uniendo las páginas del diagrama: {e}")
+            return False
+        finally:
+            if work_dir is not None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    return _gather(futures, _finish)
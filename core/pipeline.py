@@ -0,0 +1,420 @@
+import os
+import time
+from concurrent.futures import Future
+from core.utils import extract_number, should_process, log
+from core.scanner import open_index
+from core.imports import ImportGraph
+from core.analyzer import submit_bundle_analysis
+from core.renderer import submit_pdf_from_diagram, reset_render_cache_stats, print_render_cache_stats
+from core.parallel import resolve_workers
+from core.manifest import BuildManifest, build_settings
+from core.config import get_config
+from core.tracing import TraceSession, PROFILE_MODES, span
+
+# Extensiones que se detectan automáticamente al elegir una carpeta
+SUPPORTED_EXTENSIONS = ['py', 'java', 'js', 'cpp', 'c', 'h', 'cs', 'php', 'html', 'css', 'ts', 'txt']
+
+class PipelineOptions:
+    """Todas las opciones de una ejecución (las mismas que ofrece la GUI)"""
+    def __init__(self, target_dir, nombre_base="", output_name="Diagrama", num_pos=False, simulacion=False,
+                 recursive=True, engine="graphviz", renderer=None, extensions="py", rango_inicio=None, rango_fin=None,
+                 theme="default", simplify=False, inner=True, conds_align=True, workers=None, force=False,
+                 changed_paths=None, trace=None, profile=None):
+        self.target_dir = target_dir
+        self.nombre_base = nombre_base or ""
+        self.output_name = output_name or "Diagrama"
+        self.num_pos = num_pos
+        self.simulacion = simulacion
+        self.recursive = recursive
+        self.engine = engine
+        self.renderer = renderer
+        self.extensions = extensions
+        self.rango_inicio = rango_inicio
+        self.rango_fin = rango_fin
+        self.theme = theme
+        self.simplify = simplify
+        self.inner = inner
+        self.conds_align = conds_align
+        self.workers = workers
+        self.force = force  # regenerar aunque el manifiesto diga que la salida está al día
+        self.changed_paths = changed_paths  # modo watch: solo las semillas cuyo bundle incluye estas rutas
+        self.trace = trace      # True / ruta del JSON de trazas (None -> lo que diga la config)
+        self.profile = profile  # "cpu" / "memory" (None -> lo que diga la config)
+
+class SeedJob:
+    """Una semilla a generar: su bundle, el PDF de salida y el estado incremental"""
+    def __init__(self, seed, folder, bundle, out_name, stats):
+        self.seed = seed
+        self.folder = folder
+        self.bundle = bundle
+        self.out_name = out_name
+        self.output_path = os.path.join(folder, out_name)
+        self.stats = stats      # {ruta: (tamaño, mtime)} según el índice
+        self.inputs = None      # hashes de los archivos del bundle (manifiesto)
+        self.reason = None      # por qué se regenera
+
+class PipelineResult:
+    """Resumen de una ejecución"""
+    def __init__(self):
+        self.seeds = 0
+        self.processed = 0
+        self.skipped = []
+        self.succeeded = []
+        self.failed = []
+        self.cancelled = []     # semillas sin generar por una cancelación
+        self.elapsed = 0.0
+        self.error = None
+
+    @property
+    def success_count(self):
+        return len(self.succeeded)
+
+def detect_folder_content(folder, recursive=True):
+    """Extensiones soportadas presentes en la carpeta y rango numérico (min, max) de sus archivos"""
+    with open_index(folder, recursive) as index:
+        return (index.extensions(recursive, SUPPORTED_EXTENSIONS),
+                index.number_range(recursive, SUPPORTED_EXTENSIONS))
+
+def resolve_extensions(nombre_base, ext_str):
+    """Tupla de extensiones válidas ('.py', ...). Si el filtro de nombre trae extensión, manda esa.
+    Devuelve (extensiones, extensión autodetectada o None)"""
+    autodetected = None
+    if "." in nombre_base:
+        _, autodetect_ext = os.path.splitext(nombre_base)
+        if autodetect_ext:
+            autodetected = autodetect_ext.replace(".", "")
+            ext_str = autodetected
+
+    valid_exts = tuple(f".{e.strip().replace('.', '')}" for e in (ext_str or "").split(',') if e.strip())
+    if not valid_exts: valid_exts = ('.py',)
+    return valid_exts, autodetected
+
+def find_seed_files(index, options, valid_exts):
+    """Archivos semilla que pasan los filtros, ordenados por número"""
+    valid_files = []
+    numbers = {}
+    for f_path, f_name, _, number in index.files(options.recursive):
+        if not f_name.lower().endswith(valid_exts):
+            continue
+        if f_name == "generador_diagramas3000.py":
+            continue
+        if should_process(f_name, options.nombre_base, options.num_pos, options.rango_inicio, options.rango_fin):
+            valid_files.append(f_path)
+            numbers[f_path] = number
+
+    try:
+        valid_files.sort(key=lambda x: numbers[x] if numbers[x] is not None else x)
+    except:
+        valid_files.sort()
+    return valid_files
+
+def group_by_dir(valid_files):
+    grouped_by_dir = {}
+    for vf in valid_files:
+        parent = os.path.dirname(vf)
+        if parent not in grouped_by_dir:
+            grouped_by_dir[parent] = []
+        grouped_by_dir[parent].append(vf)
+    return grouped_by_dir
+
+def build_bundle(index, seed, valid_exts, imports=None):
+    """Semilla + lo que importa (grafo de imports, archivos Python) o, si no, + archivos de las subcarpetas de su carpeta"""
+    if imports is not None and seed.lower().endswith(".py"):
+        return list(imports.transitive(seed))
+    project_bundle = [seed]
+    for subfile_path, subfile in index.subfolder_files(os.path.dirname(seed)):
+        if subfile.lower().endswith(valid_exts) and subfile_path not in project_bundle:
+            project_bundle.append(subfile_path)
+    return project_bundle
+
+def output_name_for(seed_name, output_name_user):
+    n = extract_number(seed_name)
+    if n is not None:
+        return f"{output_name_user} {n}.pdf"
+    base_no_ext = os.path.splitext(seed_name)[0]
+    return f"{output_name_user}_{base_no_ext}.pdf"
+
+def plan_bundles(options, valid_exts):
+    """Recorre la carpeta una vez (índice) y decide los bundles a generar.
+    Devuelve (archivos semilla válidos, lista de SeedJob)"""
+    with span("scan", recursive=options.recursive):
+        index = open_index(options.target_dir, options.recursive)
+    with index, span("bundle") as bundle_span:
+        valid_files = find_seed_files(index, options, valid_exts)
+        # Un solo grafo de imports por ejecución: cada archivo se parsea una vez aunque lo usen varias semillas
+        imports = ImportGraph(index) if get_config().get("bundle_mode", "imports") == "imports" else None
+        jobs = []
+        for folder, seed_files in group_by_dir(valid_files).items():
+            # Cada semilla tiene su diagrama aunque otra semilla de la carpeta la importe
+            for seed in seed_files:
+                project_bundle = build_bundle(index, seed, valid_exts, imports)
+                stats = {path: index.stat(path) for path in project_bundle}
+                jobs.append(SeedJob(seed, folder, project_bundle, output_name_for(os.path.basename(seed), options.output_name), stats))
+        bundle_span.set(seeds=len(valid_files), jobs=len(jobs))
+        if imports is not None and imports.parsed + imports.reused:
+            log(f"Grafo de imports: {imports.parsed} archivos analizados, {imports.reused} reutilizados del índice")
+    return valid_files, jobs
+
+def read_bundle(project_bundle):
+    """Lista (nombre, código) de los archivos no vacíos del bundle"""
+    data_payload = []
+    with span("read", files=len(project_bundle)) as read:
+        for py_file in project_bundle:
+             try:
+                with open(py_file, 'r', encoding='utf-8') as f:
+                    fname = os.path.basename(py_file)
+                    fcode = f.read()
+                    if fcode.strip():
+                        data_payload.append((fname, fcode))
+             except (OSError, UnicodeDecodeError) as e:
+                log(f"    [!] No se pudo leer {py_file}: {e}")
+        read.set(bytes=sum(len(code) for _, code in data_payload))
+    return data_payload
+
+def trace_path_for(options):
+    """Ruta del JSON de trazas de esta ejecución (None si las trazas están desactivadas)"""
+    trace = options.trace if options.trace is not None else get_config().get("trace", False)
+    if not trace:
+        return None
+    if isinstance(trace, str):
+        return trace
+    folder = get_config().get("trace_dir") or options.target_dir
+    return os.path.join(folder, f"traza_diagramas_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+def run_pipeline(options, progress=None, control=None):
+    """Ejecuta el proceso completo: escaneo -> bundles -> análisis -> render -> escritura.
+    `progress(evento)` recibe dicts con la clave "event" (start, seed_queued, seed_skipped, seed_done,
+    seed_retry, finish). `control` (core.jobs.RunControl) permite pausar, reanudar y cancelar entre semillas.
+    Con trazas activadas (options.trace / config "trace") escribe un JSON de Chrome trace y un resumen por
+    etapa; con options.profile ("cpu"/"memory") añade el perfil del proceso principal"""
+    profile = options.profile if options.profile is not None else get_config().get("profile")
+    profile = profile if profile in PROFILE_MODES else None
+    if profile and options.workers != 1:
+        # El perfil solo ve este proceso: el análisis se hace aquí en lugar de en el pool
+        log("[PERFIL] Análisis en serie (1 proceso) para que el perfil incluya todas las etapas")
+        options.workers = 1
+    session = TraceSession(trace_path_for(options), profile)
+    if session.trace_path is None and session.profile is None:
+        return _run_pipeline(options, progress, control)
+    session.start()
+    try:
+        with span("run", target=options.target_dir):
+            return _run_pipeline(options, progress, control)
+    finally:
+        session.finish()
+
+def _run_pipeline(options, progress=None, control=None):
+    result = PipelineResult()
+    started = time.perf_counter()
+
+    def emit(event, **data):
+        if progress:
+            data["event"] = event
+            progress(data)
+
+    target_dir = options.target_dir
+    reset_render_cache_stats()
+    log("\n--- INICIANDO PROCESO ---")
+    log(f"Carpeta: {target_dir}")
+    log(f"Config: Base='{options.nombre_base}', Rango={options.rango_inicio}-{options.rango_fin}, Simulación={options.simulacion}")
+
+    if not os.path.exists(target_dir):
+        log(f"Error: La carpeta '{target_dir}' no existe.")
+        result.error = "target_not_found"
+        emit("finish", processed=0, succeeded=0, failed=0, error=result.error)
+        return result
+
+    valid_exts, _ = resolve_extensions(options.nombre_base, options.extensions)
+    # Un único recorrido del árbol: filtrado, orden y bundles consultan el índice
+    valid_files, jobs = plan_bundles(options, valid_exts)
+    # Build incremental: cada carpeta de salida tiene su manifiesto
+    incremental = get_config().get("incremental", True)
+    settings = build_settings(options.engine, options.renderer or get_config().get("renderer"), options.theme,
+                              options.simplify, options.inner, options.conds_align)
+    manifests = {}
+
+    def manifest_for(folder):
+        manifest = manifests.get(folder)
+        if manifest is None:
+            manifest = manifests[folder] = BuildManifest(folder)
+        return manifest
+
+    if options.changed_paths is not None:
+        changed = {os.path.normpath(p) for p in options.changed_paths}
+        removed = {p for p in changed if not os.path.exists(p)}
+        previous_builds = {}  # carpeta -> manifiesto (solo lectura)
+
+        def affected(job):
+            if changed.intersection(os.path.normpath(p) for p in job.bundle):
+                return True
+            if not removed:
+                return False
+            # Un archivo borrado ya no está en ningún bundle: cuenta el bundle con el que se generó el PDF
+            if job.folder not in previous_builds:
+                previous_builds[job.folder] = BuildManifest(job.folder)
+            previous = previous_builds[job.folder].inputs_of(job.out_name)
+            if previous is None:
+                # Sin manifiesto: cualquier borrado en la carpeta de la semilla o sus subcarpetas
+                tree = os.path.join(os.path.normpath(job.folder), "")
+                return any(p.startswith(tree) for p in removed)
+            return not removed.isdisjoint(previous)
+
+        jobs = [job for job in jobs if affected(job)]
+        log(f"Cambios detectados en {len(changed)} archivos -> {len(jobs)} semillas afectadas")
+    result.seeds = len(jobs)
+
+    workers = resolve_workers(options.workers)
+    pending_renders = []  # (future, job): renders en curso mientras se analizan las siguientes semillas
+    pending_analysis = []  # (future, job): semillas analizándose en el pool de procesos
+    failed_jobs = []  # semillas fallidas: se reintentan al final de la ejecución
+    # Con una sola semilla no compensa el pool de procesos: se analiza en serie
+    seed_workers = workers if len(valid_files) > 1 else 1
+    emit("start", target=target_dir, seeds=len(valid_files), jobs=len(jobs), workers=seed_workers)
+
+    def collect(wait=False):
+        nonlocal pending_renders
+        pending_renders = _collect_renders(pending_renders, result, emit, manifests, settings, options,
+                                           failed_jobs, wait)
+
+    def proceed():
+        """Punto de control entre semillas: espera mientras esté en pausa (recogiendo los renders que
+        terminan). False si se canceló"""
+        if control is None:
+            return True
+        while not control.wait_resumed(0.2):
+            collect()
+        return not control.cancelled
+
+    def queue_seeds(seed_jobs, check_manifest):
+        """Lee, analiza y encola el render de cada semilla con una ventana acotada.
+        Devuelve las semillas que quedaron sin encolar por una cancelación"""
+        for i, job in enumerate(seed_jobs):
+            if not proceed():
+                return seed_jobs[i:]
+            if check_manifest and incremental:
+                manifest = manifest_for(job.folder)
+                job.reason, job.inputs = manifest.check(job.out_name, job.bundle, job.stats, settings)
+                if job.reason is None and not options.force:
+                    result.skipped.append(job.out_name)
+                    emit("seed_skipped", seed=job.seed, output=job.output_path)
+                    continue
+                job.reason = job.reason or "regeneración forzada"
+                log(f"    [REGENERAR] {job.out_name}: {job.reason}")
+
+            data_payload = read_bundle(job.bundle)
+            if not data_payload:
+                emit("seed_skipped", seed=job.seed, output=job.output_path, reason="sin código")
+                continue
+
+            if check_manifest:
+                result.processed += 1
+            try:
+                future = submit_bundle_analysis(data_payload, theme_name=options.theme, simplify=options.simplify,
+                                                inner=options.inner, conds_align=options.conds_align,
+                                                engine=options.engine, workers=seed_workers,
+                                                output_path=job.output_path)
+            except Exception as e:
+                log(f"\n    Error encolando el análisis de {job.out_name}: {e}")
+                future = Future()
+                future.set_result(None)  # se informa como fallo al recoger los renders
+            pending_analysis.append((future, job))
+            emit("seed_queued", seed=job.seed, output=job.output_path, files=len(data_payload), reason=job.reason)
+
+            # Ventana acotada: las semillas se envían a renderizar en orden según termina su análisis
+            while len(pending_analysis) > seed_workers * 2:
+                pending_renders.append(_dispatch_render(pending_analysis.pop(0), options))
+            collect()
+        return []
+
+    def drain(dropped=None):
+        """Encola los renders de lo ya analizado y espera a todos. Tras una cancelación (`dropped`, la lista
+        donde se anotan) lo que sigue en análisis se descarta"""
+        while pending_analysis:
+            future, job = pending_analysis.pop(0)
+            if dropped is not None:
+                future.cancel()
+                dropped.append(job.out_name)
+                continue
+            pending_renders.append(_dispatch_render((future, job), options))
+        collect(wait=True)
+
+    cancelled = False
+    if not valid_files:
+         log("No se encontraron archivos que coincidan con los criterios.")
+    else:
+        result.cancelled.extend(job.out_name for job in queue_seeds(jobs, check_manifest=True))
+        cancelled = control is not None and control.cancelled
+    drain(result.cancelled if cancelled else None)
+
+    # Las semillas fallidas se reintentan al final (p.ej. tras un error transitorio del servidor de render)
+    retries = get_config().get("seed_retries", 1)
+    attempt = 0
+    while failed_jobs and not cancelled and attempt < retries:
+        attempt += 1
+        retry, failed_jobs[:] = list(failed_jobs), []
+        log(f"\nReintentando {len(retry)} semillas fallidas (intento {attempt} de {retries})...")
+        for job in retry:
+            result.failed.remove(job.out_name)
+            emit("seed_retry", seed=job.seed, output=job.output_path, attempt=attempt)
+        # Si se cancela durante el reintento, lo que no llegó a hacerse sigue contando como fallido
+        result.failed.extend(job.out_name for job in queue_seeds(retry, check_manifest=False))
+        cancelled = control is not None and control.cancelled
+        drain(result.failed if cancelled else None)
+
+    if cancelled:
+        log(f"\nProceso cancelado: {len(result.cancelled)} semillas sin generar.")
+
+    with span("manifest", folders=len(manifests)):
+        for manifest in manifests.values():
+            manifest.save()
+    if incremental and jobs:
+        log(f"Incremental: {len(result.skipped)} semillas sin cambios (omitidas), {result.processed} regeneradas")
+
+    if not options.simulacion:
+        print_render_cache_stats()
+
+    result.elapsed = time.perf_counter() - started
+    emit("finish", processed=result.processed, skipped=len(result.skipped), succeeded=result.success_count,
+         failed=len(result.failed), cancelled=len(result.cancelled), elapsed=round(result.elapsed, 3))
+    return result
+
+def _dispatch_render(analysis, options):
+    """Espera el análisis de una semilla y encola su render. Devuelve (future, job)"""
+    future, job = analysis
+    try:
+        diagram = future.result()
+    except Exception as e:
+        log(f"\n    Error procesando lógica del flowchart ({job.out_name}): {type(e).__name__}: {e}")
+        diagram = None
+    if diagram is None:
+        failed = Future()
+        failed.set_result(False)
+        return failed, job
+    return submit_pdf_from_diagram(diagram, job.output_path, options.simulacion, options.engine, options.renderer), job
+
+def _collect_renders(pending, result, emit, manifests, settings, options, failed_jobs, wait=False):
+    """Informa de los renders terminados y los anota en el manifiesto (los fallidos van a `failed_jobs`).
+    Devuelve los que siguen pendientes"""
+    still_pending = []
+    for future, job in pending:
+        if not wait and not future.done():
+            still_pending.append((future, job))
+            continue
+        try:
+            ok = future.result()
+        except Exception:
+            ok = False
+        manifest = manifests.get(job.folder)
+        if ok:
+            log(f"    [ÉXITO] Hecho -> {job.out_name}")
+            result.succeeded.append(job.out_name)
+            if manifest is not None and job.inputs is not None and not options.simulacion:
+                manifest.record(job.out_name, job.inputs, settings)
+        else:
+            log(f"    [ERROR] Falló la generación ({job.out_name}).")
+            result.failed.append(job.out_name)
+            failed_jobs.append(job)
+            if manifest is not None:
+                manifest.forget(job.out_name)
+        emit("seed_done", output=job.out_name, ok=bool(ok))
+    return still_pending
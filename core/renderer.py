@@ -1,10 +1,218 @@
-import requests
+import io
+import os
 import re
-from core.utils import sanitize_id, escape_dot_label
+import time
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+from core.utils import escape_dot_label, atomic_output, log
+from core.graph import EDGE_BRANCH, EDGE_DOTTED, EDGE_CALL, graph_from_fragment
+from core.cache import get_render_cache, StreamingRenderKey
+from core.config import get_config
+from core.tracing import span, begin_async, end_async
 
-def flowchart_js_to_mermaid(flowchart_code, theme_name="default"):
-    """Convierte flowchart.js a Mermaid (legacy, usar Graphviz para más detalle)"""
-    lines = flowchart_code.splitlines()
+# Forma y color de cada tipo de nodo de pyflowchart
+NODE_STYLES = {
+    'start': ('oval', "#E3F2FD"),
+    'end': ('oval', "#FFEBEE"),
+    'operation': ('rectangle', "#FFF9C4"),
+    'inputoutput': ('parallelogram', "#E8F5E9"),
+    'condition': ('diamond', "#FFF3E0"),
+    'subroutine': ('component', "#F3E5F5"),
+    'header': ('component', "#B2EBF2"),
+    'else': ('rectangle', "#F5F5F5"),
+}
+
+def _resolve_node(node):
+    """Un NodesGroup se comporta como su nodo cabeza"""
+    from pyflowchart.node import NodesGroup
+    while isinstance(node, NodesGroup):
+        node = node.head
+    return node
+
+def walk_flowchart(flowchart):
+    """Recorre el grafo de nodos de pyflowchart (mismo orden DFS que flowchart.js).
+    Devuelve (nodos, enlaces, entrada): nodos reales, tuplas (origen, destino, etiqueta) y el primer nodo."""
+    from pyflowchart.node import Node, TransparentNode, Connection
+    nodes = []
+    links = []
+    entry = _resolve_node(flowchart.head)
+    if entry is None:
+        return nodes, links, None
+
+    visited = set()
+    stack = [entry]
+    while stack:
+        node = stack.pop()
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+
+        if isinstance(node, TransparentNode):
+            # Conexión virtual (p.ej. rama yes/no de una condición): parent -> child
+            connections = [(node.parent, node.connection)]
+        else:
+            nodes.append(node)
+            connections = [(node, c) for c in node.connections]
+
+        children = []
+        for src, conn in connections:
+            if not isinstance(conn, Connection) or not isinstance(conn.next_node, Node):
+                continue
+            dst = _resolve_node(conn.next_node)
+            if dst is None:
+                continue
+            children.append(dst)
+            if dst.node_name:
+                label = ""
+                if "yes" in conn.params:
+                    label = "yes"
+                elif "no" in conn.params:
+                    label = "no"
+                links.append((src, dst, label))
+
+        stack.extend(reversed(children))
+
+    return nodes, links, entry
+
+def _node_text(text):
+    """Texto de un nodo sin la sangría del código: pyflowchart guarda las líneas de continuación tal cual
+    y con varios niveles de anidamiento la etiqueta parecería ASCII Art (ver escape_dot_label)"""
+    if "\n" not in text:
+        return text.strip()
+    return "\n".join(line.strip() for line in text.split("\n"))
+
+def flowchart_to_fragment(flowchart):
+    """Reduce un Flowchart a un fragmento serializable con IDs locales deterministas (n0, n1, ...).
+    Formato: {"nodes": [[id, tipo, texto], ...], "links": [[origen, destino, etiqueta], ...], "entry": id}"""
+    nodes, links, entry = walk_flowchart(flowchart)
+    local_ids = {id(node): f"n{i}" for i, node in enumerate(nodes)}
+    return {
+        "nodes": [[local_ids[id(node)], node.node_type, _node_text(node.node_text)] for node in nodes],
+        "links": [[local_ids[id(src)], local_ids[id(dst)], label] for src, dst, label in links
+                  if id(src) in local_ids and id(dst) in local_ids],
+        "entry": local_ids.get(id(entry)) if entry is not None else None,
+    }
+
+# Cabecera común de los diagramas Graphviz
+DOT_HEADER = [
+    "digraph G {",
+    "    rankdir=TB;",
+    "    compound=true;",
+    "    nodesep=0.5;",
+    "    ranksep=0.7;",
+    "    node [fontname=\"Arial\", fontsize=11, style=filled, fillcolor=white];",
+    "    edge [fontname=\"Arial\", fontsize=10];",
+    ""
+]
+
+def _dot_node(node_id, kind, label, limit):
+    if kind == 'point':
+        return f'    {node_id} [label="", shape=point];'
+    text = escape_dot_label(label, limit) if limit else escape_dot_label(label)
+    if kind == 'statement':
+        return f'    {node_id} [label="{text}", shape=rectangle];'
+    shape, color = NODE_STYLES.get(kind, ('rectangle', "#FFF9C4"))
+    return f'    {node_id} [label="{text}", shape={shape}, style=filled, fillcolor="{color}"];'
+
+def _dot_edge(src, dst, label, style):
+    if style == EDGE_DOTTED:
+        return f'    {src} -> {dst} [style=dotted];'
+    if style == EDGE_CALL:
+        # constraint=false: las llamadas entre archivos no deforman el layout de cada cluster
+        return f'    {src} -> {dst} [style=dashed, color="#1E88E5", constraint=false];'
+    if style == EDGE_BRANCH and label == "yes":
+        return f'    {src} -> {dst} [label="yes", color="#4CAF50", fontcolor="#4CAF50"];'
+    if style == EDGE_BRANCH and label == "no":
+        return f'    {src} -> {dst} [label="no", color="#F44336", fontcolor="#F44336"];'
+    if label:
+        return f'    {src} -> {dst} [label="{escape_dot_label(label)}"];'
+    return f'    {src} -> {dst};'
+
+def iter_dot(graph):
+    """Genera el DOT del grafo línea a línea (sin saltos de línea): un subgraph por cluster (archivo) y
+    después lo que no tiene cluster (incluidas las aristas entre clusters). No construye el texto completo"""
+    yield from DOT_HEADER
+
+    # Primero se reparten índices (enteros) por cluster; las líneas DOT se generan una sola vez al emitir
+    cluster_nodes = {cluster: [] for cluster in graph.clusters}
+    cluster_edges = {cluster: [] for cluster in graph.clusters}
+    loose_nodes = []
+    loose_edges = []
+    node_cluster = {}
+    for i, (node_id, cluster) in enumerate(zip(graph.node_ids, graph.node_clusters)):
+        if cluster is None:
+            loose_nodes.append(i)
+        else:
+            node_cluster[node_id] = cluster
+            cluster_nodes.setdefault(cluster, []).append(i)
+    for i, (src, dst) in enumerate(zip(graph.edge_src, graph.edge_dst)):
+        cluster = node_cluster.get(src)
+        if cluster is not None and node_cluster.get(dst) == cluster:
+            cluster_edges.setdefault(cluster, []).append(i)
+        else:
+            loose_edges.append(i)
+
+    def emit(node_indices, edge_indices, indent):
+        for i in node_indices:
+            yield indent + _dot_node(graph.node_ids[i], graph.node_kinds[i], graph.node_labels[i], graph.node_limits[i])
+        for i in edge_indices:
+            yield indent + _dot_edge(graph.edge_src[i], graph.edge_dst[i], graph.edge_labels[i], graph.edge_styles[i])
+
+    for cluster, nodes in cluster_nodes.items():
+        if not nodes:
+            continue
+        yield f"    subgraph cluster_{cluster} {{"
+        yield f'        label = "{escape_dot_label(graph.clusters.get(cluster, str(cluster)), limit=60)}";'
+        yield '        style=filled;'
+        yield '        color="#F5F5F5";'
+        yield '        fontsize=14;'
+        yield from emit(nodes, cluster_edges[cluster], "    ")
+        yield "    }"
+        yield ''
+
+    yield from emit(loose_nodes, loose_edges, "")
+    yield "}"
+
+def iter_text_chunks(lines, lines_per_chunk=512):
+    """Agrupa líneas en trozos de texto; concatenados dan exactamente "\n".join(lines)"""
+    batch = []
+    first = True
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= lines_per_chunk:
+            text = "\n".join(batch)
+            yield text if first else "\n" + text
+            first = False
+            batch = []
+    if batch or first:
+        text = "\n".join(batch)
+        yield text if first else "\n" + text
+
+def graph_to_dot(graph):
+    """Emite el grafo completo en DOT (como texto)"""
+    return "\n".join(iter_dot(graph))
+
+def _mermaid_text(text):
+    return text.replace('"', "'").replace('\n', '<br/>')
+
+def _mermaid_node(node_id, kind, label):
+    text = _mermaid_text(label)
+    if kind == 'start' or kind == 'end':
+        return f'    {node_id}(["{text}"])'
+    elif kind == 'inputoutput':
+        return f'    {node_id}[/"{text}"/]'
+    elif kind == 'subroutine' or kind == 'header':
+        return f'    {node_id}[["{text}"]]'
+    elif kind == 'condition':
+        return f'    {node_id}{{"{text}"}}'
+    elif kind == 'point':
+        return f'    {node_id}((" "))'
+    return f'    {node_id}["{text}"]'
+
+def graph_to_mermaid(graph, theme_name="default"):
+    """Emite el grafo en Mermaid (legacy, usar Graphviz para más detalle)"""
     mermaid_lines = []
     
     # Inject Theme if not default
@@ -12,180 +220,424 @@ def flowchart_js_to_mermaid(flowchart_code, theme_name="default"):
         mermaid_lines.append(f"%%{{init: {{'theme': '{theme_name}'}} }}%%")
         
     mermaid_lines.append("graph TD")
-    
-    # Regex patterns to parse flowchart.js syntax
-    node_pattern = re.compile(r'(\w+)=>(\w+):\s*(.*)')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Parse Nodes
-        match_node = node_pattern.match(line)
-        if match_node:
-            nid, ntype, ntext = match_node.groups()
-            ntext = ntext.replace('"', "'") 
-            
-            if ntype == 'start' or ntype == 'end':
-                mermaid_lines.append(f'    {nid}(["{ntext}"])')
-            elif ntype == 'operation':
-                mermaid_lines.append(f'    {nid}["{ntext}"]')
-            elif ntype == 'inputoutput':
-                mermaid_lines.append(f'    {nid}[/"{ntext}"/]')
-            elif ntype == 'subroutine':
-                mermaid_lines.append(f'    {nid}[["{ntext}"]]')
-            elif ntype == 'condition':
-                mermaid_lines.append(f'    {nid}{{"{ntext}"}}')
-            else:
-                mermaid_lines.append(f'    {nid}["{ntext}"]')
+
+    clustered = {cluster: [] for cluster in graph.clusters}
+    for node_id, kind, label, cluster, _ in graph.nodes():
+        line = _mermaid_node(node_id, kind, label)
+        if cluster is None:
+            mermaid_lines.append(line)
+        else:
+            clustered.setdefault(cluster, []).append(line)
+    for cluster, nodes in clustered.items():
+        if not nodes:
             continue
-            
-        # Parse Links
-        if "->" in line:
-            parts = line.split("->")
-            for i in range(len(parts) - 1):
-                src = parts[i].strip()
-                dst = parts[i+1].strip()
-                
-                condition = ""
-                if "(" in src and src.endswith(")"):
-                    if "(yes)" in src:
-                        condition = "|yes|"
-                        src = src.replace("(yes)", "")
-                    elif "(no)" in src:
-                        condition = "|no|"
-                        src = src.replace("(no)", "")
-                
-                if condition:
-                    mermaid_lines.append(f'    {src} -->{condition} {dst}')
-                else:
-                    mermaid_lines.append(f'    {src} --> {dst}')
+        mermaid_lines.append(f'    subgraph cluster_{cluster} ["{_mermaid_text(graph.clusters.get(cluster, str(cluster)))}"]')
+        mermaid_lines.extend(f"    {n}" for n in nodes)
+        mermaid_lines.append("    end")
+
+    for src, dst, label, style in graph.edges():
+        arrow = "-.->" if style in (EDGE_DOTTED, EDGE_CALL) else "-->"
+        if label:
+            mermaid_lines.append(f'    {src} {arrow}|{label}| {dst}')
+        else:
+            mermaid_lines.append(f'    {src} {arrow} {dst}')
 
     return "\n".join(mermaid_lines)
 
-def flowchart_js_to_graphviz_dot(flowchart_code, prefix=""):
-    """Convierte flowchart.js a Graphviz DOT manejando bloques multi-línea"""
-    lines = flowchart_code.splitlines()
-    nodes_dot = []
-    links_dot = []
-    
-    node_pattern = re.compile(r'^(\w+)=>(\w+):\s*(.*)')
-    
-    current_node = None
-    node_definitions = {} # nid -> {type, text}
+def fragment_to_mermaid(fragment, theme_name="default"):
+    """Convierte un fragmento a Mermaid"""
+    return graph_to_mermaid(graph_from_fragment(fragment), theme_name)
 
-    # Fase 1: Recolectar definiciones de nodos (corrigiendo cortes de splitlines)
-    for line in lines:
-        if "=>" in line and not line.strip().startswith("//") and "->" not in line:
-            match = node_pattern.match(line)
-            if match:
-                nid, ntype, ntext = match.groups()
-                current_node = nid
-                node_definitions[nid] = {"type": ntype, "text": ntext}
-                continue
-        
-        # Si no empieza por ID=> y hay un nodo activo, es continuación de texto
-        if current_node and "->" not in line:
-            node_definitions[current_node]["text"] += "\n" + line.strip()
-            
-    # Fase 2: Generar DOT para nodos
-    node_types = {
-        'start': 'oval', 'end': 'oval', 'operation': 'rectangle',
-        'inputoutput': 'parallelogram', 'condition': 'diamond', 'subroutine': 'component'
-    }
-    
-    for nid, ndata in node_definitions.items():
-        raw_id = f"{prefix}_{nid}" if prefix else nid
-        full_id = sanitize_id(raw_id)
-        shape = node_types.get(ndata['type'], 'rectangle')
-        label = escape_dot_label(ndata['text'])
-        
-        color = "#FFF9C4" # Default yellow
-        if ndata['type'] == 'start': color = "#E3F2FD"
-        elif ndata['type'] == 'end': color = "#FFEBEE"
-        elif ndata['type'] == 'inputoutput': color = "#E8F5E9"
-        elif ndata['type'] == 'condition': color = "#FFF3E0"
-        elif ndata['type'] == 'subroutine': color = "#F3E5F5"
-        
-        nodes_dot.append(f'    {full_id} [label="{label}", shape={shape}, style=filled, fillcolor="{color}"];')
-    
-    # Parsear conexiones
-    for line in lines:
-        line = line.strip()
-        if not line or "->" not in line:
-            continue
-            
-        # Procesar cadenas de conexiones
-        parts = line.split("->")
-        for i in range(len(parts) - 1):
-            src_raw = parts[i].strip()
-            dst_raw = parts[i+1].strip()
-            
-            edge_label = ""
-            # Detectar condiciones (yes/no) y eliminar direcciones (left/right)
-            if "(" in src_raw and src_raw.endswith(")"):
-                # Extraer contenido entre paréntesis
-                paren_content = src_raw[src_raw.index("(")+1:src_raw.rindex(")")]
-                
-                # Buscar yes o no en el contenido
-                if "yes" in paren_content.lower():
-                    edge_label = ' [label="yes", color="#4CAF50", fontcolor="#4CAF50"]'
-                elif "no" in paren_content.lower():
-                    edge_label = ' [label="no", color="#F44336", fontcolor="#F44336"]'
-                
-                # Eliminar todo el paréntesis
-                src_node = src_raw[:src_raw.index("(")].strip()
-            else:
-                src_node = src_raw
-            
-            # Aplicar prefijo y sanitizar IDs
-            full_src = sanitize_id(f"{prefix}_{src_node}" if prefix else src_node)
-            full_dst = sanitize_id(f"{prefix}_{dst_raw}" if prefix else dst_raw)
-            
-            links_dot.append(f'    {full_src} -> {full_dst}{edge_label};')
-            
-    return nodes_dot, links_dot
-
-def generate_pdf_from_diagram(diagram_code, output_path, simulacion=False, engine="graphviz"):
-    """Genera PDF desde código de diagrama usando Kroki.io (Optimizado para Proyectos Grandes)"""
-    if simulacion:
-        print(f"    [SIMULACIÓN] Generando PDF en: {output_path}")
-        return True
+def flowchart_to_mermaid(flowchart, theme_name="default"):
+    """Convierte un Flowchart de pyflowchart a Mermaid"""
+    return fragment_to_mermaid(flowchart_to_fragment(flowchart), theme_name)
 
-    # Usar endpoint PDF directo para mejor calidad y menor carga de memoria local
-    url = f"https://kroki.io/{engine}/pdf"
-    
-    print(f"    [DEBUG] Enviando {len(diagram_code)} chars a Kroki (endpoint /pdf)...")
-    
-    final_dot = "".join([c if (ord(c) < 128 and ord(c) >= 32) or c in '\n\r\t' else '?' for c in diagram_code])
-    
-    headers = {
-        'Content-Type': 'text/plain; charset=utf-8',
-        'X-Kroki-Optimize': 'true'
-    }
-    
+# Todo lo que no sea ASCII imprimible (o \n \r \t) se sustituye por '?':
+# Kroki/Graphviz a veces falla con Unicode extendido en layouts complejos
+_NON_PRINTABLE_ASCII = re.compile(r'[^\x20-\x7f\n\r\t]')
+
+def diagram_payload(diagram_code):
+    """Bytes que se envían al renderizador (una sola pasada en C en lugar de recorrer carácter a carácter)"""
+    return _NON_PRINTABLE_ASCII.sub('?', diagram_code).encode('ascii')
+
+# Tamaño de bloque para leer/escribir diagramas y PDFs por trozos
+STREAM_CHUNK = 64 * 1024
+
+# Los archivos de spool con más antigüedad que esto (restos de ejecuciones interrumpidas) se borran
+SPOOL_MAX_AGE = 24 * 3600
+
+_spool_dir = None  # (carpeta configurada, carpeta en uso)
+
+def spool_directory():
+    """Carpeta donde se guardan los diagramas grandes; la primera vez se limpian los restos antiguos"""
+    global _spool_dir
+    configured = get_config()["spool_dir"]
+    if _spool_dir is not None and _spool_dir[0] == configured:
+        return _spool_dir[1]
+    directory = configured
     try:
-        response = requests.post(url, data=final_dot.encode('utf-8'), headers=headers, timeout=120) 
-        
-        if response.status_code == 200:
+        os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        for entry in os.scandir(directory):
+            try:
+                if now - entry.stat().st_mtime > SPOOL_MAX_AGE:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+    except OSError as e:
+        log(f"    [!] No se pudo usar la carpeta de spool '{directory}' ({e}); se usa la temporal del sistema")
+        directory = tempfile.gettempdir()
+    _spool_dir = (configured, directory)
+    return directory
+
+class DiagramSpool:
+    """Diagrama ya codificado (ver diagram_payload) junto con su tamaño y su clave de render.
+    Los pequeños se quedan en memoria; los que superan `stream_threshold_kb` se guardan en un archivo
+    (`path`) y los backends los leen de ahí por trozos. Es lo que devuelve el análisis en lugar del
+    texto: se pasa entre procesos sin copiar el diagrama entero."""
+    def __init__(self, key, size, data=None, path=None):
+        self.key = key
+        self.size = size
+        self.data = data
+        self.path = path
+
+    def __len__(self):
+        return self.size
+
+    def open(self):
+        """Archivo binario (o BytesIO) con el diagrama, posicionado al principio"""
+        if self.path is None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def read(self):
+        if self.path is None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def iter_chunks(self, size=STREAM_CHUNK):
+        with self.open() as f:
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def save_copy(self, dest_path):
+        with open(dest_path, "wb") as f:
+            for chunk in self.iter_chunks():
+                f.write(chunk)
+
+    def discard(self):
+        """Borra el archivo de spool (si lo hay). Se llama al terminar el render, vaya bien o mal"""
+        if self.path is not None:
             try:
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                return True
-            except Exception as f_err:
-                 print(f"    [!] Error guardando archivo PDF: {f_err}")
-                 return False
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.data = b""
+
+def spool_diagram(chunks, engine="graphviz", output_format="pdf"):
+    """Codifica el diagrama trozo a trozo (texto -> ASCII), calcula su clave de render sobre la marcha y
+    lo guarda en memoria o, al pasar de `stream_threshold_kb`, en un archivo de spool. Devuelve un DiagramSpool"""
+    threshold = int(get_config().get("stream_threshold_kb", 256)) * 1024
+    key = StreamingRenderKey(engine, output_format)
+    buffered = []
+    size = 0
+    f = None
+    path = None
+    try:
+        for chunk in chunks:
+            data = diagram_payload(chunk)
+            key.update(data)
+            size += len(data)
+            if f is None:
+                buffered.append(data)
+                if size <= threshold:
+                    continue
+                fd, path = tempfile.mkstemp(dir=spool_directory(), prefix="diagram_", suffix=".txt")
+                f = os.fdopen(fd, "wb")
+                data = b"".join(buffered)
+                buffered = None
+            f.write(data)
+    except BaseException:
+        if f is not None:
+            f.close()
+            os.remove(path)
+        raise
+    if f is None:
+        return DiagramSpool(key.hexdigest(), size, data=b"".join(buffered))
+    f.close()
+    return DiagramSpool(key.hexdigest(), size, path=path)
+
+class RenderError(Exception):
+    """Fallo al renderizar un diagrama en un backend"""
+    pass
+
+def _completed_future(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+def _chain_future(inner, transform):
+    """Future que resuelve con transform(inner.result()); si transform lanza, propaga la excepción"""
+    outer = Future()
+    def _done(f):
+        try:
+            outer.set_result(transform(f))
+        except BaseException as e:
+            outer.set_exception(e)
+    inner.add_done_callback(_done)
+    return outer
+
+class Renderer:
+    """Interfaz común de los backends de renderizado (Kroki, Graphviz local, ...)"""
+    name = "base"
+
+    def supports(self, engine):
+        return True
+
+    def render(self, payload, engine="graphviz", output_format="pdf"):
+        """Devuelve los bytes del diagrama renderizado o lanza RenderError.
+        `payload` es el texto del diagrama ya codificado (ver diagram_payload) o un DiagramSpool"""
+        return self.submit(payload, engine, output_format).result()
+
+    def submit(self, payload, engine="graphviz", output_format="pdf", output_path=None):
+        """Encola un render y devuelve un Future con los bytes (o RenderError).
+        Con `output_path` el resultado se escribe por trozos en ese archivo (reemplazo atómico)
+        y el Future devuelve el número de bytes escritos"""
+        raise NotImplementedError
+
+    def stats(self):
+        return None
+
+    def reset_stats(self):
+        pass
+
+    def describe(self):
+        return self.name
+
+    def close(self):
+        pass
+
+class KrokiRenderer(Renderer):
+    """Renderiza enviando el diagrama a un servidor Kroki (público o self-hosted)"""
+    name = "kroki"
+
+    def __init__(self, endpoints="https://kroki.io", timeout=120, max_in_flight=4, retries=3, backoff=0.5,
+                 failure_threshold=3, cooldown=30, health_interval=15, transport="plain", max_url_length=4096):
+        # `requests` solo se importa si de verdad se usa Kroki
+        from core.kroki import KrokiClient
+        self.client = KrokiClient(endpoints, timeout, max_in_flight, retries, backoff,
+                                  failure_threshold, cooldown, health_interval, transport, max_url_length)
+
+    def describe(self):
+        return f"Kroki ({self.client.base_url})"
+
+    def submit(self, payload, engine="graphviz", output_format="pdf", output_path=None):
+        # Usar endpoint PDF directo para mejor calidad y menor carga de memoria local
+        inner = self.client.submit(engine, output_format, payload, output_path=output_path)
+        return _chain_future(inner, self._result)
+
+    @staticmethod
+    def _result(future):
+        import requests
+        from core.kroki import KrokiHTTPError
+        try:
+            return future.result()
+        except KrokiHTTPError as e:
+            raise RenderError(str(e))
+        except requests.RequestException as e:
+            raise RenderError(f"Error de conexión con Kroki: {e}")
+        except OSError as e:
+            raise RenderError(f"Error guardando archivo PDF: {e}")
+        except Exception as e:
+            raise RenderError(f"Error de conexión con Kroki: {e}")
+
+    def stats(self):
+        return self.client.stats.summary()
+
+    def reset_stats(self):
+        self.client.stats.reset()
+
+    def close(self):
+        self.client.close()
+
+class LocalGraphvizRenderer(Renderer):
+    """Renderiza con el binario `dot` instalado localmente, con un pool acotado de procesos"""
+    name = "local"
+
+    def __init__(self, dot_path=None, max_workers=None, timeout=120):
+        self.dot_path = dot_path or shutil.which("dot")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dot")
+
+    def supports(self, engine):
+        return engine == "graphviz"
+
+    def describe(self):
+        return f"Graphviz local ({self.dot_path or 'dot no encontrado'}, {self.max_workers} procesos)"
+
+    def submit(self, payload, engine="graphviz", output_format="pdf", output_path=None):
+        """Encola un render en el pool; devuelve un Future con los bytes (o los bytes escritos en `output_path`)"""
+        if not self.dot_path:
+            return _completed_future(error=RenderError("No se encontró el ejecutable 'dot' de Graphviz (instálalo o añádelo al PATH)"))
+        return self._pool.submit(self._run_dot, payload, output_format, output_path)
+
+    def _run_dot(self, payload, output_format, output_path=None):
+        with span("dot", cat="render", format=output_format):
+            return self._run_dot_process(payload, output_format, output_path)
+
+    def _run_dot_process(self, payload, output_format, output_path=None):
+        # Cada trabajo es un proceso `dot` independiente: stdin -> layout -> stdout.
+        # Un diagrama en spool se le pasa como archivo y la salida va directa al archivo temporal:
+        # ni el DOT ni el PDF pasan por la memoria de este proceso
+        stdin_file = None
+        if isinstance(payload, DiagramSpool):
+            if payload.path is not None:
+                stdin_file = payload.open()
+                payload = None
+            else:
+                payload = payload.read()
+        try:
+            if output_path is None:
+                return self._dot(stdin_file, payload, output_format, subprocess.PIPE)
+            try:
+                with atomic_output(output_path) as f:
+                    self._dot(stdin_file, payload, output_format, f)
+                return os.path.getsize(output_path)
+            except OSError as e:
+                raise RenderError(f"Error guardando archivo PDF: {e}")
+        finally:
+            if stdin_file is not None:
+                stdin_file.close()
+
+    def _dot(self, stdin_file, payload, output_format, stdout):
+        try:
+            proc = subprocess.Popen([self.dot_path, f"-T{output_format}"],
+                                    stdin=stdin_file if stdin_file is not None else subprocess.PIPE,
+                                    stdout=stdout, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise RenderError(f"No se pudo ejecutar dot: {e}")
+        try:
+            out, err = proc.communicate(payload, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise RenderError(f"dot superó el tiempo límite de {self.timeout}s")
+        if proc.returncode != 0:
+            raise RenderError(f"dot terminó con código {proc.returncode}: {err.decode('utf-8', 'replace').strip()[:300]}")
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+RENDERERS = {
+    "kroki": KrokiRenderer,
+    "local": LocalGraphvizRenderer,
+}
+
+_renderers = {}
+
+def get_renderer(name=None):
+    """Instancia (compartida) del backend pedido; por defecto el de la configuración"""
+    config = get_config()
+    name = name or config.get("renderer", "kroki")
+    if name not in RENDERERS:
+        log(f"    [!] Renderizador desconocido '{name}', usando Kroki")
+        name = "kroki"
+    if name not in _renderers:
+        if name == "local":
+            _renderers[name] = LocalGraphvizRenderer(config.get("dot_path"), config.get("local_workers"), config.get("render_timeout", 120))
         else:
-            print(f"    [!] Kroki returned status {response.status_code}")
+            endpoints = config.get("kroki_endpoints") or [config.get("kroki_url", "https://kroki.io")]
+            _renderers[name] = KrokiRenderer(endpoints, config.get("render_timeout", 120),
+                                             config.get("kroki_max_in_flight", 4), config.get("kroki_retries", 3),
+                                             config.get("kroki_backoff", 0.5), config.get("kroki_failure_threshold", 3),
+                                             config.get("kroki_cooldown", 30), config.get("kroki_health_interval", 15),
+                                             config.get("kroki_transport", "get"), config.get("kroki_max_url_length", 4096))
+    return _renderers[name]
+
+def generate_pdf_from_diagram(diagram, output_path, simulacion=False, engine="graphviz", renderer=None):
+    """Genera PDF desde código de diagrama con el backend elegido (Kroki por defecto)"""
+    return submit_pdf_from_diagram(diagram, output_path, simulacion, engine, renderer).result()
+
+def submit_pdf_from_diagram(diagram, output_path, simulacion=False, engine="graphviz", renderer=None):
+    """Versión asíncrona de generate_pdf_from_diagram: devuelve un Future con True/False.
+    Permite seguir analizando otros archivos mientras el backend renderiza.
+    `diagram` es el texto del diagrama, un DiagramSpool o un PartitionedDiagram (lo que devuelve el análisis)"""
+    if getattr(diagram, "pages", None) is not None:
+        from core.partition import submit_partitioned_pdf
+        return submit_partitioned_pdf(diagram, output_path, simulacion, engine, renderer)
+    spool = diagram if isinstance(diagram, DiagramSpool) else spool_diagram([diagram], engine)
+    if simulacion:
+        spool.discard()
+        log(f"    [SIMULACIÓN] Generando PDF en: {output_path}")
+        return _completed_future(True)
+
+    backend = renderer if isinstance(renderer, Renderer) else get_renderer(renderer)
+    if not backend.supports(engine):
+        # Graphviz local no sabe dibujar Mermaid: ese motor siempre va a Kroki
+        backend = get_renderer("kroki")
+
+    # Si este mismo diagrama ya se renderizó antes (en esta u otra máquina), no hace falta renderizarlo
+    cache = get_render_cache()
+    if cache is not None:
+        with span("render_cache", cat="render"):
+            cached_size = cache.get_file(spool.key, output_path)
+        if cached_size is not None:
+            spool.discard()
+            log(f"    [CACHÉ] Render reutilizado ({cached_size} bytes)")
+            return _completed_future(True)
+
+    log(f"    [DEBUG] Enviando {spool.size} chars a {backend.describe()}...")
+    # El render termina en un hilo del backend: span asíncrono desde el envío hasta el PDF escrito
+    token = begin_async("render", output=os.path.basename(output_path), bytes=spool.size)
+
+    def _finish(future):
+        try:
+            future.result()
+        except RenderError as e:
+            end_async(token, ok=False)
+            log(f"    [!] {e}")
             debug_path = output_path + ".debug.dot"
             try:
-                with open(debug_path, "w", encoding="utf-8") as f:
-                    f.write(diagram_code)
-                print(f"    [DEBUG] Código del diagrama guardado en: {debug_path}")
+                spool.save_copy(debug_path)
+                log(f"    [DEBUG] Código del diagrama guardado en: {debug_path}")
             except: pass
             return False
-            
-    except Exception as e:
-        print(f"    [!] Error de conexión con Kroki: {e}")
-        return False
+        finally:
+            spool.discard()
+
+        if cache is not None:
+            cache.put_file(spool.key, output_path)
+        end_async(token, ok=True)
+        return True
+
+    # El backend escribe el PDF por trozos en un temporal junto a output_path y lo renombra al terminar
+    return _chain_future(backend.submit(spool, engine, "pdf", output_path), _finish)
+
+def reset_render_cache_stats():
+    cache = get_render_cache()
+    if cache is not None:
+        cache.reset_stats()
+    for backend in _renderers.values():
+        backend.reset_stats()
+
+def print_render_cache_stats():
+    """Resumen de aciertos/fallos de la caché de renders y latencias de los backends (al final de cada ejecución)"""
+    cache = get_render_cache()
+    if cache is not None:
+        stats = cache.stats()
+        log(f"Caché de renders: {stats['hits']} aciertos, {stats['misses']} fallos ({stats['hit_ratio']:.0f}% reutilizado)")
+    for backend in _renderers.values():
+        stats = backend.stats()
+        if stats and stats["requests"]:
+            log(f"{backend.describe()}: {stats['requests']} peticiones, {stats['retries']} reintentos, {stats['failures']} fallidas, "
+                f"latencia p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s máx={stats['max']:.2f}s")
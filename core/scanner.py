@@ -0,0 +1,163 @@
+import os
+import json
+import sqlite3
+from core.utils import extract_number, log
+from core.cache import content_digest
+from core.config import get_config
+
+# Versión del esquema del índice: cambiarla recrea los índices existentes
+INDEX_FORMAT = 2
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    updir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    number INTEGER,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    depth INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_updir ON files (updir);
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    data TEXT NOT NULL
+);
+PRAGMA user_version = {INDEX_FORMAT};
+"""
+
+def index_path_for(root):
+    """Archivo SQLite del índice de una carpeta (None -> índice en memoria)"""
+    config = get_config()
+    if not config.get("file_index", True):
+        return None
+    return os.path.join(config["file_index_dir"], f"{content_digest(os.path.abspath(root))[:32]}.sqlite3")
+
+class FileIndex:
+    """Índice persistente (SQLite) de los archivos de una carpeta: nombre, extensión, número, tamaño y mtime.
+    `refresh()` recorre el árbol una sola vez con os.scandir y solo escribe lo que ha cambiado."""
+    def __init__(self, root, db_path=None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path
+        self.conn = self._connect(db_path)
+
+    def _connect(self, db_path):
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                conn = sqlite3.connect(db_path, timeout=30)
+                if conn.execute("PRAGMA user_version").fetchone()[0] not in (0, INDEX_FORMAT):
+                    conn.execute("DROP TABLE IF EXISTS files")
+                    conn.execute("DROP TABLE IF EXISTS imports")
+                conn.executescript(_SCHEMA)
+                return conn
+            except (OSError, sqlite3.Error) as e:
+                log(f"    [!] No se pudo abrir el índice '{db_path}' ({e}); se usa uno en memoria")
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(_SCHEMA)
+        self.db_path = None
+        return conn
+
+    def refresh(self, recursive=True):
+        """Sincroniza el índice con el disco. Sin recursividad solo se recorre la carpeta y sus
+        subcarpetas directas (lo que necesitan los bundles). Devuelve (rutas nuevas/modificadas, rutas eliminadas)"""
+        max_depth = None if recursive else 1
+        depth_filter = "" if recursive else " WHERE depth <= 1"
+        known = {row[0]: (row[1], row[2], row[3]) for row in
+                 self.conn.execute(f"SELECT path, size, mtime, depth FROM files{depth_filter}")}
+
+        seen = set()
+        changed = []
+        stack = [(self.root, 0)]
+        while stack:
+            folder, depth = stack.pop()
+            try:
+                entries = os.scandir(folder)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if max_depth is None or depth < max_depth:
+                                stack.append((entry.path, depth + 1))
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    path = entry.path
+                    seen.add(path)
+                    if known.get(path) == (st.st_size, st.st_mtime, depth):
+                        continue
+                    name = entry.name
+                    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ""
+                    changed.append((path, folder, os.path.dirname(folder), name, ext, extract_number(name),
+                                    st.st_size, st.st_mtime, depth))
+
+        removed = [path for path in known if path not in seen]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", changed)
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            self.conn.executemany("DELETE FROM imports WHERE path = ?", [(path,) for path in removed])
+        return [row[0] for row in changed], removed
+
+    def files(self, recursive=True):
+        """Filas (path, name, ext, number) de la carpeta (solo el primer nivel si no es recursivo)"""
+        depth_filter = "" if recursive else " WHERE depth = 0"
+        return self.conn.execute(f"SELECT path, name, ext, number FROM files{depth_filter} ORDER BY path").fetchall()
+
+    def extensions(self, recursive=True, supported=None):
+        """Extensiones presentes (opcionalmente solo las de `supported`), ordenadas"""
+        exts = {ext for _, _, ext, _ in self.files(recursive) if ext}
+        if supported is not None:
+            exts &= set(supported)
+        return sorted(exts)
+
+    def number_range(self, recursive=True, exts=None):
+        """(mínimo, máximo) de los números de los archivos con esas extensiones, o None"""
+        nums = [number for _, _, ext, number in self.files(recursive)
+                if number is not None and (exts is None or ext in exts)]
+        return (min(nums), max(nums)) if nums else None
+
+    def subfolder_files(self, folder):
+        """Archivos de las subcarpetas directas de `folder` (los que se agrupan con una semilla)"""
+        return self.conn.execute("SELECT path, name FROM files WHERE updir = ? ORDER BY dir, name",
+                                 (folder,)).fetchall()
+
+    def stat(self, path):
+        """(tamaño, mtime) registrados para un archivo, o None"""
+        return self.conn.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+
+    def get_imports(self, path):
+        """Imports guardados de un archivo (ver core.imports), o None si no hay o el archivo ha cambiado"""
+        row = self.conn.execute("SELECT i.data FROM imports i JOIN files f ON f.path = i.path "
+                                "WHERE i.path = ? AND i.size = f.size AND i.mtime = f.mtime", (path,)).fetchone()
+        return [tuple(item) for item in json.loads(row[0])] if row else None
+
+    def put_imports(self, path, imports):
+        """Guarda los imports de un archivo indexado con su tamaño y mtime actuales (se confirma al cerrar)"""
+        self.conn.execute("INSERT OR REPLACE INTO imports SELECT path, size, mtime, ? FROM files WHERE path = ?",
+                          (json.dumps(imports), path))
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_index(root, recursive=True):
+    """Abre el índice de `root` y lo pone al día con el disco"""
+    index = FileIndex(root, index_path_for(root))
+    index.refresh(recursive)
+    return index
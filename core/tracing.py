@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import itertools
+
+# Trazas por etapa (scan, read, parse, flowchart, emit_dot, render, http, write...) en formato Chrome
+# trace-event (chrome://tracing, https://ui.perfetto.dev). Sin una sesión activa span() devuelve un
+# contexto vacío compartido: el coste de la instrumentación es una llamada y una comprobación de None.
+
+PROFILE_MODES = ("cpu", "memory")
+
+_tracer = None  # Tracer activo en este proceso (None -> trazas desactivadas)
+
+def now_us():
+    """Marca de tiempo en microsegundos (reloj monotónico común a todos los procesos de la máquina)"""
+    return time.perf_counter_ns() // 1000
+
+class Tracer:
+    """Acumula los eventos de un proceso. Los procesos del pool vuelcan los suyos en `events_dir`"""
+    def __init__(self, events_dir=None):
+        self.events = []
+        self.events_dir = events_dir
+        self.pid = os.getpid()
+        self._threads = set()
+        self._async_ids = itertools.count(1)
+
+    def add(self, event):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                                "args": {"name": threading.current_thread().name}})
+        event["pid"] = self.pid
+        event["tid"] = tid
+        self.events.append(event)
+
+    def flush(self):
+        """Escribe (añade) los eventos acumulados en el archivo de este proceso dentro de events_dir"""
+        if not self.events or not self.events_dir:
+            return
+        events, self.events = self.events, []
+        self._threads = set()  # los metadatos de hilo se repiten en cada volcado: son idempotentes
+        with open(os.path.join(self.events_dir, f"{self.pid}.jsonl"), "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """Añade argumentos al span (p.ej. nodos y aristas cuando ya se conocen)"""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add({"name": self.name, "cat": self.cat, "ph": "X", "ts": self.start,
+                         "dur": now_us() - self.start, "args": self.args})
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+def span(name, cat="stage", **args):
+    """Contexto que registra la duración de una etapa en el hilo actual"""
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return _Span(tracer, name, cat, args)
+
+def begin_async(name, cat="render", **args):
+    """Inicio de una etapa que termina en otro hilo (p.ej. un render). Devuelve el token para end_async"""
+    tracer = _tracer
+    if tracer is None:
+        return None
+    token = (tracer, name, cat, next(tracer._async_ids))
+    tracer.add({"name": name, "cat": cat, "ph": "b", "id": token[3], "ts": now_us(), "args": args})
+    return token
+
+def end_async(token, **args):
+    if token is None:
+        return
+    tracer, name, cat, async_id = token
+    tracer.add({"name": name, "cat": cat, "ph": "e", "id": async_id, "ts": now_us(), "args": args})
+
+def child_context():
+    """Lo que necesita un proceso del pool para registrar trazas (None si no hay sesión)"""
+    tracer = _tracer
+    return tracer.events_dir if tracer is not None else None
+
+def traced_call(events_dir, func, *args):
+    """Ejecuta func(*args) en un proceso del pool registrando sus spans en `events_dir`
+    (función de nivel superior para poder enviarse al pool)"""
+    global _tracer
+    if events_dir is None or (_tracer is not None and _tracer.pid == os.getpid()):
+        return func(*args)
+    # Con fork el proceso hereda una copia del Tracer del padre: se sustituye por uno propio
+    _tracer = Tracer(events_dir)
+    try:
+        return func(*args)
+    finally:
+        tracer, _tracer = _tracer, None
+        try:
+            tracer.flush()
+        except OSError:
+            pass
+
+def _percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def _durations(events):
+    """{nombre: [duraciones en µs]} de los spans completos y de los asíncronos emparejados"""
+    durations = {}
+    open_async = {}
+    for event in events:
+        ph = event.get("ph")
+        if ph == "X":
+            durations.setdefault(event["name"], []).append(event["dur"])
+        elif ph == "b":
+            open_async[(event["pid"], event["id"], event["name"])] = event["ts"]
+        elif ph == "e":
+            start = open_async.pop((event["pid"], event["id"], event["name"]), None)
+            if start is not None:
+                durations.setdefault(event["name"], []).append(event["ts"] - start)
+    return durations
+
+def summary_lines(events):
+    """Tabla de resumen por etapa (nº, total, media, p95, máx.) y totales de semillas, archivos, nodos y aristas
+    (los de cada archivo más las llamadas enlazadas entre archivos)"""
+    durations = _durations(events)
+    lines = [f"{'etapa':<12} {'nº':>6} {'total ms':>10} {'media ms':>9} {'p95 ms':>9} {'máx ms':>9}"]
+    for name, values in sorted(durations.items(), key=lambda kv: -sum(kv[1])):
+        lines.append(f"{name:<12} {len(values):>6} {sum(values) / 1000:>10.1f} {sum(values) / len(values) / 1000:>9.2f} "
+                     f"{_percentile(values, 95) / 1000:>9.2f} {max(values) / 1000:>9.2f}")
+    spans = {}
+    for event in events:
+        if event.get("ph") == "X":
+            spans.setdefault(event["name"], []).append(event.get("args", {}))
+    files = spans.get("file", [])
+    if files:
+        nodes = sum(a.get("nodes", 0) for a in files)
+        edges = sum(a.get("edges", 0) for a in files) + sum(a.get("linked", 0) for a in spans.get("link", []))
+        lines.append(f"{len(spans.get('seed', []))} semillas, {len(files)} archivos, {nodes} nodos, {edges} aristas")
+    return lines
+
+class TraceSession:
+    """Trazas (y perfil opcional) de una ejecución: start() activa el registro en este proceso y en los
+    del pool; finish() reúne los eventos, escribe el JSON de Chrome trace y muestra el resumen"""
+    def __init__(self, trace_path=None, profile=None):
+        self.trace_path = trace_path
+        self.profile = profile if profile in PROFILE_MODES else None
+        self.events_dir = None
+        self._profiler = None
+
+    def start(self):
+        global _tracer
+        if self.trace_path:
+            folder = os.path.dirname(os.path.abspath(self.trace_path))
+            os.makedirs(folder, exist_ok=True)
+            self.events_dir = tempfile.mkdtemp(prefix=".trace_events_", dir=folder)
+            _tracer = Tracer(self.events_dir)
+            _tracer.events.append({"name": "process_name", "ph": "M", "pid": _tracer.pid, "tid": 0,
+                                   "args": {"name": "generador"}})
+        if self.profile == "cpu":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "memory":
+            import tracemalloc
+            tracemalloc.start()
+        return self
+
+    def finish(self):
+        global _tracer
+        if self.profile == "cpu" and self._profiler is not None:
+            self._profiler.disable()
+            self._report_cpu()
+        elif self.profile == "memory":
+            self._report_memory()
+        if _tracer is None or not self.trace_path:
+            return
+        tracer, _tracer = _tracer, None
+        events = tracer.events
+        try:
+            for name in sorted(os.listdir(self.events_dir)):
+                with open(os.path.join(self.events_dir, name), "r", encoding="utf-8") as f:
+                    events.extend(json.loads(line) for line in f if line.strip())
+            pids = {e["pid"] for e in events} - {tracer.pid}
+            events.extend({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": f"análisis {pid}"}}
+                          for pid in pids)
+            from core.utils import atomic_output
+            with atomic_output(self.trace_path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        except (OSError, ValueError) as e:
+            print(f"    [!] No se pudo guardar la traza: {e}")
+            return
+        finally:
+            shutil.rmtree(self.events_dir, ignore_errors=True)
+        print("\n".join(["", "--- RESUMEN DE ETAPAS ---"] + summary_lines(events)))
+        print(f"Traza guardada en: {self.trace_path} (ábrela en chrome://tracing o ui.perfetto.dev)")
+
+    def _report_cpu(self, limit=20):
+        import io
+        import pstats
+        out = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        print("\n--- PERFIL CPU (cProfile, hilo principal, por tiempo acumulado) ---")
+        print("\n".join(line for line in out.getvalue().splitlines()[4:] if line.strip()))
+        if self.trace_path:
+            prof_path = os.path.splitext(self.trace_path)[0] + ".prof"
+            try:
+                stats.dump_stats(prof_path)
+                print(f"Perfil guardado en: {prof_path} (pstats / snakeviz)")
+            except OSError as e:
+                print(f"    [!] No se pudo guardar el perfil: {e}")
+
+    def _report_memory(self, limit=15):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                           tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                                           tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")))
+        print(f"\n--- PERFIL DE MEMORIA (tracemalloc) --- pico {peak / 1024 / 1024:.1f} MB, "
+              f"al terminar {current / 1024 / 1024:.1f} MB")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            print(f"    {stat.size / 1024:>9.1f} KB  {stat.count:>7} bloques  {frame.filename}:{frame.lineno}")
@@ -1,6 +1,44 @@
 import os
 import sys
 import re
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+def _current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Permisos de un archivo creado con open(): mkstemp los deja en 0600 y os.replace los conserva
+_FILE_MODE = 0o666 & ~_current_umask()
+
+@contextmanager
+def atomic_output(path, mode="wb", encoding=None):
+    """Archivo temporal junto a `path` que solo sustituye al destino si el bloque termina sin errores:
+    quien lea `path` nunca ve un archivo a medias. El resultado tiene los permisos habituales (umask)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+_output_lock = threading.Lock()
+
+def log(message=""):
+    """print() para los mensajes de estado: la línea entera se escribe de una vez bajo un cerrojo, así las
+    de los hilos de render (Kroki, dot) no se cuelan a mitad de una línea del hilo principal"""
+    with _output_lock:
+        sys.stdout.write(f"{message}\n")
 
 def resource_path(relative_path):
     """ Obtiene la ruta absoluta del recurso, compatible con desarrollo y PyInstaller """
@@ -10,6 +48,20 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+# Normalización de texto: tablas de traducción precalculadas y caché acotada, porque las mismas
+# etiquetas e IDs (prefijos de archivo y función, "Inicio", "fin"...) se repiten en cada diagrama
+TEXT_CACHE_SIZE = 8192
+
+# IDs: todo lo que no sea [A-Za-z0-9_] pasa a '_' (los puntos y espacios también). Se traduce como
+# bytes: bytes.translate con una tabla de 256 es mucho más rápido que str.translate con un diccionario
+_ID_TABLE = bytes(c if chr(c).isalnum() and c < 128 or c == ord('_') else ord('_') for c in range(256))
+_NON_ID_CHAR = re.compile(r'[^A-Za-z0-9_]')
+
+def to_ascii(text):
+    """Sustituye cada carácter no ASCII por '?' (Kroki/Graphviz a veces falla con Unicode extendido)"""
+    return text if text.isascii() else text.encode('ascii', 'replace').decode('ascii')
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
 def escape_dot_label(text, limit=120):
     """Escapa caracteres para DOT y simplifica contenido pesado (ASCII Art, etc)"""
     if not text: return ""
@@ -24,13 +76,14 @@ def escape_dot_label(text, limit=120):
 
     # 3. Escapado base de Graphviz
     text = text.replace('\\', '\\\\').replace('"', '\\"').replace('\r', '')
+    # Si todo es ASCII no hace falta revisar cada línea
+    ascii_only = text.isascii()
     
     # 4. Procesar por líneas para legibilidad en el diagrama
-    raw_lines = text.split('\n')
     processed_lines = []
     total_chars = 0
     
-    for line in raw_lines:
+    for line in text.split('\n'):
         line = line.strip()
         if not line: continue
         
@@ -38,8 +91,9 @@ def escape_dot_label(text, limit=120):
         if len(line) > 60:
             line = line[:57] + "..."
             
-        # FORCE ASCII: Kroki/Graphviz a veces falla con Unicode extendido en layouts complejos
-        line = "".join([c if ord(c) < 128 else "?" for c in line])
+        # FORCE ASCII: se hace tras strip() para que los espacios Unicode se sigan recortando
+        if not ascii_only:
+            line = to_ascii(line)
         
         processed_lines.append(line)
         total_chars += len(line)
@@ -51,13 +105,13 @@ def escape_dot_label(text, limit=120):
             
     return "\\n".join(processed_lines)
 
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
 def sanitize_id(text):
-    """Limpia IDs para Graphviz (solo alfanuméricos y guiones bajos)"""
+    """Limpia IDs para Graphviz (solo alfanuméricos ASCII y guiones bajos)"""
     if not text: return "id_null"
-    # Reemplazar puntos y espacios por guiones bajos
-    text = text.replace('.', '_').replace(' ', '_')
-    # Remover cualquier caracter que no sea ASCII alfanumérico o _
-    return "".join([c if (c.isalnum() and ord(c) < 128) or c == '_' else '_' for c in text])
+    if text.isascii():
+        return text.encode('ascii').translate(_ID_TABLE).decode('ascii')
+    return _NON_ID_CHAR.sub('_', text)
 
 def extract_number(name):
     match = re.search(r'\d+', name)
@@ -88,16 +142,84 @@ def should_process(name, nombre_base="ejercicio", numero_al_principio=False, ran
     return True
 
 class TextRedirector:
-    """Redirige stdout a un widget de texto."""
-    def __init__(self, widget, tag="stdout"):
+    """Redirige stdout a un widget de texto por lotes. write() vale desde cualquier hilo: solo encola;
+    un temporizador de Tk (after) vuelca lo acumulado `fps` veces por segundo en el hilo de la interfaz.
+    El widget conserva las últimas `max_lines` líneas; con `log_path` el registro completo va a ese archivo."""
+    def __init__(self, widget, tag="stdout", max_lines=5000, fps=20, log_path=None):
         self.widget = widget
         self.tag = tag
+        self.max_lines = max(1, int(max_lines))
+        self.interval = max(1, int(1000 / max(1, fps)))
+        self._queue = queue.SimpleQueue()
+        self._lines = 0  # líneas completas en el widget
+        self._log_file = None
+        if log_path:
+            try:
+                self._log_file = open(log_path, "a", encoding="utf-8")
+            except OSError as e:
+                self._queue.put(f"    [!] No se pudo abrir el registro '{log_path}': {e}\n")
+        self._running = True
+        widget.after(self.interval, self._pump)
 
     def write(self, str):
+        if str:
+            self._queue.put(str)
+        return len(str)
+
+    def flush(self):
+        pass
+
+    def _drain(self):
+        chunks = []
+        try:
+            while True:
+                chunks.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return "".join(chunks)
+
+    def _pump(self):
+        if not self._running:
+            return
+        try:
+            self.flush_pending()
+            self.widget.after(self.interval, self._pump)
+        except Exception:
+            # Ventana destruida: dejar de volcar
+            self._running = False
+
+    def flush_pending(self):
+        """Vuelca el texto encolado en el widget (solo desde el hilo de Tk)"""
+        text = self._drain()
+        if not text:
+            return
+        if self._log_file is not None:
+            self._log_file.write(text)
+            self._log_file.flush()
+        # De un lote más largo que el tope solo se llegarían a ver las últimas líneas
+        if text.count("\n") > self.max_lines:
+            text = "\n".join(text.split("\n")[-self.max_lines - 1:])
         self.widget.configure(state="normal")
-        self.widget.insert("end", str, (self.tag,))
+        self.widget.insert("end", text, (self.tag,))
+        self._lines += text.count("\n")
+        excess = self._lines - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self._lines -= excess
         self.widget.see("end")
         self.widget.configure(state="disabled")
 
-    def flush(self):
-        pass
+    def clear(self):
+        """Vacía el widget y lo pendiente (el archivo de registro se conserva)"""
+        self.flush_pending()
+        self.widget.configure(state="normal")
+        self.widget.delete("1.0", "end")
+        self.widget.configure(state="disabled")
+        self._lines = 0
+
+    def close(self):
+        self._running = False
+        if self._log_file is not None:
+            self._log_file.write(self._drain())
+            self._log_file.close()
+            self._log_file = None
@@ -0,0 +1,108 @@
+import copy
+import time
+import threading
+from core.scanner import FileIndex
+from core.pipeline import run_pipeline, resolve_extensions
+from core.config import get_config
+from core.utils import log
+
+# Con más cambios acumulados que esto se regenera la carpeta entera en vez de semilla a semilla
+MAX_PENDING_PATHS = 5000
+
+class FolderWatcher:
+    """Modo watch: sondea la carpeta, agrupa ráfagas de cambios (debounce) y regenera en segundo plano
+    solo las semillas cuyo bundle incluye algún archivo cambiado.
+    Los cambios que llegan durante un build se acumulan en un único lote (cola acotada)."""
+    def __init__(self, options, progress=None, interval=None, debounce=None):
+        config = get_config()
+        self.options = options
+        self.progress = progress
+        self.interval = interval if interval is not None else config.get("watch_interval", 1.0)
+        self.debounce = debounce if debounce is not None else config.get("watch_debounce", 0.5)
+        self.valid_exts, _ = resolve_extensions(options.nombre_base, options.extensions)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._overflow = False
+        self._threads = []
+        self.builds = 0
+
+    def start(self):
+        """Build inicial + hilos de sondeo y de regeneración (daemon)"""
+        self._threads = [
+            threading.Thread(target=self._poll_loop, name="watch-poll", daemon=True),
+            threading.Thread(target=self._build_loop, name="watch-build", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def _emit(self, event, **data):
+        if self.progress:
+            data["event"] = event
+            self.progress(data)
+
+    def _poll_loop(self):
+        # Índice propio en memoria: el del pipeline se actualiza en cada build y "gastaría" los cambios
+        index = FileIndex(self.options.target_dir)
+        try:
+            index.refresh(self.options.recursive)
+            self._queue(None)  # build inicial (incremental: solo lo que cambió mientras no se vigilaba)
+            log(f"Vigilando '{self.options.target_dir}' (cada {self.interval}s). Esperando cambios...")
+            burst = set()
+            last_change = 0.0
+            while not self._stop.wait(self.interval):
+                changed, removed = index.refresh(self.options.recursive)
+                relevant = [p for p in changed + removed if p.lower().endswith(self.valid_exts)]
+                if relevant:
+                    burst.update(relevant)
+                    last_change = time.monotonic()
+                    continue
+                # Debounce: se espera a que la ráfaga de cambios se calme
+                if burst and time.monotonic() - last_change >= self.debounce:
+                    self._emit("changes", paths=sorted(burst))
+                    self._queue(burst)
+                    burst = set()
+        finally:
+            index.close()
+
+    def _queue(self, paths):
+        """Añade cambios al lote pendiente (None = regenerar todo)"""
+        with self._lock:
+            if paths is None or len(self._pending) + len(paths) > MAX_PENDING_PATHS:
+                self._overflow = True
+                self._pending.clear()
+            elif not self._overflow:
+                self._pending.update(paths)
+        self._wakeup.set()
+
+    def _build_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            with self._lock:
+                paths, overflow = self._pending, self._overflow
+                self._pending, self._overflow = set(), False
+            if not paths and not overflow:
+                continue
+            options = copy.copy(self.options)
+            options.changed_paths = None if overflow else paths
+            try:
+                run_pipeline(options, self.progress)
+            except Exception as e:
+                log(f"\nERROR CRÍTICO (watch): {e}")
+            self.builds += 1
@@ -1,12 +1,20 @@
 import os
 import sys
-import threading
 import platform
 import subprocess
 import customtkinter as ctk
 from tkinter import filedialog
-from core.utils import resource_path, extract_number, should_process, TextRedirector
-from core.analyzer import generate_flowchart_from_code
+from core.utils import resource_path, TextRedirector, log
+from core.parallel import resolve_workers
+from core.pipeline import PipelineOptions, detect_folder_content, resolve_extensions
+from core.watcher import FolderWatcher
+from core.jobs import PipelineJob, format_eta
+from core.config import get_config
+
+RENDERER_CHOICES = {
+    "Kroki (online)": "kroki",
+    "Graphviz local": "local",
+}
 
 def open_folder(path):
     try:
@@ -17,7 +25,7 @@ def open_folder(path):
         else:
             subprocess.Popen(["xdg-open", path])
     except Exception as e:
-        print(f"Error abriendo carpeta: {e}")
+        log(f"Error abriendo carpeta: {e}")
 
 class App(ctk.CTk):
     def __init__(self):
@@ -32,7 +40,7 @@ class App(ctk.CTk):
             try:
                 self.iconbitmap(icon_path)
             except Exception as e:
-                print(f"No se pudo cargar el icono: {e}")
+                log(f"No se pudo cargar el icono: {e}")
 
         
         # Configuración de Grid Principal
@@ -100,6 +108,14 @@ class App(ctk.CTk):
         self.combo_engine.set("Graphviz (Más detalle)")
         self.combo_engine.grid(row=2, column=1, padx=10, pady=(5, 10), sticky="w")
 
+        # Backend de renderizado (Kroki online o Graphviz local)
+        self.label_renderer = ctk.CTkLabel(self.frame_config, text="Renderizar con:")
+        self.label_renderer.grid(row=2, column=2, padx=10, pady=(5, 10), sticky="w")
+
+        self.combo_renderer = ctk.CTkComboBox(self.frame_config, values=list(RENDERER_CHOICES), width=200)
+        self.combo_renderer.set(next((k for k, v in RENDERER_CHOICES.items() if v == get_config().get("renderer")), "Kroki (online)"))
+        self.combo_renderer.grid(row=2, column=3, padx=10, pady=(5, 10), sticky="w")
+
         # Extensiones
         self.label_ext = ctk.CTkLabel(self.frame_config, text="Extensiones (separadas por coma):")
         self.label_ext.grid(row=3, column=0, padx=10, pady=(5, 10), sticky="w")
@@ -108,6 +124,14 @@ class App(ctk.CTk):
         self.entry_ext.insert(0, "py")
         self.entry_ext.grid(row=3, column=1, padx=10, pady=(5, 10), sticky="ew")
 
+        # Procesos de análisis en paralelo
+        self.label_workers = ctk.CTkLabel(self.frame_config, text="Procesos de análisis:")
+        self.label_workers.grid(row=3, column=2, padx=10, pady=(5, 10), sticky="w")
+
+        self.entry_workers = ctk.CTkEntry(self.frame_config, width=80)
+        self.entry_workers.insert(0, str(resolve_workers()))
+        self.entry_workers.grid(row=3, column=3, padx=10, pady=(5, 10), sticky="w")
+
         # --- Fila 2: Rangos ---
         self.frame_rango = ctk.CTkFrame(self.tab_inicio)
         self.frame_rango.grid(row=2, column=0, columnspan=3, padx=20, pady=10, sticky="ew")
@@ -147,10 +171,38 @@ class App(ctk.CTk):
         self.switch_open.select()
         self.switch_open.pack(side="top", anchor="w", padx=20, pady=5)
 
+        self.switch_force = ctk.CTkSwitch(self.frame_opts, text="Regenerar todo (ignorar archivos sin cambios)")
+        self.switch_force.pack(side="top", anchor="w", padx=20, pady=5)
+
+        self.switch_trace = ctk.CTkSwitch(self.frame_opts, text="Registrar trazas de rendimiento (JSON + resumen)")
+        self.switch_trace.pack(side="top", anchor="w", padx=20, pady=5)
+
+        self.switch_watch = ctk.CTkSwitch(self.frame_opts, text="Vigilar cambios y regenerar automáticamente")
+        self.switch_watch.pack(side="top", anchor="w", padx=20, pady=5)
+        self.watcher = None
+
 
         # --- Fila 4: Botón Acción ---
         self.btn_run = ctk.CTkButton(self.tab_inicio, text="GENERAR DIAGRAMAS", height=50, font=("Roboto", 16, "bold"), command=self.start_process_thread)
-        self.btn_run.grid(row=4, column=0, columnspan=3, padx=20, pady=20, sticky="ew")
+        self.btn_run.grid(row=4, column=0, columnspan=3, padx=20, pady=(20, 5), sticky="ew")
+
+        # --- Fila 5: Progreso ---
+        self.frame_progress = ctk.CTkFrame(self.tab_inicio, fg_color="transparent")
+        self.frame_progress.grid(row=5, column=0, columnspan=3, padx=20, pady=(5, 20), sticky="ew")
+        self.frame_progress.grid_columnconfigure(0, weight=1)
+
+        self.progress_bar = ctk.CTkProgressBar(self.frame_progress)
+        self.progress_bar.set(0)
+        self.progress_bar.grid(row=0, column=0, padx=(0, 10), sticky="ew")
+
+        self.btn_pause = ctk.CTkButton(self.frame_progress, text="PAUSAR", width=120, state="disabled",
+                                       command=self.toggle_pause)
+        self.btn_pause.grid(row=0, column=1)
+
+        self.label_progress = ctk.CTkLabel(self.frame_progress, text="")
+        self.label_progress.grid(row=1, column=0, columnspan=2, sticky="w")
+        self.job = None
+        self.open_when_done = False
 
         # ====================
         # PESTAÑA TERMINAL
@@ -162,13 +214,14 @@ class App(ctk.CTk):
         self.btn_clear = ctk.CTkButton(self.tab_terminal, text="Limpiar Terminal", command=self.clear_log)
         self.btn_clear.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
 
-        # Redirigir stdout
-        sys.stdout = TextRedirector(self.textbox_log)
+        # Redirigir stdout: los prints de cualquier hilo se encolan y se vuelcan por lotes en el hilo de Tk
+        config = get_config()
+        self.log_sink = TextRedirector(self.textbox_log, max_lines=config.get("log_max_lines", 5000),
+                                       fps=config.get("log_fps", 20), log_path=config.get("log_file"))
+        sys.stdout = self.log_sink
 
     def clear_log(self):
-        self.textbox_log.configure(state="normal")
-        self.textbox_log.delete("1.0", "end")
-        self.textbox_log.configure(state="disabled")
+        self.log_sink.clear()
 
     def browse_folder(self):
         folder = filedialog.askdirectory()
@@ -179,219 +232,153 @@ class App(ctk.CTk):
 
     def detect_range(self, folder):
         try:
-            files_found = []
-            all_detected_exts = set()
-            is_recursive = self.switch_recursive.get()
-            
-            if is_recursive:
-                for root, dirs, files in os.walk(folder):
-                    for f in files:
-                        if '.' in f:
-                            ext = f.split('.')[-1].lower()
-                            if ext in ['py', 'java', 'js', 'cpp', 'c', 'h', 'cs', 'php', 'html', 'css', 'ts', 'txt']:
-                                all_detected_exts.add(ext)
-                                files_found.append(f)
-            else:
-                for f in os.listdir(folder):
-                    if os.path.isfile(os.path.join(folder, f)) and '.' in f:
-                        ext = f.split('.')[-1].lower()
-                        if ext in ['py', 'java', 'js', 'cpp', 'c', 'h', 'cs', 'php', 'html', 'css', 'ts', 'txt']:
-                            all_detected_exts.add(ext)
-                            files_found.append(f)
-
-            if all_detected_exts:
-                new_ext_str = ", ".join(sorted(list(all_detected_exts)))
+            detected_exts, number_range = detect_folder_content(folder, self.switch_recursive.get())
+
+            if detected_exts:
+                new_ext_str = ", ".join(detected_exts)
                 self.entry_ext.delete(0, "end")
                 self.entry_ext.insert(0, new_ext_str)
-                print(f"Extensiones detectadas automáticamente: {new_ext_str}")
-
-            nums = []
-            for name in files_found:
-                n = extract_number(name)
-                if n is not None:
-                    nums.append(n)
-            
-            if nums:
-                min_n = min(nums)
-                max_n = max(nums)
+                log(f"Extensiones detectadas automáticamente: {new_ext_str}")
+
+            if number_range:
+                min_n, max_n = number_range
                 self.entry_start.delete(0, "end")
                 self.entry_start.insert(0, str(min_n))
                 self.entry_end.delete(0, "end")
                 self.entry_end.insert(0, str(max_n))
-                print(f"Rango detectado: {min_n} - {max_n}")
+                log(f"Rango detectado: {min_n} - {max_n}")
             else:
                 self.entry_start.delete(0, "end")
                 self.entry_end.delete(0, "end")
 
         except Exception as e:
-            print(f"Error detectando contenido de la carpeta: {e}")
+            log(f"Error detectando contenido de la carpeta: {e}")
 
 
     def start_process_thread(self):
-        self.btn_run.configure(state="disabled", text="Procesando...")
-        thread = threading.Thread(target=self.run_process)
-        thread.start()
-
-    def run_process(self):
+        if self.watcher is not None:
+            self.stop_watch()
+            return
+        if self.job is not None and self.job.is_running():
+            # Cancelación cooperativa: termina lo que ya está en curso y no empieza más semillas
+            self.job.cancel()
+            self.btn_run.configure(state="disabled", text="Cancelando...")
+            return
+        options = self.build_options()
+        if options is None:
+            return
+        if self.switch_watch.get():
+            # El build inicial y los siguientes los hace el watcher en segundo plano
+            self.watcher = FolderWatcher(options).start()
+            self.reset_button()
+            return
+        self.open_when_done = self.switch_open.get() and not options.simulacion
+        self.job = PipelineJob(options).start()
+        self.btn_run.configure(text="CANCELAR")
+        self.btn_pause.configure(state="normal", text="PAUSAR")
+        self.progress_bar.set(0)
+        self.label_progress.configure(text="Preparando...")
+        self.after(200, self.poll_job)
+
+    def build_options(self):
+        """PipelineOptions con lo elegido en la ventana (None si hay algún dato incorrecto)"""
+        target_dir = self.entry_path.get().strip()
+        if not target_dir:
+             target_dir = os.path.dirname(os.path.abspath(__file__))
+        
+        nombre_base = self.entry_base.get().strip()
+        output_name_user = self.entry_output.get().strip()
+        if not output_name_user: output_name_user = "Diagrama"
+
+        num_pos = self.switch_num_pos.get()
+        simulacion = self.switch_sim.get()
+        recursivo = self.switch_recursive.get()
+        forzar = self.switch_force.get()
+        trazas = bool(self.switch_trace.get()) or None  # apagado -> lo que diga la configuración
+        
+        theme = "default"
+        simplify_mode = False 
+        
+        engine_choice = self.combo_engine.get()
+        engine = "graphviz" if "Graphviz" in engine_choice else "mermaid"
+        renderer = RENDERER_CHOICES.get(self.combo_renderer.get(), "kroki")
         try:
-            target_dir = self.entry_path.get().strip()
-            if not target_dir:
-                 target_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            nombre_base = self.entry_base.get().strip()
-            output_name_user = self.entry_output.get().strip()
-            if not output_name_user: output_name_user = "Diagrama"
-
-            num_pos = self.switch_num_pos.get()
-            simulacion = self.switch_sim.get()
-            abrir_final = self.switch_open.get()
-            recursivo = self.switch_recursive.get()
-            
-            theme = "default"
-            simplify_mode = False 
-            
-            engine_choice = self.combo_engine.get()
-            engine = "graphviz" if "Graphviz" in engine_choice else "mermaid"
-            
-            inner_mode = True  
-            conds_align_mode = True  
-
-            r_inicio = None
-            r_fin = None
-            use_rango_filter = self.switch_use_rango.get()
-
-            if use_rango_filter:
-                try:
-                    val_s = self.entry_start.get().strip()
-                    val_e = self.entry_end.get().strip()
-                    if val_s: r_inicio = int(val_s)
-                    if val_e: r_fin = int(val_e)
-                except ValueError:
-                    print("Error: Los rangos deben ser números enteros.")
-                    self.reset_button()
-                    return
-
-            print("\n--- INICIANDO PROCESO ---")
-            print(f"Carpeta: {target_dir}")
-            print(f"Config: Base='{nombre_base}', Rango={r_inicio}-{r_fin}, Simulación={simulacion}")
-
-            if not os.path.exists(target_dir):
-                print(f"Error: La carpeta '{target_dir}' no existe.")
-                self.reset_button()
-                return
-
-            candidate_files = []
-
-            if "." in nombre_base:
-                _, autodetect_ext = os.path.splitext(nombre_base)
-                if autodetect_ext:
-                    clean_ext = autodetect_ext.replace(".", "")
-                    try:
-                        self.entry_ext.delete(0, "end")
-                        self.entry_ext.insert(0, clean_ext)
-                    except: pass
-            
-            ext_str = self.entry_ext.get().strip()
-            valid_exts = tuple(f".{e.strip().replace('.', '')}" for e in ext_str.split(',') if e.strip())
-            if not valid_exts: valid_exts = ('.py',)
-
-            if recursivo:
-                for root, dirs, files in os.walk(target_dir):
-                     for file in files:
-                         if file.lower().endswith(valid_exts):
-                             candidate_files.append(os.path.join(root, file))
-            else:
-                 if os.path.exists(target_dir):
-                     for file in os.listdir(target_dir):
-                         if file.lower().endswith(valid_exts):
-                            candidate_files.append(os.path.join(target_dir, file))
-
-            valid_files = []
-            for f_path in candidate_files:
-                f_name = os.path.basename(f_path)
-                if f_name == "generador_diagramas3000.py":
-                    continue
-                if should_process(f_name, nombre_base, num_pos, r_inicio, r_fin):
-                    valid_files.append(f_path)
-            
+            workers = resolve_workers(int(self.entry_workers.get().strip() or 0))
+        except ValueError:
+            workers = resolve_workers()
+        
+        inner_mode = True  
+        conds_align_mode = True  
+
+        r_inicio = None
+        r_fin = None
+        use_rango_filter = self.switch_use_rango.get()
+
+        if use_rango_filter:
             try:
-                valid_files.sort(key=lambda x: extract_number(os.path.basename(x)) if extract_number(os.path.basename(x)) is not None else x)
-            except:
-                valid_files.sort()
-
-            grouped_by_dir = {}
-            for vf in valid_files:
-                parent = os.path.dirname(vf)
-                if parent not in grouped_by_dir:
-                    grouped_by_dir[parent] = []
-                grouped_by_dir[parent].append(vf)
-            
-            processed_count = 0
-            success_count = 0
-            abs_target_dir = os.path.abspath(target_dir)
-
-            if not valid_files:
-                 print("No se encontraron archivos que coincidan con los criterios.")
-            else:
-                for folder, seed_files in grouped_by_dir.items():
-                    processed_in_this_folder = set()
-                    for seed in seed_files:
-                        if seed in processed_in_this_folder: continue
-                        seed_name = os.path.basename(seed)
-                        seed_dir = os.path.dirname(seed)
-                        
-                        project_bundle = [seed]  
-                        try:
-                            for item in os.listdir(seed_dir):
-                                item_path = os.path.join(seed_dir, item)
-                                if os.path.isdir(item_path):
-                                    for subfile in os.listdir(item_path):
-                                        if subfile.lower().endswith(valid_exts):
-                                            subfile_path = os.path.join(item_path, subfile)
-                                            if subfile_path not in project_bundle:
-                                                project_bundle.append(subfile_path)
-                        except: pass
-                        
-                        n = extract_number(seed_name)
-                        if n is not None:
-                            out_name = f"{output_name_user} {n}.pdf"
-                        else:
-                            base_no_ext = os.path.splitext(seed_name)[0]
-                            out_name = f"{output_name_user}_{base_no_ext}.pdf"
-                        
-                        data_payload = []
-                        for py_file in project_bundle:
-                             try:
-                                with open(py_file, 'r', encoding='utf-8') as f:
-                                    fname = os.path.basename(py_file)
-                                    fcode = f.read()
-                                    if fcode.strip():
-                                        data_payload.append((fname, fcode))
-                             except: pass
-
-                        if not data_payload: continue
-                        
-                        output_pdf_path = os.path.join(folder, out_name)
-                        try:
-                            result = generate_flowchart_from_code(data_payload, output_pdf_path, simulacion, save_mmd=False, theme_name=theme, 
-                                                           simplify=simplify_mode, inner=inner_mode, conds_align=conds_align_mode, engine=engine)
-                            if result:
-                                print(f"    [ÉXITO] Hecho -> {out_name}")
-                                success_count += 1
-                            else:
-                                print(f"    [ERROR] Falló la generación ({out_name}).")
-                            processed_count += 1
-                        except: pass
-                        
-                        for b_file in project_bundle:
-                            processed_in_this_folder.add(b_file)
-
-            if abrir_final and not simulacion:
-                open_folder(target_dir)
-        except Exception as e:
-            print(f"\nERROR CRÍTICO: {e}")
-        finally:
-            self.reset_button()
+                val_s = self.entry_start.get().strip()
+                val_e = self.entry_end.get().strip()
+                if val_s: r_inicio = int(val_s)
+                if val_e: r_fin = int(val_e)
+            except ValueError:
+                log("Error: Los rangos deben ser números enteros.")
+                return None
+
+        _, autodetected = resolve_extensions(nombre_base, "")
+        if autodetected:
+            self.entry_ext.delete(0, "end")
+            self.entry_ext.insert(0, autodetected)
+
+        return PipelineOptions(target_dir, nombre_base=nombre_base, output_name=output_name_user,
+                               num_pos=num_pos, simulacion=simulacion, recursive=recursivo,
+                               engine=engine, renderer=renderer, extensions=self.entry_ext.get().strip(),
+                               rango_inicio=r_inicio, rango_fin=r_fin, theme=theme, simplify=simplify_mode,
+                               inner=inner_mode, conds_align=conds_align_mode, workers=workers,
+                               force=forzar, trace=trazas)
+
+    def poll_job(self):
+        """Refresca la barra de progreso desde el hilo de Tk mientras dura la ejecución"""
+        job = self.job
+        if job is None:
+            return
+        status = job.status.snapshot()
+        self.progress_bar.set(status["fraction"])
+        text = f"{status['done']}/{status['total']} semillas · {status['rate']:.1f} diagramas/s · ETA {format_eta(status['eta'])}"
+        if status["failed"]:
+            text += f" · {status['failed']} fallidas"
+        if job.paused:
+            text += " · EN PAUSA"
+        self.label_progress.configure(text=text)
+        if job.is_running():
+            self.after(200, self.poll_job)
+            return
+        self.job = None
+        result = job.result
+        if result is not None and result.cancelled:
+            self.label_progress.configure(text=text + f" · cancelado ({len(result.cancelled)} sin generar)")
+        self.reset_button()
+        if self.open_when_done and result is not None and result.error is None and not result.cancelled:
+            open_folder(job.options.target_dir)
+
+    def toggle_pause(self):
+        if self.job is None:
+            return
+        if self.job.paused:
+            self.job.resume()
+            self.btn_pause.configure(text="PAUSAR")
+        else:
+            self.job.pause()
+            self.btn_pause.configure(text="REANUDAR")
+
+    def stop_watch(self):
+        self.watcher.stop()
+        self.watcher = None
+        log("\nVigilancia detenida.")
+        self.reset_button()
 
     def reset_button(self):
+        self.btn_pause.configure(state="disabled", text="PAUSAR")
+        if self.watcher is not None:
+            self.btn_run.configure(state="normal", text="DETENER VIGILANCIA")
+            return
         self.btn_run.configure(state="normal", text="GENERAR DIAGRAMAS")
@@ -14,5 +14,10 @@ ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos de análisis en el ejecutable de PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
+    # Lo que quede en cola va al archivo de registro (si hay) antes de salir
+    app.log_sink.close()
@@ -0,0 +1,49 @@
+import unittest
+from core.analyzer import analyze_bundle, submit_bundle_analysis, build_diagram_graph, link_calls, MAX_CALL_TARGETS
+from core.graph import DiagramGraph, EDGE_CALL
+from core.parallel import shutdown_pool
+
+class BundleErrorTest(unittest.TestCase):
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_error_in_pool_worker_reaches_the_caller(self):
+        # Un bundle imposible de analizar: el motivo tiene que llegar al proceso principal
+        future = submit_bundle_analysis([("roto.py", None)], workers=2, output_path="roto.pdf")
+        with self.assertRaises(TypeError):
+            future.result(timeout=60)
+
+    def test_serial_analysis_raises_too(self):
+        with self.assertRaises(TypeError):
+            analyze_bundle(([("roto.py", None)], "default", True, True, True, "graphviz", "roto.pdf"))
+
+def call_edges(graph):
+    return [(src, dst) for src, dst, _, style in graph.edges() if style == EDGE_CALL]
+
+class LinkCallsTest(unittest.TestCase):
+    def test_call_links_to_the_header_in_the_other_file(self):
+        graph = build_diagram_graph([("main.py", "import util\nutil.f()\ng()\ndef g():\n    return 1\n"),
+                                     ("util.py", "def f():\n    return 2\ndef g():\n    return 3\n")], workers=1)
+        edges = call_edges(graph)
+        # g() está definida en main.py: la definición local tapa a la de util.py
+        self.assertEqual(len(edges), 1)
+        src, dst = edges[0]
+        clusters = dict(zip(graph.node_ids, graph.node_clusters))
+        self.assertEqual((clusters[src], clusters[dst]), (0, 1))
+        self.assertEqual(dst, "HEAD_FILE_1_util_py_FN_f")
+
+    def test_ambiguous_names_are_not_linked(self):
+        definitions = {"f": [(i, f"HEAD_{i}_f") for i in range(1, MAX_CALL_TARGETS + 2)],
+                       "g": [(i, f"HEAD_{i}_g") for i in range(1, MAX_CALL_TARGETS + 1)]}
+        graph = DiagramGraph()
+        link_calls(graph, definitions, [(0, "call_f", ["f"]), (0, "call_g", ["g"]), (0, "call_g", ["g"])])
+        self.assertEqual(call_edges(graph), [("call_g", f"HEAD_{i}_g") for i in range(1, MAX_CALL_TARGETS + 1)])
+
+    def test_first_known_candidate_wins(self):
+        definitions = {"util:f": [(1, "HEAD_util_f")], "f": [(2, "HEAD_otro_f")]}
+        graph = DiagramGraph()
+        link_calls(graph, definitions, [(0, "call", ["nada", "util:f", "f"])])
+        self.assertEqual(call_edges(graph), [("call", "HEAD_util_f")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+from core.cache import DiskCache, content_digest
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = DiskCache(os.path.join(self.tmp, "cache"), max_bytes=1 << 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def mode(self, key):
+        return stat.S_IMODE(os.stat(self.cache._path(key)).st_mode)
+
+    def test_entries_are_shareable(self):
+        shared = 0o666 & ~_umask()
+        key = content_digest("bytes")
+        self.assertTrue(self.cache.put_bytes(key, b"%PDF"))
+        self.assertEqual(self.mode(key), shared)
+
+        src = os.path.join(self.tmp, "Diagrama 1.pdf")
+        with open(src, "wb") as f:
+            f.write(b"%PDF-1.4\n")
+        key = content_digest("file")
+        self.assertTrue(self.cache.put_file(key, src))
+        self.assertEqual(self.mode(key), shared)
+
+    def test_round_trip_and_stats(self):
+        key = content_digest("render", "graphviz")
+        self.assertIsNone(self.cache.get_bytes(key))
+        self.cache.put_bytes(key, b"datos")
+        self.assertEqual(self.cache.get_bytes(key), b"datos")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_eviction_removes_least_recently_used(self):
+        cache = DiskCache(os.path.join(self.tmp, "small"), max_bytes=250)
+        old, new = content_digest("old"), content_digest("new")
+        cache.put_bytes(old, b"x" * 100)
+        os.utime(cache._path(old), (1, 1))
+        cache.put_bytes(new, b"y" * 100)
+        cache.put_bytes(content_digest("third"), b"z" * 100)
+        self.assertIsNone(cache.get_bytes(old))
+        self.assertEqual(cache.get_bytes(new), b"y" * 100)
+
+if __name__ == "__main__":
+    unittest.main()
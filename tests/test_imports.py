@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.imports import ImportGraph
+
+def write(path, code=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+class ImportGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def test_namespace_package_without_init(self):
+        write(self.path("main.py"), "import helper\nfrom sub import util\n")
+        write(self.path("helper.py"), "X = 1\n")
+        write(self.path("sub", "util.py"), "def f():\n    return 1\n")
+        bundle = ImportGraph().transitive(self.path("main.py"))
+        self.assertEqual(set(bundle), {self.path("main.py"), self.path("helper.py"), self.path("sub", "util.py")})
+
+    def test_dotted_import_inside_namespace_package(self):
+        write(self.path("main.py"), "import sub.deep.mod\n")
+        write(self.path("sub", "deep", "mod.py"), "")
+        bundle = ImportGraph().transitive(self.path("main.py"))
+        self.assertIn(self.path("sub", "deep", "mod.py"), bundle)
+
+    def test_regular_package_includes_init(self):
+        write(self.path("main.py"), "from pkg import mod\n")
+        write(self.path("pkg", "__init__.py"), "")
+        write(self.path("pkg", "mod.py"), "")
+        bundle = ImportGraph().transitive(self.path("main.py"))
+        self.assertIn(self.path("pkg", "__init__.py"), bundle)
+        self.assertIn(self.path("pkg", "mod.py"), bundle)
+
+    def test_unknown_module_is_ignored(self):
+        write(self.path("main.py"), "import os\nfrom collections import deque\n")
+        self.assertEqual(ImportGraph().transitive(self.path("main.py")), [self.path("main.py")])
+
+if __name__ == "__main__":
+    unittest.main()
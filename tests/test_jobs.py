@@ -0,0 +1,35 @@
+import unittest
+from core.jobs import JobProgress, RunControl
+
+class JobProgressTest(unittest.TestCase):
+    def test_retried_seed_counts_once(self):
+        progress = JobProgress()
+        progress.update({"event": "start", "jobs": 2})
+        progress.update({"event": "seed_done", "ok": True})
+        progress.update({"event": "seed_done", "ok": False})
+        progress.update({"event": "seed_retry"})
+        progress.update({"event": "seed_done", "ok": True})
+        status = progress.snapshot()
+        self.assertEqual((status["done"], status["total"], status["failed"]), (2, 2, 0))
+        self.assertEqual(progress.rendered, 2)
+        self.assertEqual(status["fraction"], 1.0)
+
+    def test_skipped_seeds_do_not_count_for_the_rate(self):
+        progress = JobProgress()
+        progress.update({"event": "start", "jobs": 3})
+        progress.update({"event": "seed_skipped"})
+        status = progress.snapshot()
+        self.assertEqual((status["done"], status["skipped"], status["rate"]), (1, 1, 0.0))
+        self.assertIsNone(status["eta"])
+
+class RunControlTest(unittest.TestCase):
+    def test_cancel_releases_a_paused_run(self):
+        control = RunControl()
+        control.pause()
+        self.assertFalse(control.wait_resumed(0))
+        control.cancel()
+        self.assertTrue(control.wait_resumed(0))
+        self.assertTrue(control.cancelled)
+
+if __name__ == "__main__":
+    unittest.main()
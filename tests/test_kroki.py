@@ -0,0 +1,52 @@
+import unittest
+from core.kroki import EndpointPool, Endpoint, KrokiClient, KrokiHTTPError, NoEndpointAvailable
+
+DIAGRAM = b'digraph G { a -> b }'
+
+class EndpointPoolTest(unittest.TestCase):
+    def test_single_endpoint_is_never_ejected(self):
+        pool = EndpointPool("http://kroki.local", failure_threshold=3, cooldown=30)
+        for _ in range(10):
+            pool.release(pool.acquire(), ok=False)
+        endpoint = pool.acquire()
+        self.assertEqual(endpoint.state, Endpoint.CLOSED)
+
+    def test_failing_endpoint_is_ejected_when_there_is_an_alternative(self):
+        pool = EndpointPool(["http://a", "http://b"], failure_threshold=3, cooldown=30)
+        bad = pool.endpoints[0]
+        for _ in range(3):
+            bad.outstanding += 1
+            pool.release(bad, ok=False)
+        self.assertEqual(bad.state, Endpoint.OPEN)
+        self.assertEqual(pool.acquire().url, "http://b")
+        # El último sano no se expulsa aunque falle
+        good = pool.endpoints[1]
+        for _ in range(5):
+            good.outstanding += 1
+            pool.release(good, ok=False)
+        self.assertEqual(good.state, Endpoint.CLOSED)
+
+class SingleEndpointIntermittentErrorsTest(unittest.TestCase):
+    def test_retries_keep_working_with_one_flaky_server(self):
+        from benchmarks.throughput import FakeKroki
+        fake = FakeKroki(latency_ms=0, error_rate=0.5, seed=1).start()
+        client = KrokiClient(fake.url, retries=3, backoff=0.001, failure_threshold=3, cooldown=30)
+        try:
+            ok = failed = 0
+            for _ in range(30):
+                try:
+                    client.post("graphviz", "pdf", DIAGRAM)
+                    ok += 1
+                except KrokiHTTPError:
+                    failed += 1
+                except NoEndpointAvailable:
+                    self.fail("El único endpoint se expulsó: los renders fallarían durante todo el enfriamiento")
+            self.assertEqual(ok + failed, 30)
+            # Con 3 reintentos y un 50 % de errores falla ~1 de cada 16 peticiones
+            self.assertLessEqual(failed, 6)
+        finally:
+            client.pool.stop()
+            fake.stop()
+
+if __name__ == "__main__":
+    unittest.main()
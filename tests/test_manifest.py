@@ -0,0 +1,83 @@
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+from core.manifest import BuildManifest, MANIFEST_FILENAME
+
+SETTINGS = {"engine": "graphviz", "theme": "default"}
+
+def write(path, code):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+def stat_of(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime)
+
+class BuildManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.seed = os.path.join(self.folder, "Ejercicio 1.py")
+        self.helper = os.path.join(self.folder, "helper.py")
+        write(self.seed, "import helper\n")
+        write(self.helper, "X = 1\n")
+        self.bundle = [self.seed, self.helper]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def stats(self):
+        return {path: stat_of(path) for path in self.bundle if os.path.exists(path)}
+
+    def build(self, manifest=None):
+        """Simula un build: comprueba, escribe el PDF y lo anota en el manifiesto guardado"""
+        manifest = manifest or BuildManifest(self.folder)
+        reason, inputs = manifest.check("Diagrama 1.pdf", self.bundle, self.stats(), SETTINGS)
+        write(os.path.join(self.folder, "Diagrama 1.pdf"), "%PDF")
+        manifest.record("Diagrama 1.pdf", inputs, SETTINGS)
+        manifest.save()
+        return reason
+
+    def check(self, settings=SETTINGS):
+        return BuildManifest(self.folder).check("Diagrama 1.pdf", self.bundle, self.stats(), settings)[0]
+
+    def test_unchanged_bundle_is_skipped(self):
+        self.assertEqual(self.build(), "nueva salida")
+        self.assertIsNone(self.check())
+
+    def test_modified_file_regenerates(self):
+        self.build()
+        write(self.helper, "X = 22\n")
+        self.assertEqual(self.check(), "archivos modificados: helper.py")
+
+    def test_touched_file_with_same_content_is_skipped(self):
+        self.build()
+        os.utime(self.helper, (1, 1))
+        manifest = BuildManifest(self.folder)
+        self.assertIsNone(manifest.check("Diagrama 1.pdf", self.bundle, self.stats(), SETTINGS)[0])
+        self.assertTrue(manifest.dirty)
+
+    def test_removed_file_changed_options_and_missing_pdf_regenerate(self):
+        self.build()
+        self.assertTrue(self.check({"engine": "mermaid", "theme": "default"}).startswith("opciones cambiadas (engine"))
+        self.bundle = [self.seed]
+        self.assertEqual(self.check(), "archivos eliminados: helper.py")
+        os.remove(os.path.join(self.folder, "Diagrama 1.pdf"))
+        self.assertEqual(self.check(), "el PDF no existe")
+
+    def test_inputs_of_previous_build(self):
+        self.assertIsNone(BuildManifest(self.folder).inputs_of("Diagrama 1.pdf"))
+        self.build()
+        self.assertEqual(BuildManifest(self.folder).inputs_of("Diagrama 1.pdf"), set(self.bundle))
+
+    def test_saved_manifest_follows_umask(self):
+        self.build()
+        mask = os.umask(0)
+        os.umask(mask)
+        path = os.path.join(self.folder, MANIFEST_FILENAME)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o666 & ~mask)
+        self.assertEqual(sorted(os.listdir(self.folder)), [MANIFEST_FILENAME, "Diagrama 1.pdf", "Ejercicio 1.py", "helper.py"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from core import config
+from core.graph import DiagramGraph
+from core.partition import plan_pages, partition_graph, PartitionedDiagram
+
+def limits(max_nodes=0, max_edges=0, max_kb=0, output="pages"):
+    return {"max_nodes": max_nodes, "max_edges": max_edges, "max_kb": max_kb, "output": output}
+
+def make_graph(files):
+    """Grafo con un cluster por archivo y una cadena de nodos por función: {"a.py": [10, 10], ...}"""
+    graph = DiagramGraph()
+    for file_name, functions in files.items():
+        graph.add_cluster(file_name, file_name)
+        for f, length in enumerate(functions):
+            ids = [graph.add_node(f"{file_name}_f{f}_n{i}", "operation", f"x = {i}", file_name) for i in range(length)]
+            for src, dst in zip(ids, ids[1:]):
+                graph.add_edge(src, dst)
+    return graph
+
+def unit_of(node_id):
+    return node_id.rsplit("_n", 1)[0]
+
+class PlanPagesTest(unittest.TestCase):
+    def test_small_graph_is_not_split(self):
+        self.assertIsNone(plan_pages(make_graph({"a.py": [10, 10]}), limits(max_nodes=25)))
+
+    def test_whole_file_moves_to_a_new_page(self):
+        graph = make_graph({"a.py": [10, 10], "b.py": [10]})
+        pages = plan_pages(graph, limits(max_nodes=25))
+        self.assertEqual([{graph.node_clusters[i] for i in page} for page in pages], [{"a.py"}, {"b.py"}])
+
+    def test_node_cap_keeps_functions_whole(self):
+        graph = make_graph({"a.py": [10, 10, 10], "b.py": [4, 12, 7, 3], "c.py": [20]})
+        pages = plan_pages(graph, limits(max_nodes=25))
+        # a.py: 10+10 | 10 + b.py: 4 | b.py: 12+7+3 | c.py: 20
+        self.assertEqual([len(page) for page in pages], [20, 14, 22, 20])
+        self.assertEqual(sorted(i for page in pages for i in page), list(range(len(graph))))
+        page_of_unit = {}
+        for number, page in enumerate(pages):
+            self.assertLessEqual(len(page), 25)
+            for i in page:
+                self.assertEqual(page_of_unit.setdefault(unit_of(graph.node_ids[i]), number), number)
+
+    def test_edge_cap(self):
+        graph = make_graph({"a.py": [10, 10], "b.py": [10]})
+        pages = plan_pages(graph, limits(max_edges=10))
+        self.assertEqual(len(pages), 3)
+
+class PartitionGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        config_path = os.path.join(self.tmp, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"cache_dir": os.path.join(self.tmp, "cache")}, f)
+        patch = mock.patch.object(config, "_config", config.load_config(config_path))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_large_graph_becomes_pages_plus_overview(self):
+        graph = make_graph({"a.py": [10, 10, 10], "b.py": [10]})
+        diagram = partition_graph(graph, os.path.join(self.tmp, "Diagrama 1.pdf"), limits=limits(max_nodes=25))
+        self.assertIsInstance(diagram, PartitionedDiagram)
+        try:
+            self.assertEqual(len(diagram.pages), 2)
+            self.assertGreater(len(diagram), 0)
+        finally:
+            diagram.discard()
+
+    def test_only_graphviz_is_partitioned(self):
+        graph = make_graph({"a.py": [10, 10, 10]})
+        self.assertIsNone(partition_graph(graph, engine="mermaid", limits=limits(max_nodes=5)))
+
+if __name__ == "__main__":
+    unittest.main()
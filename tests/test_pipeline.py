@@ -0,0 +1,89 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+from core import config, renderer
+from core.pipeline import PipelineOptions, run_pipeline
+
+class FakeRenderer(renderer.Renderer):
+    """Escribe un PDF mínimo sin red ni Graphviz"""
+    def supports(self, engine):
+        return True
+
+    def describe(self):
+        return "render de prueba"
+
+    def submit(self, payload, engine="graphviz", output_format="pdf", output_path=None):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.4\n")
+        return renderer._completed_future(9)
+
+def write(path, code):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+class PipelineTestCase(unittest.TestCase):
+    """Carpeta temporal con configuración propia y render de prueba"""
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.work = os.path.join(self.tmp, "ejercicios")
+        os.makedirs(self.work)
+        config_path = os.path.join(self.tmp, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"cache_dir": os.path.join(self.tmp, "cache"), "render_cache": False,
+                       "fragment_cache": False, "analysis_workers": 1}, f)
+        patches = [mock.patch.object(config, "_config", config.load_config(config_path)),
+                   mock.patch.object(renderer, "get_renderer", lambda name=None: FakeRenderer())]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def run_quiet(self, options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run_pipeline(options)
+
+class WatchRemovedFileTest(PipelineTestCase):
+    def test_deleted_import_in_same_folder_regenerates_its_seed(self):
+        write(os.path.join(self.work, "Ejercicio 1.py"), "import helper\nhelper.f()\n")
+        write(os.path.join(self.work, "Ejercicio 2.py"), "x = 1\n")
+        helper = os.path.join(self.work, "helper.py")
+        write(helper, "def f():\n    return 1\n")
+        options = PipelineOptions(self.work, nombre_base="Ejercicio", extensions="py", workers=1)
+        self.assertEqual(sorted(self.run_quiet(options).succeeded), ["Diagrama 1.pdf", "Diagrama 2.pdf"])
+
+        os.remove(helper)
+        options.changed_paths = [helper]
+        result = self.run_quiet(options)
+        self.assertEqual(result.seeds, 1)
+        self.assertEqual(result.succeeded, ["Diagrama 1.pdf"])
+
+    def test_deleted_import_without_manifest_regenerates_the_folder(self):
+        write(os.path.join(self.work, "Ejercicio 1.py"), "import helper\nhelper.f()\n")
+        helper = os.path.join(self.work, "helper.py")
+        write(helper, "def f():\n    return 1\n")
+        options = PipelineOptions(self.work, nombre_base="Ejercicio", extensions="py", workers=1)
+        self.run_quiet(options)
+        os.remove(os.path.join(self.work, ".diagramas_manifest.json"))
+
+        os.remove(helper)
+        options.changed_paths = [helper]
+        self.assertEqual(self.run_quiet(options).succeeded, ["Diagrama 1.pdf"])
+
+class SeedBundleTest(PipelineTestCase):
+    def test_seed_imported_by_another_seed_keeps_its_diagram(self):
+        write(os.path.join(self.work, "ejercicio1.py"), "import ejercicio2\nejercicio2.f()\n")
+        write(os.path.join(self.work, "ejercicio2.py"), "def f():\n    return 2\n")
+        write(os.path.join(self.work, "ejercicio3.py"), "x = 3\n")
+        options = PipelineOptions(self.work, nombre_base="ejercicio", extensions="py", workers=1)
+        result = self.run_quiet(options)
+        self.assertEqual(sorted(result.succeeded), ["Diagrama 1.pdf", "Diagrama 2.pdf", "Diagrama 3.pdf"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from core.analyzer import build_diagram_code
+from core.renderer import _node_text
+from core.utils import escape_dot_label
+
+DEEP = '''def leer(paths):
+    with open(paths) as fh:
+        for line in fh:
+            if line:
+                try:
+                    with open(line) as other:
+                        for x in other:
+                            print(x)
+                except OSError:
+                    pass
+'''
+
+class DeepNestingLabelTest(unittest.TestCase):
+    def test_node_text_drops_code_indentation(self):
+        self.assertEqual(_node_text("with open(p) as fh:\n    for line in fh:\n        print(line)"),
+                         "with open(p) as fh:\nfor line in fh:\nprint(line)")
+
+    def test_deeply_nested_block_is_not_ascii_art(self):
+        dot = build_diagram_code([("lectura.py", DEEP)])
+        self.assertNotIn("ASCII Art", dot)
+        self.assertIn("with open(paths) as fh:\\nfor line in fh:", dot)
+
+    def test_real_ascii_art_is_still_detected(self):
+        self.assertEqual(escape_dot_label("█" * 10), "[ Contenido Visual / ASCII Art ]")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.scanner import FileIndex
+
+def write(path, code=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+
+class FileIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "ejercicios")
+        self.db_path = os.path.join(self.tmp, "index", "ejercicios.sqlite3")
+        write(self.path("Ejercicio 1.py"), "x = 1\n")
+        write(self.path("Ejercicio 2.py"), "y = 2\n")
+        write(self.path("lib", "util.py"), "def f():\n    pass\n")
+        write(self.path("lib", "deep", "mod.py"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def open(self):
+        index = FileIndex(self.root, self.db_path)
+        self.addCleanup(index.close)
+        return index
+
+    def test_first_refresh_indexes_everything_and_second_is_empty(self):
+        index = self.open()
+        changed, removed = index.refresh()
+        self.assertEqual(len(changed), 4)
+        self.assertEqual(removed, [])
+        self.assertEqual(index.refresh(), ([], []))
+        self.assertEqual([row[3] for row in index.files(recursive=False)], [1, 2])
+        self.assertEqual(index.number_range(recursive=False, exts={"py"}), (1, 2))
+
+    def test_refresh_after_add_change_and_delete(self):
+        self.open().refresh()
+        write(self.path("Ejercicio 3.py"), "z = 3\n")
+        write(self.path("Ejercicio 1.py"), "x = 100\n")
+        os.remove(self.path("lib", "util.py"))
+
+        index = self.open()  # el índice persiste entre ejecuciones
+        changed, removed = index.refresh()
+        self.assertEqual(sorted(changed), [self.path("Ejercicio 1.py"), self.path("Ejercicio 3.py")])
+        self.assertEqual(removed, [self.path("lib", "util.py")])
+        self.assertEqual(index.stat(self.path("Ejercicio 1.py"))[0], len("x = 100\n"))
+        self.assertIsNone(index.stat(self.path("lib", "util.py")))
+
+    def test_non_recursive_refresh_stops_at_direct_subfolders(self):
+        index = self.open()
+        changed, _ = index.refresh(recursive=False)
+        self.assertNotIn(self.path("lib", "deep", "mod.py"), changed)
+        self.assertEqual(index.subfolder_files(self.root), [(self.path("lib", "util.py"), "util.py")])
+
+    def test_stored_imports_are_dropped_when_the_file_changes(self):
+        index = self.open()
+        index.refresh()
+        seed = self.path("Ejercicio 1.py")
+        index.put_imports(seed, [["helper", 0]])
+        self.assertEqual(index.get_imports(seed), [("helper", 0)])
+        write(seed, "import otro\n")
+        index.refresh()
+        self.assertIsNone(index.get_imports(seed))
+
+if __name__ == "__main__":
+    unittest.main()
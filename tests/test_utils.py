@@ -0,0 +1,161 @@
+import io
+import os
+import glob
+import stat
+import random
+import shutil
+import tempfile
+import unittest
+import threading
+import contextlib
+from core.utils import atomic_output, escape_dot_label, sanitize_id, log
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+def reference_escape_dot_label(text, limit=120):
+    """escape_dot_label original (referencia para la equivalencia)"""
+    if not text: return ""
+    if "░" in text or "█" in text or "    " * 4 in text:
+        return "[ Contenido Visual / ASCII Art ]"
+    if len(text) > 300:
+        text = text[:297] + "..."
+    text = text.replace('\\', '\\\\').replace('"', '\\"').replace('\r', '')
+    processed_lines = []
+    total_chars = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line: continue
+        if len(line) > 60:
+            line = line[:57] + "..."
+        line = "".join([c if ord(c) < 128 else "?" for c in line])
+        processed_lines.append(line)
+        total_chars += len(line)
+        if total_chars > limit:
+            processed_lines.append("...")
+            break
+    return "\\n".join(processed_lines)
+
+def reference_sanitize_id(text):
+    """sanitize_id original (referencia para la equivalencia)"""
+    if not text: return "id_null"
+    text = text.replace('.', '_').replace(' ', '_')
+    return "".join([c if (c.isalnum() and ord(c) < 128) or c == '_' else '_' for c in text])
+
+EDGE_CASES = [
+    "", "a", " ", "\n", "\r\n", "\\", '"', '\\"', "x = \"a\\b\"", "línea\r\ncon CRLF",
+    "ñandú", "café ☕ 𝔘𝔫𝔦𝔠𝔬𝔡𝔢", "\u00a0espacio duro\u00a0", "\u2003em\u2003", "\x0b\x0cvt ff\x1c\x1d",
+    "\x85nel", "\ud800 surrogate", "tab\tinside", "   " * 5 + "x", "    " * 4, "░░░", "█", "x" * 59,
+    "x" * 60, "x" * 61, "ü" * 61, "y" * 299, "y" * 300, "y" * 301, "\n".join(["linea"] * 40),
+    "\n".join(["z" * 70] * 5), "if (a > b) {\n  return a;\n}", "a.b.c d", "módulo.función", "id-con-guiones",
+    "Ejercicio 1.py", "FN_Clase.método", "123abc", "__init__", "a\u0301", "Ⅻ", "٣", "²", "ǅ",
+]
+
+def source_corpus():
+    """Líneas, bloques y nombres sacados del código del propio repositorio"""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "**", "*.py"), recursive=True)):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+        lines = code.splitlines()
+        texts.append(os.path.relpath(path, ROOT))
+        texts.extend(lines)
+        texts.extend("\n".join(lines[i:i + 6]) for i in range(0, len(lines), 6))
+    return texts
+
+def random_corpus(count, seed=1234):
+    rng = random.Random(seed)
+    alphabet = ("abcXYZ019_ .-\\\"'\r\n\t{}()<>|" + "ñáéü€░█☕\u00a0\u2003\u0301" + "    ")
+    texts = []
+    for _ in range(count):
+        size = rng.choice((1, 5, 20, 61, 120, 310))
+        texts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, size))))
+    return texts
+
+class TextNormalizationTest(unittest.TestCase):
+    """escape_dot_label y sanitize_id dan exactamente la salida de las implementaciones originales"""
+    def setUp(self):
+        escape_dot_label.cache_clear()
+        sanitize_id.cache_clear()
+
+    def assertSameAsReference(self, corpus):
+        errors = []
+        for text in corpus:
+            for limit in (120, 60, 80):
+                expected, got = reference_escape_dot_label(text, limit), escape_dot_label(text, limit)
+                if expected != got:
+                    errors.append(("escape_dot_label", text, limit, expected, got))
+            expected, got = reference_sanitize_id(text), sanitize_id(text)
+            if expected != got:
+                errors.append(("sanitize_id", text, None, expected, got))
+        self.assertEqual(errors[:10], [], f"{len(errors)} diferencias en {len(corpus)} textos")
+
+    def test_edge_cases(self):
+        self.assertSameAsReference(EDGE_CASES)
+
+    def test_source_corpus(self):
+        self.assertSameAsReference(source_corpus())
+
+    def test_random_corpus(self):
+        self.assertSameAsReference(random_corpus(5000))
+
+    def test_cached_calls_match_uncached(self):
+        for text in EDGE_CASES:
+            self.assertEqual(escape_dot_label(text), escape_dot_label.__wrapped__(text))
+            self.assertEqual(escape_dot_label(text), escape_dot_label.__wrapped__(text))
+            self.assertEqual(sanitize_id(text), sanitize_id.__wrapped__(text))
+
+class AtomicOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_result_follows_umask_like_open(self):
+        path = os.path.join(self.tmp, "Diagrama 1.pdf")
+        with atomic_output(path) as f:
+            f.write(b"%PDF")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o666 & ~_umask())
+
+    def test_error_keeps_previous_file(self):
+        path = os.path.join(self.tmp, "traza.json")
+        with open(path, "w") as f:
+            f.write("{}")
+        with self.assertRaises(ValueError):
+            with atomic_output(path, "w") as f:
+                f.write("[a medias")
+                raise ValueError
+        with open(path) as f:
+            self.assertEqual(f.read(), "{}")
+        self.assertEqual(os.listdir(self.tmp), ["traza.json"])
+
+class LogTest(unittest.TestCase):
+    def test_lines_from_several_threads_stay_whole(self):
+        out = io.StringIO()
+
+        def worker(n):
+            for i in range(300):
+                log(f"    [KROKI] hilo {n} mensaje {i}")
+
+        with contextlib.redirect_stdout(out):
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for i in range(300):
+                log(f"    [ÉXITO] Hecho -> Diagrama {i}.pdf")
+            for thread in threads:
+                thread.join()
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1500)
+        self.assertTrue(all(line.startswith(("    [KROKI] hilo ", "    [ÉXITO] Hecho -> ")) for line in lines))
+
+if __name__ == "__main__":
+    unittest.main()